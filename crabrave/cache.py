@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from red_commons.logging import getLogger
+
+from .render import RaveTemplate
+
+log = getLogger("red.trusty-cogs.crabrave")
+
+# 500 MiB, a crab rave is usually around 1 MiB
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: List[str]) -> List[str]:
+    """Normalize caption lines so trivially different captions share a cache entry"""
+    return [WHITESPACE.sub(" ", line).strip().upper() for line in text]
+
+
+def cache_key(template: RaveTemplate, text: List[str]) -> str:
+    data = "\0".join([template.name, *normalize_text(text)])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class VideoCache:
+    """
+    A content addressed cache of finished videos on disk.
+
+    Files are named after the hash of the template and normalized caption.
+    Once the total size is over `max_bytes` the least recently used
+    videos are removed, access time is tracked through the file mtime
+    so the order survives restarts.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._sizes: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        for file in self.path.glob("*.mp4"):
+            if file.name.endswith(".tmp.mp4"):
+                # left over from a render that never finished
+                file.unlink()
+                continue
+            self._sizes[file.stem] = file.stat().st_size
+
+    @property
+    def total_size(self) -> int:
+        return sum(self._sizes.values())
+
+    def file_for(self, key: str) -> Path:
+        return self.path / f"{key}.mp4"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.file_for(key)
+        if key not in self._sizes or not path.is_file():
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # bump the mtime so eviction knows this was used recently
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, source: Path) -> Path:
+        """Move a finished render at `source` into the cache"""
+        path = self.file_for(key)
+        source.replace(path)
+        self._sizes[key] = path.stat().st_size
+        self._evict(keep=key)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        total = self.total_size
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(self._sizes, key=lambda k: self._mtime(k))
+        for key in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._sizes.pop(key)
+            try:
+                self.file_for(key).unlink()
+            except OSError:
+                log.debug("Error removing cached video %s", key, exc_info=True)
+
+    def _mtime(self, key: str) -> float:
+        try:
+            return self.file_for(key).stat().st_mtime
+        except OSError:
+            return 0
+
+    def clear(self) -> None:
+        for key in list(self._sizes):
+            self._sizes.pop(key)
+            try:
+                self.file_for(key).unlink()
+            except OSError:
+                pass
@@ -1,24 +1,22 @@
 import asyncio
 import functools
 import logging
-import os
 import aiohttp
 import discord
 import moviepy
 import yt_dlp as youtube_dl
-from moviepy.editor import CompositeVideoClip, TextClip, VideoFileClip
 from red_commons.logging import getLogger
 from redbot.core import checks, commands
 from redbot.core.data_manager import cog_data_path
 from discord.ext.commands import clean_content
 from typing import Optional
 
-logging.captureWarnings(False)
-
+from .cache import VideoCache, cache_key
+from .jobs import QueueFull, RenderQueue
+from .render import CRAB, MIKU, RaveRenderer, RaveTemplate
 
-CRAB_LINK = "https://youtu.be/gDLE3LikgUs"
+logging.captureWarnings(False)
 
-MIKU_LINK = "https://youtu.be/qeJjQGF6gz4"
 
 FONT_FILE = "https://github.com/matomo-org/travis-scripts/raw/master/fonts/Verdana.ttf"
 log = getLogger("red.trusty-cogs.crabrave")
@@ -30,10 +28,16 @@ class CrabRave(commands.Cog):
     """
 
     __author__ = ["DankMemer Team", "TrustyJAID", "thisisjvgrace"]
-    __version__ = "1.1.3"
+    __version__ = "1.3.0"
 
     def __init__(self, bot):
         self.bot = bot
+        self.renderer = RaveRenderer(cog_data_path(self))
+        self.cache = VideoCache(cog_data_path(self) / "cache")
+        self.render_queue = RenderQueue(self.renderer, self.cache)
+
+    async def cog_unload(self):
+        self.render_queue.cancel_all()
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -53,12 +57,14 @@ class CrabRave(commands.Cog):
         """
         return
 
-    async def check_video_file(self, link: str, name_template: str) -> bool:
-        if not (cog_data_path(self) / name_template).is_file():
+    async def check_video_file(self, template: RaveTemplate) -> bool:
+        if not (cog_data_path(self) / template.filename).is_file():
+            # a new download means the base video needs to be built again
+            self.renderer.forget(template)
             try:
                 loop = asyncio.get_running_loop()
                 task = functools.partial(
-                    self.dl_from_youtube, link=link, name_template=name_template
+                    self.dl_from_youtube, link=template.link, name_template=template.filename
                 )
                 task = loop.run_in_executor(None, task)
                 return await asyncio.wait_for(task, timeout=60)
@@ -96,145 +102,89 @@ class CrabRave(commands.Cog):
                 return False
         return True
 
-    @commands.hybrid_command()
-    @commands.cooldown(1, 20, commands.BucketType.guild)
-    @commands.max_concurrency(2, commands.BucketType.default)
-    @checks.bot_has_permissions(attach_files=True)
-    async def crabrave(self, ctx: commands.Context, *, is_gone: clean_content):
-        """Make crab rave videos. You can split the message with a comma."""
+    async def make_rave(self, ctx: commands.Context, template: RaveTemplate, is_gone: str) -> None:
         async with ctx.typing():
-            if not await self.check_video_file(CRAB_LINK, "crab_template.mp4"):
+            if not await self.check_video_file(template):
                 return await ctx.send("I couldn't download the template file.")
             if not await self.check_font_file():
                 return await ctx.send("I couldn't download the font file.")
-            
-            text = is_gone.upper().split(",") if is_gone else []
+
+            text = is_gone.upper().replace(", ", ",").split(",") if is_gone else []
             text = [txt.strip() for txt in text if txt.strip()]
             if len(text) == 1:
                 text.append("IS GONE")
 
             if text:
-                fake_task = functools.partial(self.make_crab, t=text, u_id=ctx.message.id)
-                task = self.bot.loop.run_in_executor(None, fake_task)
+                fp = self.cache.get(cache_key(template, text))
+            else:
+                fp = cog_data_path(self) / template.filename
+            if fp is None:
+                try:
+                    job = self.render_queue.submit(template, text)
+                except QueueFull:
+                    await ctx.send("There are too many videos waiting to render, try again later.")
+                    return
+                position = self.render_queue.position(job)
+                if position:
+                    msg = f"You are number {position} in the queue."
+                    eta = self.render_queue.eta(job)
+                    if eta is not None:
+                        msg += f" Your video should be ready in about {int(eta)} seconds."
+                    await ctx.send(msg)
                 try:
-                    await asyncio.wait_for(task, timeout=300)
+                    # shielded since identical requests share the same job
+                    fp = await asyncio.shield(job.future)
                 except asyncio.TimeoutError:
-                    # log.error("Error generating crabrave video", exc_info=True)
-                    await ctx.send("Crabrave Video took too long to generate.")
+                    await ctx.send(f"{template.name.title()}rave Video took too long to generate.")
                     return
-                fp = cog_data_path(self) / f"{ctx.message.id}crabrave.mp4"
-            else:
-                fp = cog_data_path(self) / f"crab_template.mp4"
-                
-            file = discord.File(str(fp), filename="crabrave.mp4")
+                except Exception:
+                    # RenderError from ffmpeg or anything else the render raised,
+                    # such as ffmpeg missing entirely
+                    log.error("Error generating %srave video", template.name, exc_info=True)
+                    await ctx.send(f"There was an error generating the {template.name}rave video.")
+                    return
+
+            file = discord.File(str(fp), filename=f"{template.name}rave.mp4")
             try:
                 await ctx.send(files=[file])
             except Exception:
-                log.error("Error sending crabrave video", exc_info=True)
+                log.error("Error sending %srave video", template.name, exc_info=True)
                 pass
-            if text:
-                try:
-                    os.remove(fp)
-                except Exception:
-                    log.error("Error deleting crabrave video", exc_info=True)
 
-    def make_crab(self, t: str, u_id: int) -> bool:
-        """Non blocking crab rave video generation from DankMemer bot
-        https://github.com/DankMemer/meme-server/blob/master/endpoints/crab.py
-        """
-        fp = str(cog_data_path(self) / f"Verdana.ttf")
-        clip = VideoFileClip(str(cog_data_path(self)) + "/crab_template.mp4")
-        # clip.volume(0.5)
-        text = TextClip(t[0], fontsize=48, color="white", stroke_width=2, stroke_color="black", font=fp)\
-            .set_position(("center", 200)).set_duration(15.4)
-        text2 = TextClip("____________________", fontsize=48, color="white", font=fp)\
-            .set_position(("center", 210)).set_duration(15.4)
-        text3 = TextClip(t[1], fontsize=48, color="white", stroke_width=2, stroke_color="black", font=fp)\
-            .set_position(("center", 270)).set_duration(15.4)
-        video = CompositeVideoClip([clip, text.crossfadein(1), text2.crossfadein(1), text3.crossfadein(1)])\
-            .set_duration(15.4)
-        video = video.volumex(0.1)
-        video.write_videofile(
-            str(cog_data_path(self)) + f"/{u_id}crabrave.mp4",
-            threads=1,
-            preset="superfast",
-            verbose=False,
-            logger=None,
-            temp_audiofile=str(cog_data_path(self) / f"{u_id}crabraveaudio.mp3")
-            # ffmpeg_params=["-filter:a", "volume=0.5"]
-        )
-        clip.close()
-        video.close()
-        return True
+    @commands.hybrid_command()
+    @commands.cooldown(1, 20, commands.BucketType.guild)
+    @checks.bot_has_permissions(attach_files=True)
+    async def crabrave(self, ctx: commands.Context, *, is_gone: clean_content):
+        """Make crab rave videos. You can split the message with a comma."""
+        await self.make_rave(ctx, CRAB, is_gone)
 
     @commands.hybrid_command()
     @commands.cooldown(1, 20, commands.BucketType.guild)
-    @commands.max_concurrency(2, commands.BucketType.default)
     @checks.bot_has_permissions(attach_files=True)
     async def mikurave(self, ctx: commands.Context, *, is_gone: clean_content):
         """Make miku rave videos. You can split the message with a comma."""
-        async with ctx.typing():
-            if not await self.check_video_file(MIKU_LINK, "miku_template.mp4"):
-                return await ctx.send("I couldn't download the template file.")
-            if not await self.check_font_file():
-                return await ctx.send("I couldn't download the font file.")
-            
-            text = is_gone.upper().replace(", ", ",").split(",") if is_gone else []
-            text = [txt.strip() for txt in text if txt.strip()]
-            if len(text) == 1:
-                text.append("IS GONE")
-
-            if text:
-                fake_task = functools.partial(self.make_miku, t=text, u_id=ctx.message.id)
-                task = self.bot.loop.run_in_executor(None, fake_task)
-
-                try:
-                    await asyncio.wait_for(task, timeout=300)
-                except asyncio.TimeoutError:
-                    # log.error("Error generating mikurave video", exc_info=True)
-                    await ctx.send("Mikurave Video took too long to generate.")
-                    return
-                fp = cog_data_path(self) / f"{ctx.message.id}mikurave.mp4"
-            else:
-                fp = cog_data_path(self) / "miku_template.mp4"
-
-            file = discord.File(str(fp), filename="mikurave.mp4")
-            try:
-                await ctx.send(files=[file])
-            except Exception:
-                log.error("Error sending mikurave video", exc_info=True)
-                pass
-            if text:
-                try:
-                    os.remove(fp)
-                except Exception:
-                    log.error("Error deleting mikurave video", exc_info=True)
-
-    def make_miku(self, t: str, u_id: int) -> bool:
-        """Non blocking miku rave video generation from DankMemer bot
-        https://github.com/DankMemer/meme-server/blob/master/endpoints/crab.py
-        """
-        fp = str(cog_data_path(self) / f"Verdana.ttf")
-        clip = VideoFileClip(str(cog_data_path(self)) + "/miku_template.mp4")
-        # clip.volume(1.0)
-        text = TextClip(t[0], fontsize=48, color="DarkSlateGrey", font=fp)\
-            .set_position(("center", 200)).set_duration(40.0)
-        text2 = TextClip("____________________", fontsize=48, color="DarkSlateGrey", font=fp)\
-            .set_position(("center", 210)).set_duration(40.0)
-        text3 = TextClip(t[1], fontsize=48, color="DarkSlateGrey", font=fp)\
-            .set_position(("center", 270)).set_duration(40.0)
-        video = CompositeVideoClip([clip, text.crossfadein(1), text2.crossfadein(1), text3.crossfadein(1)])\
-            .set_duration(40.0)
-        video = video.volumex(0.7)
-        video.write_videofile(
-            str(cog_data_path(self)) + f"/{u_id}mikurave.mp4",
-            threads=1,
-            preset="superfast",
-            verbose=False,
-            logger=None,
-            temp_audiofile=str(cog_data_path(self) / f"{u_id}mikuraveaudio.mp3")
-            # ffmpeg_params=["-filter:a", "volume=0.5"]
+        await self.make_rave(ctx, MIKU, is_gone)
+
+    @commands.command()
+    @commands.is_owner()
+    async def ravestats(self, ctx: commands.Context):
+        """Show render times, the render queue and the video cache."""
+        msg = ""
+        for template in (CRAB, MIKU):
+            count = self.render_queue.stats.count(template)
+            if not count:
+                msg += f"{template.name.title()}rave: No renders yet\n"
+                continue
+            p50, p90, p99 = (
+                self.render_queue.stats.percentile(template, pct) for pct in (50, 90, 99)
+            )
+            msg += (
+                f"{template.name.title()}rave: {count} renders "
+                f"p50 `{p50:.1f}s` p90 `{p90:.1f}s` p99 `{p99:.1f}s`\n"
+            )
+        msg += (
+            f"Rendering: {self.render_queue.active} Queued: {self.render_queue.pending}\n"
+            f"Cache: {self.cache.total_size / 1024 / 1024:.1f} MiB "
+            f"Hits: {self.cache.hits} Misses: {self.cache.misses}"
         )
-        clip.close()
-        video.close()
-        return True
+        await ctx.send(msg)
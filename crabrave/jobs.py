@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from red_commons.logging import getLogger
+
+from .cache import VideoCache, cache_key
+from .render import RaveRenderer, RaveTemplate
+
+log = getLogger("red.trusty-cogs.crabrave")
+
+RENDER_TIMEOUT = 300
+
+
+class QueueFull(Exception):
+    """Raised when too many renders are already waiting"""
+
+    pass
+
+
+class RenderStats:
+    """Keeps the most recent render times per template"""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._times: Dict[str, Deque[float]] = {}
+
+    def record(self, template: RaveTemplate, seconds: float) -> None:
+        self._times.setdefault(template.name, deque(maxlen=self.size)).append(seconds)
+
+    def percentile(self, template: RaveTemplate, pct: float) -> Optional[float]:
+        times = sorted(self._times.get(template.name, []))
+        if not times:
+            return None
+        index = min(len(times) - 1, int(round(pct / 100 * (len(times) - 1))))
+        return times[index]
+
+    def count(self, template: RaveTemplate) -> int:
+        return len(self._times.get(template.name, []))
+
+
+class RenderJob:
+    def __init__(self, template: RaveTemplate, text: List[str], key: str):
+        self.template = template
+        self.text = text
+        self.key = key
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class RenderQueue:
+    """
+    A bounded FIFO of renders.
+
+    At most `workers` renders run at once. A render that starts while nothing
+    else is running or waiting lets the encoder use every core, otherwise the
+    cores are split between the workers. Identical requests that are already
+    queued or rendering share the same job rather than rendering twice.
+    """
+
+    def __init__(
+        self,
+        renderer: RaveRenderer,
+        cache: VideoCache,
+        workers: int = 2,
+        max_pending: int = 20,
+    ):
+        self.renderer = renderer
+        self.cache = cache
+        self.workers = workers
+        self.max_pending = max_pending
+        self.stats = RenderStats()
+        self._pending: Deque[RenderJob] = deque()
+        self._jobs: Dict[str, RenderJob] = {}
+        self._running: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def position(self, job: RenderJob) -> int:
+        """0 if the job is rendering otherwise its place in line"""
+        try:
+            return self._pending.index(job) + 1
+        except ValueError:
+            return 0
+
+    def eta(self, job: RenderJob) -> Optional[float]:
+        """Rough number of seconds until `job` is finished based on the median render"""
+        median = self.stats.percentile(job.template, 50)
+        if median is None:
+            return None
+        # every `workers` jobs ahead of us adds another full render
+        return median * (1 + self.position(job) // self.workers)
+
+    def submit(self, template: RaveTemplate, text: List[str]) -> RenderJob:
+        key = cache_key(template, text)
+        if key in self._jobs:
+            return self._jobs[key]
+        if len(self._pending) >= self.max_pending:
+            raise QueueFull
+        job = RenderJob(template, text, key)
+        self._jobs[key] = job
+        self._pending.append(job)
+        self._start_next()
+        return job
+
+    def _start_next(self) -> None:
+        while self._pending and self.active < self.workers:
+            job = self._pending.popleft()
+            if self.active == 0 and not self._pending:
+                threads = 0
+            else:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+            task = asyncio.create_task(self._run(job, threads))
+            self._running.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        self._start_next()
+
+    async def _run(self, job: RenderJob, threads: int) -> None:
+        tmp = self.cache.path / f"{job.key}.tmp.mp4"
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self.renderer.render(job.template, job.text, tmp, threads=threads),
+                timeout=RENDER_TIMEOUT,
+            )
+            path = self.cache.put(job.key, tmp)
+        except asyncio.CancelledError:
+            tmp.unlink(missing_ok=True)
+            job.future.cancel()
+            raise
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats.record(job.template, time.perf_counter() - start)
+            if not job.future.done():
+                job.future.set_result(path)
+        finally:
+            self._jobs.pop(job.key, None)
+
+    def cancel_all(self) -> None:
+        for job in self._pending:
+            job.future.cancel()
+        self._pending.clear()
+        for task in self._running:
+            task.cancel()
@@ -0,0 +1,211 @@
+import asyncio
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from moviepy.config import get_setting
+from moviepy.editor import CompositeVideoClip, TextClip, VideoFileClip
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.crabrave")
+
+
+class RenderError(Exception):
+    """Raised when ffmpeg fails to render a video"""
+
+    pass
+
+
+class RaveTemplate(NamedTuple):
+    name: str
+    link: str
+    duration: float
+    volume: float
+    colour: str
+    stroke: bool
+
+    @property
+    def filename(self) -> str:
+        """The template as downloaded from youtube"""
+        return f"{self.name}_template.mp4"
+
+    @property
+    def base_filename(self) -> str:
+        """The trimmed template with the volume applied and audio encoded once"""
+        return f"{self.name}_base.mp4"
+
+
+CRAB = RaveTemplate(
+    name="crab",
+    link="https://youtu.be/gDLE3LikgUs",
+    duration=15.4,
+    volume=0.1,
+    colour="white",
+    stroke=True,
+)
+MIKU = RaveTemplate(
+    name="miku",
+    link="https://youtu.be/qeJjQGF6gz4",
+    duration=40.0,
+    volume=0.7,
+    colour="DarkSlateGrey",
+    stroke=False,
+)
+
+
+async def run_ffmpeg(*args: str) -> None:
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg,
+        "-y",
+        "-loglevel",
+        "error",
+        *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        # Don't leave ffmpeg running when the command times out
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise RenderError(stderr.decode(errors="replace"))
+
+
+class RaveRenderer:
+    """
+    Renders rave videos by compositing only the text over a prepared base video.
+
+    The template is trimmed, has its volume adjusted and its audio encoded
+    once into a cached base video. Each request then renders the caption
+    into a single transparent image which ffmpeg fades in and overlays on
+    the base video while the audio stream is copied as is.
+    """
+
+    def __init__(self, data_path: Path):
+        self.data_path = data_path
+        self._info: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._base_locks: Dict[str, asyncio.Lock] = {}
+
+    async def prepare(self, template: RaveTemplate) -> Path:
+        """Build the base video for `template` if it doesn't exist yet"""
+        base = self.data_path / template.base_filename
+        lock = self._base_locks.setdefault(template.name, asyncio.Lock())
+        async with lock:
+            if not base.is_file():
+                log.debug("Building base video for %s", template.name)
+                tmp = base.with_suffix(".tmp.mp4")
+                await run_ffmpeg(
+                    "-i",
+                    str(self.data_path / template.filename),
+                    "-t",
+                    str(template.duration),
+                    "-af",
+                    f"volume={template.volume}",
+                    "-c:v",
+                    "libx264",
+                    "-preset",
+                    "veryfast",
+                    "-crf",
+                    "18",
+                    "-pix_fmt",
+                    "yuv420p",
+                    "-c:a",
+                    "aac",
+                    "-b:a",
+                    "160k",
+                    str(tmp),
+                )
+                tmp.replace(base)
+            if template.name not in self._info:
+                loop = asyncio.get_running_loop()
+                self._info[template.name] = await loop.run_in_executor(None, self._probe, base)
+        return base
+
+    def forget(self, template: RaveTemplate) -> None:
+        """Drop the cached base video, used when the template is downloaded again"""
+        self._info.pop(template.name, None)
+        try:
+            (self.data_path / template.base_filename).unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _probe(path: Path) -> Tuple[Tuple[int, int], float]:
+        clip = VideoFileClip(str(path), audio=False)
+        info = (tuple(clip.size), clip.fps)
+        clip.close()
+        return info
+
+    def render_overlay(
+        self, template: RaveTemplate, text: List[str], size: Tuple[int, int], path: Path
+    ) -> None:
+        """Render the caption layers into one transparent png, this is blocking"""
+        fp = str(self.data_path / "Verdana.ttf")
+        stroke = {"stroke_width": 2, "stroke_color": "black"} if template.stroke else {}
+        layers = [
+            TextClip(text[0], fontsize=48, color=template.colour, font=fp, **stroke).set_position(
+                ("center", 200)
+            ),
+            TextClip(
+                "____________________", fontsize=48, color=template.colour, font=fp
+            ).set_position(("center", 210)),
+            TextClip(text[1], fontsize=48, color=template.colour, font=fp, **stroke).set_position(
+                ("center", 270)
+            ),
+        ]
+        overlay = CompositeVideoClip(layers, size=size).set_duration(1)
+        overlay.save_frame(str(path), t=0, withmask=True)
+        overlay.close()
+        for layer in layers:
+            layer.close()
+
+    async def render(
+        self, template: RaveTemplate, text: List[str], output: Path, threads: int = 0
+    ) -> Path:
+        """
+        Render `text` over `template` into `output`.
+
+        `threads` is passed to the video encoder, 0 lets it use every core.
+        """
+        base = await self.prepare(template)
+        size, fps = self._info[template.name]
+        overlay = output.with_suffix(".png")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.render_overlay, template, text, size, overlay)
+        try:
+            await run_ffmpeg(
+                "-i",
+                str(base),
+                "-loop",
+                "1",
+                "-framerate",
+                str(fps),
+                "-i",
+                str(overlay),
+                "-filter_complex",
+                "[1:v]format=rgba,fade=t=in:st=0:d=1:alpha=1[text];"
+                "[0:v][text]overlay=0:0:shortest=1[v]",
+                "-map",
+                "[v]",
+                "-map",
+                "0:a?",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "superfast",
+                "-pix_fmt",
+                "yuv420p",
+                "-threads",
+                str(threads),
+                "-c:a",
+                "copy",
+                "-movflags",
+                "+faststart",
+                str(output),
+            )
+        finally:
+            overlay.unlink(missing_ok=True)
+        return output
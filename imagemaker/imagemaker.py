@@ -1,6 +1,5 @@
 import asyncio
 import functools
-import json
 import os
 import textwrap
 from io import BytesIO
@@ -16,6 +15,7 @@ from redbot.core import commands
 from redbot.core.data_manager import bundled_data_path, cog_data_path
 
 from .converter import ImageFinder
+from .templates import TRUMP_TEXT_SIZE, TemplateCache, fit_font, get_font, warp_frames
 
 log = getLogger("red.trusty-cogs.imagemaker")
 
@@ -44,10 +44,17 @@ class ImageMaker(commands.Cog):
         "Bruno Lemos (isnowillegal.com)",
         "Jo\u00e3o Pedro (isnowillegal.com)",
     ]
-    __version__ = "1.6.0"
+    __version__ = "1.7.1"
 
     def __init__(self, bot):
         self.bot = bot
+        self.templates = TemplateCache()
+
+    async def cog_load(self):
+        if TRUMP:
+            loop = asyncio.get_running_loop()
+            folder = bundled_data_path(self) / "trump_template"
+            loop.run_in_executor(None, self.templates.get_frames, folder)
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -397,7 +404,7 @@ class ImageMaker(commands.Cog):
                     f"Please visit {url} and save it to `{image_path}`"
                 )
 
-        template = Image.open(image_path)
+        template = self.templates.get_image(image_path)
         task = functools.partial(self.colour_convert, template=template, colour=colour)
         loop = asyncio.get_running_loop()
         task = loop.run_in_executor(None, task)
@@ -406,7 +413,6 @@ class ImageMaker(commands.Cog):
         except asyncio.TimeoutError:
             return None, None
         image.seek(0)
-        template.close()
         file = discord.File(image, filename=f"pill.{WEBP_OR_PNG}")
         file_size = image.tell()
         return file, file_size
@@ -453,7 +459,7 @@ class ImageMaker(commands.Cog):
                     f"Please visit {url} and save it to `{image_path}`"
                 )
 
-        template = Image.open(image_path)
+        template = self.templates.get_image(image_path)
         if user.display_avatar.is_animated() and is_gif:
             asset = BytesIO(await user.display_avatar.replace(format="gif", size=128).read())
             avatar = Image.open(asset)
@@ -468,9 +474,7 @@ class ImageMaker(commands.Cog):
         try:
             temp: BytesIO = await asyncio.wait_for(task, timeout=60)
         except asyncio.TimeoutError:
-            template.close()
             return None, 0
-        template.close()
         temp.seek(0)
         filename = "beautiful.gif" if is_gif else "beautiful.png"
         file = discord.File(temp, filename=filename)
@@ -493,7 +497,7 @@ class ImageMaker(commands.Cog):
                     f"Please visit {url} and save it to `{image_path}`"
                 )
 
-        template = Image.open(image_path)
+        template = self.templates.get_image(image_path)
         colour = user.colour.to_rgb()
         if user.display_avatar.is_animated() and is_gif:
             asset = BytesIO(await user.display_avatar.replace(format="gif", size=64).read())
@@ -512,9 +516,7 @@ class ImageMaker(commands.Cog):
         try:
             temp: BytesIO = await asyncio.wait_for(task, timeout=60)
         except asyncio.TimeoutError:
-            template.close()
             return None, 0
-        template.close()
         temp.seek(0)
         filename = "feels.gif" if is_gif else f"feels.{WEBP_OR_PNG}"
         file = discord.File(temp, filename=filename)
@@ -537,7 +539,7 @@ class ImageMaker(commands.Cog):
                     f"Please visit {url} and save it to `{image_path}`"
                 )
 
-        template = Image.open(image_path)
+        template = self.templates.get_image(image_path)
         avatar = None
         if type(text) == discord.Member:
             user = cast(discord.User, text)
@@ -558,7 +560,6 @@ class ImageMaker(commands.Cog):
             try:
                 temp: BytesIO = await asyncio.wait_for(task, timeout=60)
             except asyncio.TimeoutError:
-                template.close()
                 return None, 0
         else:
             task = functools.partial(self.make_wheeze_img, template=template, avatar=text)
@@ -567,9 +568,7 @@ class ImageMaker(commands.Cog):
             try:
                 temp = await asyncio.wait_for(task, timeout=60)
             except asyncio.TimeoutError:
-                template.close()
                 return None, 0
-        template.close()
         file_size = temp.tell()
         temp.seek(0)
         filename = "wheeze.gif" if is_gif else f"wheeze.{WEBP_OR_PNG}"
@@ -603,7 +602,6 @@ class ImageMaker(commands.Cog):
     def make_beautiful_gif(self, template: Image.Image, avatar: Image.Image) -> BytesIO:
         gif_list = [frame.copy() for frame in ImageSequence.Iterator(avatar)]
         img_list = []
-        num = 0
         temp = BytesIO()
         for frame in gif_list:
             template = template.convert("RGBA")
@@ -614,12 +612,10 @@ class ImageMaker(commands.Cog):
             template.paste(frame, (370, 330), frame)
             # temp2.thumbnail((320, 320), Image.Resampling.LANCZOS)
             img_list.append(template)
-            num += 1
-            # temp = BytesIO()
-            template.save(
-                temp, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
-            )
-            temp.name = "beautiful.gif"
+        template.save(
+            temp, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
+        )
+        temp.name = "beautiful.gif"
 
         return temp
 
@@ -669,7 +665,7 @@ class ImageMaker(commands.Cog):
     def make_banner(self, text: str, colour: discord.Colour) -> Tuple[discord.File, int]:
         # W, H = (300, 100)
         # im = Image.new("RGBA", (W, H), colour.to_rgb())
-        font = ImageFont.truetype(str(bundled_data_path(self) / "impact.ttf"), 18)
+        font = get_font(str(bundled_data_path(self) / "impact.ttf"), 18)
         # draw = ImageDraw.Draw(im)
         top, left, bottom, right = font.getbbox(text=text)
         size_w, size_h = (bottom - top, right - left)
@@ -718,19 +714,16 @@ class ImageMaker(commands.Cog):
     def make_wheeze_gif(self, template: Image.Image, avatar: Image.Image) -> BytesIO:
         gif_list = [frame.copy() for frame in ImageSequence.Iterator(avatar)]
         img_list = []
-        num = 0
-        temp = None
         for frame in gif_list:
             template = template.convert("RGBA")
             frame = frame.convert("RGBA")
             template.paste(frame, (60, 470), frame)
             img_list.append(template)
-            num += 1
-            temp = BytesIO()
-            template.save(
-                temp, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
-            )
-            temp.name = "beautiful.gif"
+        temp = BytesIO()
+        template.save(
+            temp, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0
+        )
+        temp.name = "beautiful.gif"
         return temp
 
     def make_wheeze_img(self, template: Image.Image, avatar: Image.Image):
@@ -742,7 +735,7 @@ class ImageMaker(commands.Cog):
             template.paste(avatar, (60, 470), avatar)
         else:
             font_loc = str(bundled_data_path(self) / "impact.ttf")
-            font1 = ImageFont.truetype(font_loc, 40)
+            font1 = get_font(font_loc, 40)
             draw = ImageDraw.Draw(template)
             margin = 40
             offset = 470
@@ -762,34 +755,32 @@ class ImageMaker(commands.Cog):
     def make_feels_gif(self, template: Image.Image, colour: str, avatar: Image.Image) -> BytesIO:
         gif_list = [frame.copy() for frame in ImageSequence.Iterator(avatar)]
         img_list = []
-        num = 0
-        temp = None
+        # The recoloured template is the same for every frame
+        template = template.convert("RGBA")
+        data = np.array(template)
+        red, green, blue, alpha = data.T
+        blue_areas = (red == 0) & (blue == 255) & (green == 0) & (alpha == 255)
+        data[..., :-1][blue_areas.T] = colour
+        recoloured = Image.fromarray(data)
         for frame in gif_list:
-            template = template.convert("RGBA")
-            # transparency = template.split()[-1].getdata()
-            data = np.array(template)
-            red, green, blue, alpha = data.T
-            blue_areas = (red == 0) & (blue == 255) & (green == 0) & (alpha == 255)
-            data[..., :-1][blue_areas.T] = colour
-            temp2 = Image.fromarray(data)
+            temp2 = recoloured.copy()
             frame = frame.convert("RGBA")
             frame = frame.rotate(-30, expand=True)
             frame = frame.resize((60, 60), Image.Resampling.LANCZOS)
             temp2.paste(frame, (40, 25), frame)
             # temp2.thumbnail((320, 320), Image.Resampling.LANCZOS)
             img_list.append(temp2)
-            num += 1
-            temp = BytesIO()
-            temp2.save(
-                temp,
-                format="GIF",
-                save_all=True,
-                append_images=img_list,
-                duration=0,
-                loop=0,
-                transparency=0,
-            )
-            temp.name = "feels.gif"
+        temp = BytesIO()
+        temp2.save(
+            temp,
+            format="GIF",
+            save_all=True,
+            append_images=img_list,
+            duration=0,
+            loop=0,
+            transparency=0,
+        )
+        temp.name = "feels.gif"
         return temp
 
     def make_feels_img(self, template: Image.Image, colour: str, avatar: Image.Image) -> BytesIO:
@@ -830,39 +821,26 @@ class ImageMaker(commands.Cog):
     """Code is from http://isnowillegal.com/ and made to work on redbot"""
 
     def make_trump_gif(self, text: str) -> Tuple[Optional[discord.File], int]:
-        folder = str(bundled_data_path(self)) + "/trump_template"
-        jsonPath = os.path.join(folder, "frames.json")
+        folder = bundled_data_path(self) / "trump_template"
 
         # Load frames
-        frames = json.load(open(jsonPath))
+        frames = self.templates.get_frames(folder)
 
-        # Used to compute motion blur
-        lastCorners = None
         textImage = self.generateText(text)
 
+        # Warp the text onto every frame that shows it in one pass
+        warped = iter(warp_frames(frames, textImage))
+
         # Will store all gif frames
         frameImages = []
 
         # Iterate trough frames
         for frame in frames:
-            # Load image
-            name = frame["file"]
-            filePath = os.path.join(folder, name)
-            finalFrame = None
-
-            # If it has transformations,
-            # process with opencv and convert back to pillow
-            if frame["show"]:
-                image = cv2.imread(filePath)
-
-                # Do rotoscope
-                image = self.rotoscope(image, textImage, frame)
-
-                # Show final result
-                # cv2.imshow(name, image)
-                finalFrame = self.cvImageToPillow(image)
+            # If it has transformations convert the warped frame back to pillow
+            if frame.show:
+                finalFrame = self.cvImageToPillow(next(warped))
             else:
-                finalFrame = Image.open(filePath)
+                finalFrame = frame.image
 
             frameImages.append(finalFrame)
         temp = BytesIO()
@@ -872,71 +850,22 @@ class ImageMaker(commands.Cog):
         )
         temp.name = "Trump.gif"
         temp.seek(0)
-        finalFrame.close()
         file = discord.File(temp)
         file_size = temp.tell()
         temp.close()
         return file, file_size
 
-    def rotoscope(self, dst, warp, properties: dict):
-        if not properties["show"]:
-            return dst
-
-        corners = properties["corners"]
-
-        wRows, wCols, wCh = warp.shape
-        rows, cols, ch = dst.shape
-
-        # Apply blur on warp
-        kernel = np.ones((5, 5), np.float32) / 25
-        warp = cv2.filter2D(warp, -1, kernel)
-
-        # Prepare points to be matched on Affine Transformation
-        pts1 = np.float32([[0, 0], [wCols, 0], [0, wRows]])
-        pts2 = np.float32(corners) * 2
-
-        # Enlarge image to multisample
-        dst = cv2.resize(dst, (cols * 2, rows * 2))
-
-        # Transform image with the Matrix
-        M = cv2.getAffineTransform(pts1, pts2)
-        cv2.warpAffine(
-            warp,
-            M,
-            (cols * 2, rows * 2),
-            dst,
-            flags=cv2.INTER_AREA,
-            borderMode=cv2.BORDER_TRANSPARENT,
-        )
-
-        # Sample back image size
-        dst = cv2.resize(dst, (cols, rows))
-
-        return dst
-
     def computeAndLoadTextFontForSize(
         self, drawer: ImageDraw.Draw, text: str, maxWidth: int
     ) -> ImageFont:
-        # global textFont
-
-        # Measure text and find out position
-        maxSize = 50
-        minSize = 6
-        curSize = maxSize
-        textFont = None
-        while curSize >= minSize:
-            textFont = ImageFont.truetype(
-                str(bundled_data_path(self)) + "/impact.ttf", size=curSize
-            )
-            size = drawer.textbbox((0, 0), text, font=textFont)
-            w = size[2] - size[0]
-            # w, h = drawer.textsize(text, font=textFont)
-
-            if w > maxWidth:
-                curSize -= 4
-            else:
-                return textFont
-        return textFont
+        # Sizes 50 down to 6 in steps of 4, searched with measured text widths
+        return fit_font(
+            drawer,
+            text,
+            str(bundled_data_path(self)) + "/impact.ttf",
+            maxWidth,
+            sizes=range(50, 5, -4),
+        )
 
     def generateText(self, text: str):
         # global impact, textFont
@@ -944,7 +873,7 @@ class ImageMaker(commands.Cog):
         txtColor = (20, 20, 20)
         bgColor = (224, 233, 237)
         # bgColor = (100, 0, 0)
-        imgSize = (160, 200)
+        imgSize = TRUMP_TEXT_SIZE
 
         # Create image
         image = Image.new("RGB", imgSize, bgColor)
@@ -960,7 +889,7 @@ class ImageMaker(commands.Cog):
         xCenter = (imgSize[0] - w) / 2
         yCenter = (50 - h) / 2
         draw.text((xCenter, 10 + yCenter), text, font=textFont, fill=txtColor)
-        impact = ImageFont.truetype(str(bundled_data_path(self)) + "/impact.ttf", 46)
+        impact = get_font(str(bundled_data_path(self)) + "/impact.ttf", 46)
         draw.text((12, 70), "IS NOW", font=impact, fill=txtColor)
         draw.text((10, 130), "ILLEGAL", font=impact, fill=txtColor)
 
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.imagemaker")
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+# The size of the "X IS NOW ILLEGAL" text image warped onto the trump frames
+TRUMP_TEXT_SIZE = (160, 200)
+WARP_KERNEL = np.ones((5, 5), np.float32) / 25
+
+
+class TemplateFrame(NamedTuple):
+    file: str
+    show: bool
+    # The affine destination points, already scaled for the 2x multisample
+    corners: Optional[np.ndarray]
+    # BGR array for frames that get text warped onto them
+    # and a PIL image for frames which are used as is
+    image: Union[np.ndarray, Image.Image]
+    # The frame upscaled 2x for multisampling, only for frames that are shown
+    background: Optional[np.ndarray] = None
+    # The affine matrix mapping the text image onto `background`
+    matrix: Optional[np.ndarray] = None
+
+
+def warp_matrix(corners: np.ndarray, warp_size: Tuple[int, int]) -> np.ndarray:
+    width, height = warp_size
+    pts1 = np.float32([[0, 0], [width, 0], [0, height]])
+    return cv2.getAffineTransform(pts1, corners)
+
+
+def warp_frames(frames: Sequence[TemplateFrame], warp: np.ndarray) -> List[np.ndarray]:
+    """
+    Warp `warp` onto every shown frame in `frames`.
+
+    The blur on the source and the upscaled backgrounds are shared across
+    every frame so each frame only costs the affine warp and the downsample.
+    The result is identical to running each frame through the blur, upscale,
+    warp and downsample steps one at a time.
+    """
+    warp = cv2.filter2D(warp, -1, WARP_KERNEL)
+    results = []
+    for frame in frames:
+        if not frame.show:
+            continue
+        rows, cols = frame.image.shape[:2]
+        dst = frame.background.copy()
+        cv2.warpAffine(
+            warp,
+            frame.matrix,
+            (cols * 2, rows * 2),
+            dst,
+            flags=cv2.INTER_AREA,
+            borderMode=cv2.BORDER_TRANSPARENT,
+        )
+        results.append(cv2.resize(dst, (cols, rows)))
+    return results
+
+
+@lru_cache(maxsize=256)
+def get_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a truetype font once per (font, size)"""
+    return ImageFont.truetype(path, size=size)
+
+
+def fit_font(
+    drawer: ImageDraw.ImageDraw, text: str, path: str, max_width: int, sizes: Sequence[int]
+) -> ImageFont.FreeTypeFont:
+    """
+    Find the largest font size in `sizes` where `text` fits inside `max_width`.
+
+    `sizes` must be sorted from largest to smallest. Text width grows with the
+    font size so this is a binary search using the measured text bounding box.
+    The smallest size is returned if nothing fits.
+    """
+    lo, hi = 0, len(sizes) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        font = get_font(path, sizes[mid])
+        left, top, right, bottom = drawer.textbbox((0, 0), text, font=font)
+        if right - left > max_width:
+            lo = mid + 1
+        else:
+            hi = mid
+    return get_font(path, sizes[lo])
+
+
+class TemplateCache:
+    """
+    Decoded template images and frame data held in memory.
+
+    Everything returned from here is shared between threads
+    and must not be modified in place.
+    """
+
+    def __init__(self):
+        self._images: Dict[str, Image.Image] = {}
+        self._frames: Dict[str, List[TemplateFrame]] = {}
+        self._lock = threading.Lock()
+
+    def get_image(self, path: Union[str, Path]) -> Image.Image:
+        key = str(path)
+        im = self._images.get(key)
+        if im is None:
+            with Image.open(key) as fp:
+                fp.load()
+                im = fp.copy()
+            with self._lock:
+                im = self._images.setdefault(key, im)
+        return im
+
+    def forget(self, path: Union[str, Path]) -> None:
+        with self._lock:
+            self._images.pop(str(path), None)
+
+    def get_frames(
+        self, folder: Union[str, Path], warp_size: Tuple[int, int] = TRUMP_TEXT_SIZE
+    ) -> List[TemplateFrame]:
+        """
+        Load `frames.json` and every frame it references from `folder`.
+
+        Frames which get an image warped onto them also have their multisampled
+        background and affine matrix for an image of `warp_size` precomputed.
+
+        This is blocking and should be run in an executor.
+        """
+        key = str(folder)
+        frames = self._frames.get(key)
+        if frames is not None:
+            return frames
+        with open(os.path.join(key, "frames.json")) as infile:
+            data = json.load(infile)
+        frames = []
+        for frame in data:
+            file_path = os.path.join(key, frame["file"])
+            if frame["show"]:
+                image = cv2.imread(file_path)
+                corners = np.float32(frame["corners"]) * 2
+                rows, cols = image.shape[:2]
+                background = cv2.resize(image, (cols * 2, rows * 2))
+                matrix = warp_matrix(corners, warp_size)
+                frames.append(
+                    TemplateFrame(frame["file"], True, corners, image, background, matrix)
+                )
+            else:
+                with Image.open(file_path) as fp:
+                    fp.load()
+                    image = fp.copy()
+                frames.append(TemplateFrame(frame["file"], False, None, image))
+        with self._lock:
+            frames = self._frames.setdefault(key, frames)
+        return frames
@@ -1,5 +1,5 @@
 import re
-from typing import Pattern, Union
+from typing import Dict, FrozenSet, NamedTuple, Pattern, Union
 
 import discord
 from discord.ext.commands.converter import IDConverter, InviteConverter
@@ -9,16 +9,29 @@ from redbot.core import Config, VersionInfo, commands, version_info
 from redbot.core.i18n import Translator
 from redbot.core.utils.chat_formatting import humanize_list, pagify
 
+from .invites import InviteCache
+
 log = getLogger("red.trusty-cogs.inviteblocklist")
 
 _ = Translator("ExtendedModLog", __file__)
 
 INVITE_RE: Pattern = re.compile(
-    r"(?:https?\:\/\/)?discord(?:\.gg|(?:app)?\.com\/invite)\/(.+)", re.I
+    r"(?:https?\:\/\/)?discord(?:\.gg|(?:app)?\.com\/invite)\/([a-zA-Z0-9\-]+)", re.I
 )
 # https://github.com/Rapptz/discord.py/blob/master/discord/utils.py#L448
 
 
+class GuildSettings(NamedTuple):
+    all_invites: bool
+    blocklist: FrozenSet[int]
+    allowlist: FrozenSet[int]
+    immunity_list: FrozenSet[int]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.all_invites or self.blocklist or self.allowlist)
+
+
 class ValidServerID(IDConverter):
     async def convert(self, ctx: commands.Context, argument: str):
         match = self._get_id_match(argument)
@@ -78,7 +91,7 @@ class ChannelUserRole(IDConverter):
 
 class InviteBlocklist(commands.Cog):
     __author__ = ["TrustyJAID"]
-    __version__ = "1.1.3"
+    __version__ = "1.2.0"
 
     def __init__(self, bot):
         self.bot = bot
@@ -89,6 +102,27 @@ class InviteBlocklist(commands.Cog):
             all_invites=False,
             immunity_list=[],
         )
+        self.invites = InviteCache(bot)
+        self._settings: Dict[int, GuildSettings] = {}
+
+    async def cog_unload(self):
+        self.invites.clear()
+
+    async def cog_after_invoke(self, ctx: commands.Context):
+        # any command here may have changed the settings
+        if ctx.guild is not None:
+            self._settings.pop(ctx.guild.id, None)
+
+    async def get_settings(self, guild: discord.Guild) -> GuildSettings:
+        if guild.id not in self._settings:
+            data = await self.config.guild(guild).all()
+            self._settings[guild.id] = GuildSettings(
+                all_invites=data["all_invites"],
+                blocklist=frozenset(data["blacklist"]),
+                allowlist=frozenset(data["whitelist"]),
+                immunity_list=frozenset(data["immunity_list"]),
+            )
+        return self._settings[guild.id]
 
     async def red_delete_data_for_user(self, **kwargs):
         """
@@ -121,12 +155,8 @@ class InviteBlocklist(commands.Cog):
         if version_info >= VersionInfo.from_str("3.4.0"):
             if await self.bot.cog_disabled_in_guild(self, guild):
                 return
-        guild_settings = await self.config.guild(guild).all()
-        if (
-            guild_settings["blacklist"]
-            or guild_settings["whitelist"]
-            or guild_settings["all_invites"]
-        ):
+        guild_settings = await self.get_settings(guild)
+        if guild_settings.enabled:
             try:
                 msg = await chan.fetch_message(payload.message_id)
             except (discord.errors.Forbidden, discord.errors.NotFound):
@@ -142,7 +172,7 @@ class InviteBlocklist(commands.Cog):
         global_perms = await self.bot.allowed_by_whitelist_blacklist(message.author)
         if not global_perms:
             return global_perms
-        immunity_list = await self.config.guild(message.guild).immunity_list()
+        immunity_list = (await self.get_settings(message.guild)).immunity_list
         channel = message.channel
         if immunity_list:
             if channel.id in immunity_list:
@@ -159,6 +189,12 @@ class InviteBlocklist(commands.Cog):
         return is_immune
 
     async def _handle_message_search(self, message: discord.Message):
+        settings = await self.get_settings(message.guild)
+        if not settings.enabled:
+            return
+        find = INVITE_RE.findall(message.clean_content)
+        if not find:
+            return
         if await self.bot.is_automod_immune(message.author):
             return
         if version_info >= VersionInfo.from_str("3.4.0"):
@@ -167,50 +203,31 @@ class InviteBlocklist(commands.Cog):
         if await self.check_immunity_list(message) is True:
             log.debug("Message context is immune from invite blocklist")
             return
-        find = INVITE_RE.findall(message.clean_content)
         guild = message.guild
-        if find and await self.config.guild(message.guild).all_invites():
-            try:
-                await message.delete()
-            except discord.errors.Forbidden:
-                log.error(
-                    "I tried to delete an invite link posted in %s "
-                    "but lacked the permission to do so",
-                    guild.name,
-                )
+        if settings.all_invites:
+            await self._delete(message)
             return
-        if whitelist := await self.config.guild(message.guild).whitelist():
-            for i in find:
-                invite = await self.bot.fetch_invite(i)
-                if invite.guild.id == message.guild.id:
-                    continue
-                if invite.guild.id not in whitelist:
-                    try:
-                        await message.delete()
-                    except discord.errors.Forbidden:
-                        log.error(
-                            "I tried to delete an invite link posted in %s "
-                            "but lacked the permission to do so",
-                            guild.name,
-                        )
-                    return
-            return
-        if blacklist := await self.config.guild(message.guild).blacklist():
-            for i in find:
-                invite = await self.bot.fetch_invite(i)
-                if invite.guild.id == message.guild.id:
-                    continue
-                if invite.guild.id in blacklist:
-                    try:
-                        await message.delete()
-                    except discord.errors.Forbidden:
-                        log.error(
-                            "I tried to delete an invite link posted in %s "
-                            "but lacked the permission to do so",
-                            guild.name,
-                        )
+        for code in dict.fromkeys(find):
+            guild_id = await self.invites.guild_id(code)
+            if guild_id is None or guild_id == guild.id:
+                continue
+            if settings.allowlist:
+                if guild_id not in settings.allowlist:
+                    await self._delete(message)
                     return
-            return
+            elif guild_id in settings.blocklist:
+                await self._delete(message)
+                return
+
+    async def _delete(self, message: discord.Message):
+        try:
+            await message.delete()
+        except discord.errors.Forbidden:
+            log.error(
+                "I tried to delete an invite link posted in %s "
+                "but lacked the permission to do so",
+                message.guild.name,
+            )
 
     @commands.group(name="inviteblock", aliases=["ibl", "inviteblocklist"])
     @commands.mod_or_permissions(manage_messages=True)
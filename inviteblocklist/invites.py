@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Dict, NamedTuple, Optional
+
+import discord
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.inviteblocklist")
+
+# How long a working invite is trusted before asking discord again
+INVITE_TTL = 60 * 60
+# Unknown invites are remembered for less time in case they're created later
+INVALID_TTL = 10 * 60
+MAX_ENTRIES = 10000
+
+
+class CachedInvite(NamedTuple):
+    # None when discord doesn't know the invite
+    guild_id: Optional[int]
+    expires: float
+
+
+class InviteCache:
+    """
+    Maps invite codes to the guild they point to.
+
+    Invites that don't exist are cached as well so spam with the same bad
+    invite doesn't keep asking discord. Lookups for a code which is already
+    being fetched wait on that request rather than making their own.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._invites: Dict[str, CachedInvite] = {}
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def guild_id(self, code: str) -> Optional[int]:
+        """The ID of the guild `code` invites to or None if it's not a valid invite"""
+        cached = self._invites.get(code)
+        if cached is not None:
+            if cached.expires > time.monotonic():
+                self.hits += 1
+                return cached.guild_id
+            del self._invites[code]
+        self.misses += 1
+        if code not in self._fetching:
+            task = asyncio.create_task(self._fetch(code))
+            self._fetching[code] = task
+            task.add_done_callback(lambda t: self._fetching.pop(code, None))
+        return await asyncio.shield(self._fetching[code])
+
+    async def _fetch(self, code: str) -> Optional[int]:
+        now = time.monotonic()
+        try:
+            invite = await self.bot.fetch_invite(code, with_counts=False)
+        except discord.NotFound:
+            self._store(code, CachedInvite(None, now + INVALID_TTL))
+            return None
+        except discord.HTTPException:
+            # don't cache errors that aren't about the invite itself
+            log.debug("Error fetching invite %s", code, exc_info=True)
+            return None
+        guild_id = invite.guild.id if invite.guild else None
+        ttl = INVITE_TTL
+        if invite.expires_at is not None:
+            ttl = min(ttl, (invite.expires_at - discord.utils.utcnow()).total_seconds())
+        self._store(code, CachedInvite(guild_id, now + max(ttl, 0)))
+        return guild_id
+
+    def _store(self, code: str, invite: CachedInvite) -> None:
+        self._invites[code] = invite
+        if len(self._invites) > MAX_ENTRIES:
+            # dicts keep insertion order so this drops the oldest invite
+            del self._invites[next(iter(self._invites))]
+
+    def clear(self) -> None:
+        self._invites.clear()
+        for task in self._fetching.values():
+            task.cancel()
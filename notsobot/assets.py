@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+from PIL import Image, ImageFont
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.NotSoBot")
+
+VW_DIR = Path(__file__).parent / "vw"
+VW_CATEGORIES = ("bubbles", "windows", "background", "pics", "greek")
+# Decoded images are much larger than the files on disk
+# so cap how much memory the registry is allowed to hold onto
+DEFAULT_BUDGET = 64 * 1024 * 1024
+MAX_FONTS = 256
+
+PathLike = Union[str, os.PathLike]
+
+
+class AssetRegistry:
+    """
+    Decoded templates and fonts shared by every effect.
+
+    Images returned from here are shared between threads and must be treated
+    as read-only, use `Image.copy()` before drawing onto them. Anything that
+    would push the registry past its memory budget is decoded and returned
+    without being kept so effects keep working, they just pay the disk cost.
+    """
+
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self._images: Dict[str, Image.Image] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._fonts: "OrderedDict[Tuple[str, int], ImageFont.FreeTypeFont]" = OrderedDict()
+        self._dirs: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, cache: dict, key: str, value, size: int):
+        with self._lock:
+            if key in cache:
+                # another thread decoded this at the same time
+                return cache[key]
+            if self.used + size > self.budget:
+                log.debug("Asset budget exhausted, not caching %s", key)
+                return value
+            cache[key] = value
+            self.used += size
+            return value
+
+    def vaporwave(self, category: str) -> List[str]:
+        """The paths of every vaporwave asset in `category`"""
+        if category not in self._dirs:
+            folder = VW_DIR / "img" / "png" / category
+            self._dirs[category] = sorted(
+                str(folder / i) for i in os.listdir(folder) if i != "Thumbs.db"
+            )
+        return self._dirs[category]
+
+    def get_image(self, path: PathLike) -> Image.Image:
+        """
+        Get the decoded image at `path`.
+
+        The returned image is shared, do not modify it.
+        """
+        key = str(path)
+        im = self._images.get(key)
+        if im is not None:
+            return im
+        with Image.open(key) as fp:
+            fp.load()
+            # copy so the file handle is released even for multi-frame formats
+            im = fp.copy()
+        return self._store(self._images, key, im, im.width * im.height * len(im.getbands()))
+
+    def get_bytes(self, path: PathLike) -> bytes:
+        """Get the raw contents of `path`, mostly for templates wand decodes"""
+        key = str(path)
+        data = self._blobs.get(key)
+        if data is not None:
+            return data
+        with open(key, "rb") as infile:
+            data = infile.read()
+        return self._store(self._blobs, key, data, len(data))
+
+    def get_font(self, path: PathLike, size: int) -> ImageFont.FreeTypeFont:
+        key = (str(path), size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                return font
+        font = ImageFont.truetype(key[0], size)
+        with self._lock:
+            self._fonts[key] = font
+            if len(self._fonts) > MAX_FONTS:
+                self._fonts.popitem(last=False)
+        return font
+
+    def forget(self, path: PathLike) -> None:
+        """Drop a cached asset, used when a template on disk is replaced"""
+        key = str(path)
+        with self._lock:
+            im = self._images.pop(key, None)
+            if im is not None:
+                self.used -= im.width * im.height * len(im.getbands())
+            data = self._blobs.pop(key, None)
+            if data is not None:
+                self.used -= len(data)
+
+    def preload(self, paths: Iterable[PathLike] = ()) -> None:
+        """
+        Decode every vaporwave asset plus any extra `paths` ahead of time.
+
+        This is blocking and should be run in an executor.
+        """
+        for category in VW_CATEGORIES:
+            for path in self.vaporwave(category):
+                try:
+                    self.get_image(path)
+                except Exception:
+                    log.exception("Error preloading %s", path)
+        for path in paths:
+            if os.path.isfile(path):
+                try:
+                    self.get_image(path)
+                except Exception:
+                    log.exception("Error preloading %s", path)
+        log.debug("Preloaded %s bytes of assets", self.used)
+
+
+assets = AssetRegistry()
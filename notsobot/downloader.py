@@ -0,0 +1,176 @@
+import asyncio
+from io import BytesIO
+from typing import Dict, Optional, Tuple, Union
+
+import aiohttp
+import discord
+from PIL import Image, UnidentifiedImageError
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.NotSoBot")
+
+# 25 MiB is the largest file discord will accept from a boosted guild
+# anything larger than this we could never send back anyway
+MAX_BYTES = 25 * 1024 * 1024
+MAX_DIMENSION = 8192
+MAX_PIXELS = 4096 * 4096
+MAX_FRAMES = 500
+# The total number of pixels across every frame, stops a 500 frame 4k gif
+MAX_TOTAL_PIXELS = 200_000_000
+# How much of the body to buffer before we try to read the image header
+HEADER_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    """Raised when an image could not be downloaded"""
+
+    pass
+
+
+class ImageTooLarge(DownloadError):
+    """Raised when an image exceeds one of the download limits"""
+
+    pass
+
+
+class ImageDownloader:
+    """
+    A shared downloader for images.
+
+    Holds a single pooled aiohttp session for the cog and streams
+    each download so that oversized files are dropped as soon as they
+    cross the byte limit. The image header is inspected as soon as
+    enough of the body is available so excessive dimensions or frame
+    counts are rejected before Wand or PIL ever decode the image.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = MAX_BYTES,
+        max_dimension: int = MAX_DIMENSION,
+        max_pixels: int = MAX_PIXELS,
+        max_frames: int = MAX_FRAMES,
+        max_total_pixels: int = MAX_TOTAL_PIXELS,
+    ):
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.max_frames = max_frames
+        self.max_total_pixels = max_total_pixels
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"User-Agent": "Red-TrustyCogs-NotSoBot"},
+                timeout=aiohttp.ClientTimeout(total=60),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def get_text(self, url: str) -> str:
+        async with self.session.get(url) as resp:
+            return await resp.text()
+
+    async def download(
+        self, url: Union[discord.Asset, discord.Attachment, str], headers: Dict[str, str] = {}
+    ) -> Tuple[BytesIO, Optional[str]]:
+        """
+        Download an image into memory enforcing all the limits.
+
+        Raises `ImageTooLarge` when any limit is exceeded and `DownloadError`
+        for any other failure.
+        """
+        if isinstance(url, discord.Attachment):
+            if url.size > self.max_bytes:
+                raise ImageTooLarge(f"Attachment is {url.size} bytes.")
+            if url.width and url.height:
+                self.check_dimensions(url.width, url.height)
+            url = url.url
+        elif isinstance(url, discord.Asset):
+            url = url.url
+        try:
+            async with self.session.get(url, headers=headers) as resp:
+                if resp.status != 200:
+                    raise DownloadError(f"{resp.status} HTTP Response Error downloading {url}")
+                if resp.content_length and resp.content_length > self.max_bytes:
+                    raise ImageTooLarge(f"Content-Length is {resp.content_length} bytes.")
+                mime = resp.headers.get("Content-type", "").lower() or None
+                b = BytesIO()
+                checked_header = False
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    b.write(chunk)
+                    if b.tell() > self.max_bytes:
+                        raise ImageTooLarge(f"Body exceeded {self.max_bytes} bytes.")
+                    if not checked_header and b.tell() >= HEADER_BYTES:
+                        # only attempt this once, the full check happens after download
+                        self.check_header(b)
+                        checked_header = True
+        except asyncio.TimeoutError:
+            raise DownloadError(f"Timed out downloading {url}")
+        except aiohttp.ClientError as e:
+            raise DownloadError(f"Error downloading {url}") from e
+        b.seek(0)
+        return b, mime
+
+    def check_dimensions(self, width: int, height: int, frames: int = 1) -> None:
+        if width > self.max_dimension or height > self.max_dimension:
+            raise ImageTooLarge(f"Image dimensions {width}x{height} are too large.")
+        if width * height > self.max_pixels:
+            raise ImageTooLarge(f"Image has {width * height} pixels.")
+        if frames > self.max_frames:
+            raise ImageTooLarge(f"Image has {frames} frames.")
+        if width * height * frames > self.max_total_pixels:
+            raise ImageTooLarge(f"Image has {width * height * frames} pixels across all frames.")
+
+    def check_header(self, b: BytesIO) -> None:
+        """
+        Try to read the image dimensions from what has been downloaded so far.
+
+        Partial data that can't be parsed yet is ignored here since
+        `check_image` will run on the complete file.
+        """
+        pos = b.tell()
+        b.seek(0)
+        try:
+            with Image.open(BytesIO(b.read())) as im:
+                width, height = im.size
+        except Image.DecompressionBombError as e:
+            raise ImageTooLarge(str(e))
+        except Exception:
+            # svg and friends are handled by wand and truncated
+            # headers are checked again once the download completes
+            return
+        finally:
+            b.seek(pos)
+        self.check_dimensions(width, height)
+
+    def check_image(self, b: BytesIO) -> None:
+        """
+        Validate a fully downloaded image without decoding it.
+
+        PIL only reads the headers on open and `n_frames` skips
+        over the frame data so this is safe to run on untrusted input.
+        This is blocking and should be run in an executor.
+        """
+        b.seek(0)
+        try:
+            with Image.open(b) as im:
+                width, height = im.size
+                frames = getattr(im, "n_frames", 1)
+        except Image.DecompressionBombError as e:
+            raise ImageTooLarge(str(e))
+        except UnidentifiedImageError:
+            return
+        except Exception:
+            log.debug("Could not inspect image header", exc_info=True)
+            return
+        finally:
+            b.seek(0)
+        self.check_dimensions(width, height, frames)
@@ -0,0 +1,215 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+import wand
+import wand.image
+from PIL import Image, ImageSequence
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.NotSoBot")
+
+FRAMES_PER_CHUNK = 8
+
+
+class FrameInfo(NamedTuple):
+    delay: int
+    dispose: str
+
+
+class SplitGif(NamedTuple):
+    chunks: List[bytes]
+    frames: List[FrameInfo]
+    loop: int
+
+
+def split_gif(
+    blob: bytes, chunk_size: int = FRAMES_PER_CHUNK, coalesce: bool = False
+) -> Optional[SplitGif]:
+    """
+    Split an animated image into chunks of frames.
+
+    Each chunk is a standalone blob which can be sent to another process.
+    When `coalesce` is `True` every frame is flattened onto the full canvas
+    and the chunks are encoded as gif so that PIL can read them, otherwise
+    the chunks are lossless miff blobs that keep the original frame offsets.
+
+    Returns `None` if the image only has a single frame.
+    """
+    with wand.image.Image(blob=blob) as img:
+        if len(img.sequence) <= 1:
+            return None
+        if coalesce:
+            img.coalesce()
+        loop = img.loop
+        frames = []
+        for frame in img.sequence:
+            frames.append(FrameInfo(frame.delay, frame.dispose))
+        chunks = []
+        for start in range(0, len(img.sequence), chunk_size):
+            with wand.image.Image() as chunk:
+                for i in range(start, min(start + chunk_size, len(img.sequence))):
+                    with img.sequence[i] as frame:
+                        chunk.sequence.append(frame)
+                chunks.append(chunk.make_blob("gif" if coalesce else "miff"))
+    return SplitGif(chunks, frames, loop)
+
+
+def join_gif(
+    results: List[bytes], split: SplitGif, coalesced: bool = False, delay: Optional[int] = None
+) -> BytesIO:
+    """
+    Reassemble processed chunks into a single gif.
+
+    The original frame delays, unless `delay` is given, and loop count are
+    restored, as is the disposal method unless the frames were coalesced in
+    which case every frame covers the full canvas and is disposed to the background.
+    """
+    final = BytesIO()
+    with wand.image.Image() as new_image:
+        for blob in results:
+            with wand.image.Image(blob=blob) as chunk:
+                for frame in chunk.sequence:
+                    new_image.sequence.append(frame)
+        for frame, info in zip(new_image.sequence, split.frames):
+            frame.delay = info.delay if delay is None else delay
+            frame.dispose = "background" if coalesced else info.dispose
+        new_image.loop = split.loop
+        new_image.format = "gif"
+        new_image.type = "optimize"
+        new_image.save(file=final)
+    final.seek(0)
+    return final
+
+
+def magik_frames(blob: bytes) -> bytes:
+    """Liquid rescale every frame in a chunk, this runs in a worker process"""
+    with wand.image.Image() as new_image:
+        with wand.image.Image(blob=blob) as img:
+            for change in img.sequence:
+                change.transform(resize="512x512")
+                change.liquid_rescale(
+                    width=int(change.width * 0.5),
+                    height=int(change.height * 0.5),
+                    delta_x=1,
+                    rigidity=0,
+                )
+                change.liquid_rescale(
+                    width=int(change.width * 1.5),
+                    height=int(change.height * 1.5),
+                    delta_x=2,
+                    rigidity=0,
+                )
+                new_image.sequence.append(change)
+        return new_image.make_blob("miff")
+
+
+def pixelate_frames(blob: bytes, pixels: int) -> bytes:
+    """Pixelate every frame in a coalesced chunk, this runs in a worker process"""
+    bg = (0, 0, 0)
+    img_list = []
+    with Image.open(BytesIO(blob)) as image:
+        for frame in ImageSequence.Iterator(image):
+            img = Image.new("RGBA", frame.size)
+            img.paste(frame, (0, 0))
+            img = img.resize((int(img.size[0] / pixels), int(img.size[1] / pixels)), Image.NEAREST)
+            img = img.resize((int(img.size[0] * pixels), int(img.size[1] * pixels)), Image.NEAREST)
+            load = img.load()
+            for i in range(0, img.size[0], pixels):
+                for j in range(0, img.size[1], pixels):
+                    for r in range(pixels):
+                        load[i + r, j] = bg
+                        load[i, j + r] = bg
+            img_list.append(img)
+    # multi-page tiff keeps every frame as a full lossless canvas
+    # which gif would not since PIL crops each frame to the changed area
+    result = BytesIO()
+    img_list[0].save(result, format="TIFF", save_all=True, append_images=img_list[1:])
+    for img in img_list:
+        img.close()
+    return result.getvalue()
+
+
+class FrameSharder:
+    """
+    Process animated images across multiple worker processes.
+
+    Animated inputs are split into chunks of frames which are handed to
+    a shared process pool. Each request may only occupy `per_request`
+    workers at a time so that one large gif cannot take every core
+    away from everyone else using the cog.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        per_request: Optional[int] = None,
+        chunk_size: int = FRAMES_PER_CHUNK,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.per_request = per_request or max(1, self.max_workers // 2)
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run_chunk(self, semaphore: asyncio.Semaphore, func: Callable, *args: Any) -> bytes:
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            executor = self.executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # a worker died, usually from running out of memory
+                # reset the pool for the next request and finish this one in a thread
+                log.error("Frame worker pool broke, falling back to threads")
+                if self._executor is executor:
+                    # other chunks may have already replaced the broken pool
+                    self.shutdown()
+                return await loop.run_in_executor(None, func, *args)
+
+    async def process(
+        self,
+        b: BytesIO,
+        func: Callable[..., bytes],
+        *args: Any,
+        coalesce: bool = False,
+        delay: Optional[int] = None,
+    ) -> Optional[Tuple[BytesIO, int]]:
+        """
+        Run `func` over every chunk of frames in `b` and reassemble the result.
+
+        `func` must be a module level function so it can be pickled to the
+        worker processes. It receives the chunk blob followed by `args`
+        and returns a blob wand can read with the processed frames.
+        `delay` replaces the delay of every frame when given.
+
+        Returns `None` if the image is not animated.
+        """
+        loop = asyncio.get_running_loop()
+        b.seek(0)
+        blob = b.read()
+        split = await loop.run_in_executor(None, split_gif, blob, self.chunk_size, coalesce)
+        if split is None:
+            b.seek(0)
+            return None
+        log.debug("Processing %s frames in %s chunks", len(split.frames), len(split.chunks))
+        semaphore = asyncio.Semaphore(self.per_request)
+        results = await asyncio.gather(
+            *[self._run_chunk(semaphore, func, chunk, *args) for chunk in split.chunks]
+        )
+        final = await loop.run_in_executor(None, join_gif, results, split, coalesce, delay)
+        file_size = final.getbuffer().nbytes
+        return final, file_size
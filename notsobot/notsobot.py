@@ -11,7 +11,6 @@ from io import BytesIO
 from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import quote
 
-import aiohttp
 import discord
 import jpglitch
 import numpy as np
@@ -25,7 +24,10 @@ from red_commons.logging import getLogger
 from redbot.core import commands
 from redbot.core.data_manager import bundled_data_path, cog_data_path
 
+from .assets import assets
 from .converter import ImageFinder
+from .downloader import DownloadError, ImageDownloader, ImageTooLarge
+from .frames import FrameSharder, magik_frames, pixelate_frames
 from .vw import macintoshplus
 
 log = getLogger("red.trusty-cogs.NotSoBot")
@@ -94,7 +96,7 @@ class NotSoBot(commands.Cog):
     """
 
     __author__ = ["NotSoSuper", "TrustyJAID"]
-    __version__ = "2.5.5"
+    __version__ = "2.6.2"
 
     def __init__(self, bot):
         self.bot = bot
@@ -150,6 +152,21 @@ class NotSoBot(commands.Cog):
         )
         self.image_mimes = ["image/png", "image/pjpeg", "image/jpeg", "image/x-icon"]
         self.gif_mimes = ["image/gif"]
+        self.downloader = ImageDownloader()
+        self.frame_sharder = FrameSharder()
+        self.assets = assets
+
+    async def cog_load(self):
+        templates = [
+            cog_data_path(self) / name
+            for name in ("rip.jpg", "achievement.png", "brazzers.png", "triggered.jpg")
+        ]
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, self.assets.preload, templates)
+
+    async def cog_unload(self):
+        await self.downloader.close()
+        self.frame_sharder.shutdown()
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -172,14 +189,8 @@ class NotSoBot(commands.Cog):
 
     async def get_text(self, url: str):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    try:
-                        text = await resp.text()
-                        return text
-                    except Exception:
-                        return False
-        except asyncio.TimeoutError:
+            return await self.downloader.get_text(url)
+        except Exception:
             return False
 
     async def truncate(self, channel, msg):
@@ -235,40 +246,31 @@ class NotSoBot(commands.Cog):
     async def bytes_download(
         self, url: Union[discord.Asset, discord.Attachment, str]
     ) -> Tuple[Union[BytesIO, bool], Union[str, bool]]:
-        if isinstance(url, discord.Asset) or isinstance(url, discord.Attachment):
-            log.debug("Pulling data from discord")
-            try:
-                b = BytesIO()
-                await url.save(b)
-                mime = getattr(url, "content_type", "None")
-                if mime == "None":
-                    b.seek(0)
-                    image_header = b.read()[:20]
-                    mime = await self.determine_mime_type(str(image_header))
-                return b, mime
-            except discord.HTTPException:
-                return False, False
-
         try:
-            async with aiohttp.ClientSession() as session:
+            if isinstance(url, str):
                 headers = await self.get_headers(url)
-                async with session.get(url, headers=headers) as resp:
-                    if resp.status == 200:
-                        data = await resp.read()
-                        mime = resp.headers.get("Content-type", "").lower()
-                        b = BytesIO(data)
-                        b.seek(0)
-                        return b, mime
-                    else:
-                        log.error(
-                            "%s HTTP Response Error downloading image from %s", resp.status, url
-                        )
-                        return False, False
-        except asyncio.TimeoutError:
+            else:
+                log.debug("Pulling data from discord")
+                headers = {}
+            b, mime = await self.downloader.download(url, headers=headers)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.downloader.check_image, b)
+        except ImageTooLarge as e:
+            log.info("Refusing to process image from %s: %s", url, e)
+            return False, False
+        except DownloadError:
+            log.error("Error downloading image from %s", url, exc_info=True)
             return False, False
         except Exception:
             log.error("Error downloading to bytes", exc_info=True)
             return False, False
+        if mime is None:
+            mime = getattr(url, "content_type", None)
+        if mime is None:
+            image_header = b.read()[:20]
+            b.seek(0)
+            mime = await self.determine_mime_type(str(image_header))
+        return b, mime
 
     def do_magik(self, scale, img):
         img.seek(0)
@@ -328,7 +330,7 @@ class NotSoBot(commands.Cog):
                 return
             loop = asyncio.get_running_loop()
             if mime in self.gif_mimes:
-                task = loop.run_in_executor(None, self.do_gmagik, b, 1)
+                task = self.do_gmagik_sharded(b)
             else:
                 task = loop.run_in_executor(None, self.do_magik, scale, b)
             try:
@@ -410,6 +412,18 @@ class NotSoBot(commands.Cog):
         final.close()
         return file, file_size
 
+    async def do_gmagik_sharded(self, image: BytesIO, frame_delay: Optional[int] = None):
+        result = await self.frame_sharder.process(image, magik_frames, delay=frame_delay)
+        if result is None:
+            # Not actually animated so build the 30 frame magik sequence instead
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.do_gmagik, image, frame_delay)
+        final, file_size = result
+        filename = self.random_filename(True, "gif")
+        file = discord.File(final, filename=filename)
+        image.close()
+        return file, file_size
+
     @commands.command()
     @commands.cooldown(1, 20, commands.BucketType.guild)
     @commands.bot_has_permissions(attach_files=True)
@@ -430,7 +444,7 @@ class NotSoBot(commands.Cog):
                 return
             loop = asyncio.get_running_loop()
             if mime in self.gif_mimes:
-                task = loop.run_in_executor(None, self.do_gmagik, b, frame_delay)
+                task = self.do_gmagik_sharded(b, frame_delay)
             else:
                 task = loop.run_in_executor(None, self.do_magik, 2, b)
             try:
@@ -607,8 +621,7 @@ class NotSoBot(commands.Cog):
                     )
                     log.info("Please visit %s and save this image at `%s`.", url, img_path)
                     return
-            with img_path.open("rb") as infile:
-                trig = BytesIO(infile.read())
+            trig = BytesIO(self.assets.get_bytes(img_path))
             if img is False or trig is False:
                 await ctx.send(":warning: **Command download function failed...**")
                 return
@@ -691,7 +704,7 @@ class NotSoBot(commands.Cog):
             await self.safe_send(ctx, msg, file, file_size)
 
     def generate_ascii(self, image):
-        font = ImageFont.truetype(str(cog_data_path(self)) + "/FreeMonoBold.ttf", 15)
+        font = self.assets.get_font(str(cog_data_path(self)) + "/FreeMonoBold.ttf", 15)
         image_width, image_height = image.size
         aalib_screen_width = int(image_width / 24.9) * 10
         aalib_screen_height = int(image_height / 41.39) * 10
@@ -722,12 +735,11 @@ class NotSoBot(commands.Cog):
         try:
             ImageFont.truetype(cog_data_path(self) / "FreeMonoBold.ttf", 15)
         except Exception:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://github.com/opensourcedesign/fonts"
-                    "/raw/master/gnu-freefont_freemono/FreeMonoBold.ttf"
-                ) as resp:
-                    data = await resp.read()
+            async with self.downloader.session.get(
+                "https://github.com/opensourcedesign/fonts"
+                "/raw/master/gnu-freefont_freemono/FreeMonoBold.ttf"
+            ) as resp:
+                data = await resp.read()
                 with open(cog_data_path(self) / "FreeMonoBold.ttf", "wb") as save_file:
                     save_file.write(data)
 
@@ -842,18 +854,17 @@ class NotSoBot(commands.Cog):
                 )
                 log.info("Please visit %s and save this image at `%s`.", url, img_path)
                 return
-        with img_path.open("rb") as infile:
-            image = BytesIO(infile.read())
+        image = self.assets.get_image(img_path)
         if not text:
             text = f"{name}'s\n Hopes and Dreams"
         else:
             text = f"{name}\n{text}"
 
         def make_rip(image, text):
-            img = Image.open(image).convert("RGB")
+            img = image.convert("RGB")
             draw = ImageDraw.Draw(img)
             font_path = f"{str(bundled_data_path(self))}{os.sep}arial.ttf"
-            font1 = ImageFont.truetype(font_path, 35)
+            font1 = self.assets.get_font(font_path, 35)
             text = "\n".join(line for line in textwrap.wrap(text, width=15))
             size = draw.multiline_textbbox((0, 0), text, font=font1)
             w = size[2] - size[1]
@@ -1083,16 +1094,15 @@ class NotSoBot(commands.Cog):
                 )
                 log.info("Please visit %s and save this image at `%s`.", url, img_path)
                 return
-        with img_path.open("rb") as infile:
-            image = BytesIO(infile.read())
+        image = self.assets.get_image(img_path)
         if len(txt) > 20:
             txt = txt[:20] + " ..."
 
-        def make_mc(b, txt):
-            image = Image.open(b).convert("RGBA")
+        def make_mc(template, txt):
+            image = template.convert("RGBA")
             draw = ImageDraw.Draw(image)
             font_path = str(bundled_data_path(self)) + "/Minecraftia.ttf"
-            font = ImageFont.truetype(font_path, 17)
+            font = self.assets.get_font(font_path, 17)
             draw.text((60, 30), txt, (255, 255, 255), font=font)
             final = BytesIO()
             image.save(final, "png")
@@ -1172,8 +1182,7 @@ class NotSoBot(commands.Cog):
                         )
                         log.info("Please visit %s and save this image at `%s`.", url, img_path)
                         return
-                with img_path.open("rb") as infile:
-                    wmm = BytesIO(infile.read())
+                wmm = BytesIO(self.assets.get_bytes(img_path))
                 if wmm is False or b is False:
                     await ctx.send(":warning: **Command download function failed...**")
                     return
@@ -1372,7 +1381,7 @@ class NotSoBot(commands.Cog):
                     return
             loop = asyncio.get_running_loop()
             if mime in self.gif_mimes:
-                task = loop.run_in_executor(None, self.make_pixel_gif, b, pixels)
+                task = self.make_pixel_gif_sharded(b, pixels)
             else:
                 task = loop.run_in_executor(None, self.make_pixel, b, pixels)
             try:
@@ -1404,38 +1413,15 @@ class NotSoBot(commands.Cog):
         img.close()
         return file, file_size
 
-    def make_pixel_gif(self, b, pixels):
-        try:
-            image = Image.open(b)
-            gif_list = [frame.copy() for frame in ImageSequence.Iterator(image)]
-            image.close()
-        except IOError:
-            return ":warning: Cannot load gif."
-        bg = (0, 0, 0)
-        img_list = []
-        for frame in gif_list:
-            img = Image.new("RGBA", frame.size)
-            img.paste(frame, (0, 0))
-            img = img.resize((int(img.size[0] / pixels), int(img.size[1] / pixels)), Image.NEAREST)
-            img = img.resize((int(img.size[0] * pixels), int(img.size[1] * pixels)), Image.NEAREST)
-            load = img.load()
-            for i in range(0, img.size[0], pixels):
-                for j in range(0, img.size[1], pixels):
-                    for r in range(pixels):
-                        load[i + r, j] = bg
-                        load[i, j + r] = bg
-            img_list.append(img)
-        final = BytesIO()
-        img.save(final, format="GIF", save_all=True, append_images=img_list, duration=0, loop=0)
-        file_size = final.tell()
-        final.seek(0)
+    async def make_pixel_gif_sharded(self, b: BytesIO, pixels: int):
+        result = await self.frame_sharder.process(b, pixelate_frames, pixels, coalesce=True)
+        if result is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.make_pixel, b, pixels)
+        final, file_size = result
         filename = self.random_filename(True, "gif")
         file = discord.File(final, filename=filename)
         b.close()
-        final.close()
-        img.close()
-        for image_file in img_list:
-            image_file.close()
         return file, file_size
 
     def do_waaw(self, b):
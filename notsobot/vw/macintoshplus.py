@@ -2,13 +2,14 @@
 # https://github.com/rickyhan/macintoshplus
 """Vaporwaveは音楽のジャンルや芸術運動である[3] [4]このようなバウンスハウス、またはchillwave、そして、より広く、エレクトロニックダンスミュージック、などのインディーseapunkから2010年代初頭のダンスのジャンルに出現した。 、その態度やメッセージに多くの多様性と曖昧さ、vaporwaveがありますが：時々の両方が、大量消費社会の批判とパロディとして機能し80年代のヤッピー文化、[5]とニューエイジの音楽、音響的および審美的に彼らのノスタルジックで好奇心の魅力を紹介しながら、アーティファクト。"""
 import hashlib
-import os
 from math import cos, sin, tan
 from random import Random, choice, randint
 
-from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+from PIL import ImageDraw, ImageEnhance, ImageFilter
 from red_commons.logging import getLogger
 
+from ..assets import assets
+
 log = getLogger("red.trusty-cogs.NotSoBot.macintoshplus")
 
 
@@ -40,31 +41,6 @@ japanese_corpus = """それは20年前の今日だった
     "\n"
 )
 main_dir = str(__file__)[:-16]
-bubbles = [
-    main_dir + "/img/png/bubbles/" + i
-    for i in os.listdir(main_dir + "/img/png/bubbles/")
-    if i != "Thumbs.db"
-]
-windows = [
-    main_dir + "/img/png/windows/" + i
-    for i in os.listdir(main_dir + "/img/png/windows/")
-    if i != "Thumbs.db"
-]
-backgrounds = [
-    main_dir + "/img/png/background/" + i
-    for i in os.listdir(main_dir + "/img/png/background/")
-    if i != "Thumbs.db"
-]
-pics = [
-    main_dir + "/img/png/pics/" + i
-    for i in os.listdir(main_dir + "/img/png/pics/")
-    if i != "Thumbs.db"
-]
-greek = [
-    main_dir + "/img/png/greek/" + i
-    for i in os.listdir(main_dir + "/img/png/greek/")
-    if i != "Thumbs.db"
-]
 
 
 def random_color(k=0):
@@ -96,11 +72,11 @@ def draw_text(txt, image, k=0, x=0, y=30):
     fontsize = 1  # starting font size
     # portion of image width you want text width to be
     img_fraction = 0.50
-    font = ImageFont.truetype(font_path, fontsize)
+    font = assets.get_font(font_path, fontsize)
     while font.getsize(txt)[0] < img_fraction * image.size[0] * 0.7:
         # iterate until the text size is just larger than the criteria
         fontsize += 1
-        font = ImageFont.truetype(font_path, fontsize)
+        font = assets.get_font(font_path, fontsize)
 
     txt = full_width(txt)
     # draw.text((0, 30), txt, fill=random_color(k) , font=font)
@@ -124,7 +100,7 @@ def draw_text(txt, image, k=0, x=0, y=30):
 def insert_bubble(foreground_path, im):
     """insert notification bubble on the bottom right corner"""
     log.verbose("adding bubble: %s", foreground_path)
-    foreground = Image.open(foreground_path)
+    foreground = assets.get_image(foreground_path)
     background_size = im.size
     foreground_size = foreground.size
     im.paste(
@@ -138,7 +114,7 @@ def insert_bubble(foreground_path, im):
 def insert_window_as_background(foreground_path, im, k=0):
     """fractal generative art, not a great idea for vaporwave though. not ironic enough"""
     log.verbose("adding window: %s", foreground_path)
-    foreground = Image.open(foreground_path)
+    foreground = assets.get_image(foreground_path)
     background_size = im.size
     foreground_size = foreground.size
     ratio = float(foreground_size[0]) / float(foreground_size[1])
@@ -157,7 +133,7 @@ def insert_window_as_background(foreground_path, im, k=0):
 def insert_cascade(foreground_path, im, k=0, x=100, y=100):
     """another postironic function. raster box drawing"""
     log.verbose("adding window: %s", foreground_path)
-    foreground = Image.open(foreground_path)
+    foreground = assets.get_image(foreground_path)
     background_size = im.size
     foreground_size = foreground.size
     # ratio = float(foreground_size[0]) / float(foreground_size[1])
@@ -179,7 +155,7 @@ def insert_cascade(foreground_path, im, k=0, x=100, y=100):
 def insert_window_as_background2(foreground_path, im):
     """another postironic function. raster box drawing"""
     log.verbose("adding window: %s", foreground_path)
-    foreground = Image.open(foreground_path)
+    foreground = assets.get_image(foreground_path)
     background_size = im.size
     foreground_size = foreground.size
     ratio = float(foreground_size[0]) / float(foreground_size[1])
@@ -194,7 +170,7 @@ def insert_window_as_background2(foreground_path, im):
 
 def horizon(background_path, im):
     """stretch a picture for horizontal perspective. math is hard"""
-    background = Image.open(background_path)
+    background = assets.get_image(background_path)
     # WWWWWWWWWWWWTTTTTTTTTTTTTTTTTTTFFFFFFFFFFFFFFFFFFFFFFF MATH???? :-K
     im.paste(background, (0, 0))
     return im
@@ -205,7 +181,7 @@ def insert_pic(foreground_path, im, k=0, x=0, y=1000):
     transformations such as rotation and oscillation"""
     log.verbose("adding pic: %s", foreground_path)
 
-    foreground = Image.open(foreground_path)
+    foreground = assets.get_image(foreground_path)
     background_size = im.size
     foreground_size = foreground.size
     ratio = float(foreground_size[0]) / float(foreground_size[1])
@@ -250,7 +226,12 @@ def draw_method1(k, name, im):
     else:
         seedvalue = hashseed(name)
     x, y = size = (1000, 1000)
-    # im = horizon(choice(backgrounds),im)
+    # im = horizon(choice(assets.vaporwave("background")),im)
+    # the asset folders are listed once on first use rather than on import
+    windows = assets.vaporwave("windows")
+    pics = assets.vaporwave("pics")
+    greek = assets.vaporwave("greek")
+    bubbles = assets.vaporwave("bubbles")
     im = im.convert("RGB")
     im = insert_cascade(Random(seedvalue + str(0)).choice(windows), im, k=0.5)
     im = insert_pic(Random(seedvalue + str(1)).choice(pics), im, k=0, x=int(x / 2), y=int(y / 2))
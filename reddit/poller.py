@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Mapping, Optional, Set
+
+import apraw
+from apraw.models import Submission
+from red_commons.logging import getLogger
+
+log = getLogger("red.Trusty-cogs.reddit")
+
+# How many subreddits are combined into one r/a+b+c/new request
+GROUP_SIZE = 50
+# How many pages of 100 posts are read back through to catch up after downtime
+REPLAY_PAGES = 5
+# The most missed posts replayed for a single subreddit
+REPLAY_LIMIT = 25
+
+
+def _id36(fullname: str) -> int:
+    # reddit IDs are base 36 and increase with every new post
+    return int(fullname.split("_", 1)[-1], 36)
+
+
+class SubredditPoller:
+    """
+    Polls the newest posts of many subreddits at once.
+
+    Followed subreddits are fetched together through reddit's combined
+    r/a+b+c/new listing instead of a stream per subreddit. The newest post
+    seen in each subreddit is kept as its cursor, so the first poll after
+    a restart replays posts made while the bot was offline, up to
+    `REPLAY_LIMIT` per subreddit. A subreddit without a cursor starts from
+    its newest post without posting anything.
+    """
+
+    def __init__(self, login: apraw.Reddit, cursors: Mapping[str, str]):
+        self.login = login
+        self.cursors: Dict[str, str] = dict(cursors)
+        # subreddits whose cursor has moved since they were last saved
+        self.changed: Set[str] = set()
+        # seconds between a post being made and the poll that found it
+        self.latency: Dict[str, float] = {}
+        self.last_checked: Dict[str, datetime] = {}
+        self._replay = True
+
+    def forget(self, subreddit_id: str) -> None:
+        self.cursors.pop(subreddit_id, None)
+        self.changed.discard(subreddit_id)
+        self.latency.pop(subreddit_id, None)
+        self.last_checked.pop(subreddit_id, None)
+
+    async def poll(self, subreddits: Mapping[str, str]) -> List[Submission]:
+        """
+        Get the new posts in `subreddits`, a mapping of subreddit ID to name
+
+        Posts are returned oldest first.
+        """
+        ids = list(subreddits)
+        posts: List[Submission] = []
+        for i in range(0, len(ids), GROUP_SIZE):
+            group = {sub_id: subreddits[sub_id] for sub_id in ids[i : i + GROUP_SIZE]}
+            try:
+                posts += await self._poll_group(group)
+            except Exception:
+                log.exception("Error polling %s", "+".join(group.values()))
+        self._replay = False
+        return sorted(posts, key=lambda s: _id36(s.fullname))
+
+    async def _poll_group(self, group: Mapping[str, str]) -> List[Submission]:
+        endpoint = "/r/{}/new".format("+".join(group.values()))
+        waiting = set(group)
+        found: Dict[str, List[Submission]] = {sub_id: [] for sub_id in group}
+        newest: Dict[str, Submission] = {}
+        after: Optional[str] = None
+        for _page in range(REPLAY_PAGES):
+            params = {"limit": 100}
+            if after:
+                params["after"] = after
+            listing = await self.login.get_listing(endpoint, **params)
+            reached = False
+            count = 0
+            for submission in listing:
+                count += 1
+                sub_id = submission.subreddit_id.split("_", 1)[-1]
+                if sub_id not in waiting:
+                    continue
+                newest.setdefault(sub_id, submission)
+                cursor = self.cursors.get(sub_id)
+                if cursor is None or _id36(submission.fullname) <= _id36(cursor):
+                    waiting.discard(sub_id)
+                    reached = True
+                    continue
+                found[sub_id].append(submission)
+                if len(found[sub_id]) >= REPLAY_LIMIT:
+                    waiting.discard(sub_id)
+            after = getattr(listing, "after", None)
+            # Only read further back when catching up after a restart or
+            # when a whole page was new posts and some may have been missed
+            if not waiting or not after or not count or (reached and not self._replay):
+                break
+        now = datetime.now(timezone.utc)
+        for sub_id in group:
+            self.last_checked[sub_id] = now
+        for sub_id, submission in newest.items():
+            cursor = self.cursors.get(sub_id)
+            if cursor is None or _id36(submission.fullname) > _id36(cursor):
+                self.cursors[sub_id] = submission.fullname
+                self.changed.add(sub_id)
+        posts = []
+        for sub_id, submissions in found.items():
+            if not submissions:
+                continue
+            created = submissions[0].created_utc.replace(tzinfo=timezone.utc)
+            self.latency[sub_id] = (now - created).total_seconds()
+            posts += submissions
+        return posts
@@ -1,7 +1,6 @@
 import asyncio
-from typing import Mapping, Optional
+from typing import Dict, Mapping, Optional
 
-import aiohttp
 import apraw
 import discord
 from apraw.models import Submission, Subreddit
@@ -10,9 +9,11 @@ from red_commons.logging import getLogger
 from redbot.core import Config, checks, commands
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils import bounded_gather
+from redbot.core.utils.chat_formatting import pagify
 
 from .helpers import SubredditConverter, make_embed_from_submission
 from .menus import BaseMenu, RedditMenu
+from .poller import SubredditPoller
 
 log = getLogger("red.Trusty-cogs.reddit")
 _ = Translator("Reddit", __file__)
@@ -24,7 +25,7 @@ class Reddit(commands.Cog):
     A cog to get information from the Reddit API
     """
 
-    __version__ = "1.2.0"
+    __version__ = "1.4.0"
     __author__ = ["TrustyJAID"]
 
     def __init__(self, bot):
@@ -32,11 +33,14 @@ class Reddit(commands.Cog):
         self.login = None
         self.config = Config.get_conf(self, identifier=218773382617890828)
         self.subreddits = {}
-        self._streams = {}
-        default = {"subreddits": {}}
+        self._subreddit_objects: Dict[str, Subreddit] = {}
+        self.poller: Optional[SubredditPoller] = None
+        self._webhooks: Dict[int, discord.Webhook] = {}
+        self._webhook_lock = asyncio.Lock()
+        default = {"subreddits": {}, "cursors": {}}
         self.config.register_global(**default)
         self._ready: asyncio.Event = asyncio.Event()
-        self.stream_loop.start()
+        self.poll_loop.start()
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -51,22 +55,41 @@ class Reddit(commands.Cog):
         """
         return
 
-    @tasks.loop(seconds=300)
-    async def stream_loop(self):
-        if self.login:
-            for sub, data in self.subreddits.items():
-                if sub not in self._streams:
-                    subreddit = await self.login.subreddit(data["name"])
-                    self._streams[sub] = asyncio.create_task(self._run_subreddit_stream(subreddit))
-                elif sub in self._streams and self._streams[sub].done():
-                    subreddit = await self.login.subreddit(data["name"])
-                    self._streams[sub] = asyncio.create_task(self._run_subreddit_stream(subreddit))
-
-    @stream_loop.before_loop
-    async def before_stream_loop(self):
+    @tasks.loop(seconds=60)
+    async def poll_loop(self):
+        if not self.login or not self.poller or not self.subreddits:
+            return
+        followed = {sub_id: data["name"] for sub_id, data in self.subreddits.items()}
+        try:
+            posts = await self.poller.poll(followed)
+        except Exception:
+            log.exception("Error polling subreddits")
+            return
+        for submission in posts:
+            sub_id = submission.subreddit_id.split("_", 1)[-1]
+            try:
+                subreddit = await self.get_subreddit(sub_id)
+            except Exception:
+                log.exception("Error getting subreddit %s", sub_id)
+                continue
+            self.bot.dispatch("reddit_post", subreddit, submission)
+        changed = [s for s in self.poller.changed if s in self.poller.cursors]
+        self.poller.changed.clear()
+        for sub_id in changed:
+            await self.config.cursors.set_raw(sub_id, value=self.poller.cursors[sub_id])
+
+    @poll_loop.before_loop
+    async def before_poll_loop(self):
         await self.bot.wait_until_red_ready()
         await self._ready.wait()
 
+    async def get_subreddit(self, sub_id: str) -> Subreddit:
+        """The followed subreddit with `sub_id` fetched once and kept for posting"""
+        if sub_id not in self._subreddit_objects:
+            name = self.subreddits[sub_id]["name"]
+            self._subreddit_objects[sub_id] = await self.login.subreddit(name)
+        return self._subreddit_objects[sub_id]
+
     @commands.Cog.listener()
     async def on_red_api_tokens_update(
         self, service_name: str, api_tokens: Mapping[str, str]
@@ -77,13 +100,8 @@ class Reddit(commands.Cog):
                 log.debug("Closed the reddit login.")
             except Exception:
                 log.exception("Error closing the login.")
-            for name, stream in self._streams.items():
-                try:
-                    stream.cancel()
-                except Exception:
-                    log.debug("Error closing stream in %s", name)
-            await self.initialize()
-            self.stream_loop.restart()
+            await self.cog_load()
+            self.poll_loop.restart()
 
     async def cog_load(self) -> None:
         keys = await self.bot.get_shared_api_tokens("reddit")
@@ -99,6 +117,8 @@ class Reddit(commands.Cog):
             )
             log.debug("Logged into Reddit.")
             self.subreddits = await self.config.subreddits()
+            self._subreddit_objects = {}
+            self.poller = SubredditPoller(self.login, await self.config.cursors())
             self._ready.set()
         except KeyError:
             log.error(
@@ -107,52 +127,28 @@ class Reddit(commands.Cog):
         except Exception:
             log.exception("Error logging into Reddit.")
 
-    async def _run_subreddit_stream(self, subreddit: Subreddit) -> None:
-        """
-        A function to run the infinite loop of the subreddit stream and dispatch
-        new posts as an event.
-        """
-        try:
-            stream = subreddit.new.stream(skip_existing=True, max_wait=300)
-            async for submission in stream:
-                self.bot.dispatch("reddit_post", subreddit, submission)
-        except aiohttp.ContentTypeError:
-            log.debug("Stream recieved incorrect data type.")
-            # attempt to create the stream again.
-            self._streams[subreddit.id] = asyncio.create_task(
-                self._run_subreddit_stream(subreddit)
-            )
-        except Exception:
-            log.exception("Error in streams task.")
-            return None
-
     @commands.Cog.listener()
     async def on_reddit_post(self, subreddit: Subreddit, submission: Submission) -> None:
         if subreddit.id not in self.subreddits:
-            try:
-                self._streams[subreddit.id].cancel()
-            except Exception:
-                log.exception("Error closing stream.")
-            del self._streams[subreddit.id]
-        else:
-            tasks = []
-            for channel_id in self.subreddits[subreddit.id]["channels"]:
-                channel = self.bot.get_channel(channel_id)
-                if channel is None:
-                    continue
-                if channel.guild.me.is_timed_out():
-                    continue
-                chan_perms = channel.permissions_for(channel.guild.me)
-                if not chan_perms.send_messages and not chan_perms.manage_webhooks:
-                    continue
-                use_embed = channel.permissions_for(channel.guild.me).embed_links
-                contents = await make_embed_from_submission(channel, subreddit, submission)
-                if not contents:
-                    continue
-                contents["subreddit"] = subreddit
-                contents["submission"] = submission
-                tasks.append(self.post_new_submissions(channel, contents, use_embed))
-            await bounded_gather(*tasks, return_exceptions=True)
+            return
+        tasks = []
+        for channel_id in self.subreddits[subreddit.id]["channels"]:
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            if channel.guild.me.is_timed_out():
+                continue
+            chan_perms = channel.permissions_for(channel.guild.me)
+            if not chan_perms.send_messages and not chan_perms.manage_webhooks:
+                continue
+            use_embed = channel.permissions_for(channel.guild.me).embed_links
+            contents = await make_embed_from_submission(channel, subreddit, submission)
+            if not contents:
+                continue
+            contents["subreddit"] = subreddit
+            contents["submission"] = submission
+            tasks.append(self.post_new_submissions(channel, contents, use_embed))
+        await bounded_gather(*tasks, return_exceptions=True)
 
     async def post_new_submissions(
         self, channel: discord.TextChannel, contents: dict, use_embed: bool
@@ -170,30 +166,51 @@ class Reddit(commands.Cog):
                 else:
                     await channel.send(post_url)
             elif channel.permissions_for(channel.guild.me).manage_webhooks:
-                webhook = None
-                for hook in await channel.webhooks():
-                    if hook.name == channel.guild.me.name:
-                        webhook = hook
-                if webhook is None:
-                    webhook = await channel.create_webhook(name=channel.guild.me.name)
-                avatar = subreddit.community_icon
+                kwargs = {
+                    "username": subreddit.display_name_prefixed,
+                    "avatar_url": subreddit.community_icon,
+                }
                 if use_embed:
-                    await webhook.send(
-                        post_url,
-                        username=subreddit.display_name_prefixed,
-                        avatar_url=avatar,
-                        embed=em,
-                    )
-                else:
-                    await webhook.send(
-                        post_url, username=subreddit.display_name_prefixed, avatar_url=avatar
-                    )
+                    kwargs["embed"] = em
+                webhook = await self.get_webhook(channel)
+                try:
+                    await webhook.send(post_url, **kwargs)
+                except discord.NotFound:
+                    # the webhook was deleted since we last looked it up
+                    self._webhooks.pop(channel.id, None)
+                    webhook = await self.get_webhook(channel)
+                    await webhook.send(post_url, **kwargs)
             else:
                 await channel.send(post_url)
         except Exception:
             msg = "{0} from <#{1}>({1})".format(post_url, channel.id)
             log.exception(msg)
 
+    async def get_webhook(self, channel: discord.TextChannel) -> discord.Webhook:
+        """
+        Get the webhook used to post in a channel
+
+        The channels webhooks are only looked up the first time and the webhook
+        is kept until discord tells us they've changed or sending with it fails.
+        """
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+        async with self._webhook_lock:
+            if channel.id in self._webhooks:
+                return self._webhooks[channel.id]
+            webhook = None
+            for hook in await channel.webhooks():
+                if hook.name == channel.guild.me.name:
+                    webhook = hook
+            if webhook is None:
+                webhook = await channel.create_webhook(name=channel.guild.me.name)
+            self._webhooks[channel.id] = webhook
+            return webhook
+
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel: discord.abc.GuildChannel) -> None:
+        self._webhooks.pop(channel.id, None)
+
     async def cog_unload(self) -> None:
         if self.login:
             try:
@@ -201,11 +218,7 @@ class Reddit(commands.Cog):
                 log.debug("Closed the reddit login.")
             except Exception:
                 log.exception("Error closing the login.")
-        for name, stream in self._streams.items():
-            try:
-                stream.cancel()
-            except Exception:
-                log.debug("Error closing stream in %s", name)
+        self.poll_loop.cancel()
 
     @commands.group()
     async def redditset(self, ctx: commands.Context) -> None:
@@ -235,9 +248,7 @@ class Reddit(commands.Cog):
                 "name": subreddit.display_name,
                 "channels": [channel.id],
             }
-            self._streams[subreddit.id] = asyncio.create_task(
-                self._run_subreddit_stream(subreddit)
-            )
+            self._subreddit_objects[subreddit.id] = subreddit
             await self.config.subreddits.set_raw(subreddit.id, value=self.subreddits[subreddit.id])
         else:
             if channel.id not in self.subreddits[subreddit.id]["channels"]:
@@ -285,11 +296,10 @@ class Reddit(commands.Cog):
                 if len(subs[subreddit.id]["channels"]) == 0:
                     del subs[subreddit.id]
                     del self.subreddits[subreddit.id]
-                    try:
-                        self._streams[subreddit.id].cancel()
-                        del self._streams[subreddit.id]
-                    except Exception:
-                        log.exception("Error closing stream")
+                    self._subreddit_objects.pop(subreddit.id, None)
+                    if self.poller:
+                        self.poller.forget(subreddit.id)
+                    await self.config.cursors.clear_raw(subreddit.id)
                 await self.config.subreddits.set(subs)
             else:
                 return await ctx.send(
@@ -303,6 +313,29 @@ class Reddit(commands.Cog):
             )
         )
 
+    @redditset.command(name="status")
+    @checks.mod_or_permissions(manage_channels=True)
+    async def poll_status(self, ctx: commands.Context) -> None:
+        """
+        Show how up to date each followed subreddit is
+
+        Latency is the time between the newest post being made and it being found.
+        """
+        if not self.poller or not self.subreddits:
+            await ctx.send(_("I'm not following any subreddits."))
+            return
+        msg = ""
+        for sub_id, data in self.subreddits.items():
+            checked = self.poller.last_checked.get(sub_id)
+            latency = self.poller.latency.get(sub_id)
+            msg += _("r/{name}: last checked {checked}, latency {latency}\n").format(
+                name=data["name"],
+                checked=discord.utils.format_dt(checked, "R") if checked else _("never"),
+                latency=f"{latency:.0f}s" if latency is not None else _("unknown"),
+            )
+        for page in pagify(msg):
+            await ctx.send(page)
+
     @redditset.command()
     @commands.is_owner()
     async def creds(self, ctx: commands.Context) -> None:
@@ -22,7 +22,10 @@ from .converter import (
 
 if TYPE_CHECKING:
     from .buttons import ButtonRole, ButtonRoleConverter
+    from .jobs import RoleJob
+    from .rules import RoleRules
     from .select import SelectOptionRoleConverter, SelectRole, SelectRoleConverter
+    from .sticky import StickyRoles
 
 
 log = getLogger("red.trusty-cogs.ReTrigger")
@@ -43,6 +46,10 @@ class RoleToolsMixin(ABC):
         self.settings: Dict[Any, Any]
         self._ready: asyncio.Event
         self.views: Dict[int, Dict[str, discord.ui.View]]
+        self._role_rules: Dict[int, RoleRules]
+        self._role_jobs: Dict[str, RoleJob]
+        self._role_job_locks: Dict[int, asyncio.Lock]
+        self._sticky_roles: StickyRoles
 
     @commands.group()
     @commands.guild_only()
@@ -389,6 +396,28 @@ class RoleToolsMixin(ABC):
     async def _sticky_join(self, member: discord.Member) -> None:
         raise NotImplementedError()
 
+    #######################################################################
+    # jobs.py                                                             #
+    #######################################################################
+
+    @abstractmethod
+    async def start_role_job(
+        self, ctx: Context, role: discord.Role, action: str, members: List[discord.Member]
+    ) -> RoleJob:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def resume_role_jobs(self) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def role_jobs(self, ctx: Context) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def role_jobs_cancel(self, ctx: Context, job_id: str) -> None:
+        raise NotImplementedError()
+
     #######################################################################
     # buttons.py                                                          #
     #######################################################################
@@ -105,9 +105,9 @@ class ButtonRole(discord.ui.Button):
                 "Bots are not allowed to assign their own roles."
             )
             return
-        config = self.view.cog.config
+        rules = await self.view.cog.get_role_rules(guild)
         if role not in interaction.user.roles:
-            if not await config.role(role).selfassignable():
+            if not rules.get(role.id).selfassignable:
                 await interaction.response.send_message(
                     _("{role} is not currently self assignable.").format(role=role.mention),
                     ephemeral=True,
@@ -146,7 +146,7 @@ class ButtonRole(discord.ui.Button):
                 _("I have given you the {role} role.").format(role=role.mention), ephemeral=True
             )
         elif role in interaction.user.roles:
-            if not await config.role(role).selfremovable():
+            if not rules.get(role.id).selfremovable:
                 await interaction.response.send_message(
                     _("{role} is not currently self removable.").format(role=role.mention),
                     ephemeral=True,
@@ -245,6 +245,7 @@ class SelectRole(discord.ui.Select):
         missing_role = False
         pending = False
         wait = None
+        rules = await self.view.cog.get_role_rules(guild)
         for role_id in role_ids:
             role = guild.get_role(role_id)
             if role is None:
@@ -255,9 +256,8 @@ class SelectRole(discord.ui.Select):
                 # # even if it's your own code
                 # ## Especially if it's your own code
                 continue
-            config = self.view.cog.config
             if role not in interaction.user.roles:
-                if not await config.role(role).selfassignable():
+                if not rules.get(role.id).selfassignable:
                     msg += _(
                         "{role} Could not be assigned because it is not self assignable."
                     ).format(role=role.mention)
@@ -281,7 +281,7 @@ class SelectRole(discord.ui.Select):
                     continue
                 added_roles.append(role)
             elif role in interaction.user.roles:
-                if not await config.role(role).selfremovable():
+                if not rules.get(role.id).selfremovable:
                     msg += _(
                         "{role} Could not be removed because it is not self assignable."
                     ).format(role=role.mention)
@@ -8,6 +8,7 @@ from redbot.core import bank, commands
 from redbot.core.i18n import Translator
 
 from .abc import RoleToolsMixin
+from .rules import RoleRules
 
 log = getLogger("red.Trusty-cogs.RoleTools")
 
@@ -51,11 +52,11 @@ class RoleToolsEvents(RoleToolsMixin):
             # add roles
 
             role = guild.get_role(guild_settings[key])
-            if not await self.config.role(role).selfassignable():
-                return
             member = guild.get_member(payload.user_id)
             if not role or not member:
                 return
+            if not (await self.get_role_rules(guild)).get(role.id).selfassignable:
+                return
             if member.bot:
                 return
             if await self.check_guild_verification(member, guild):
@@ -85,12 +86,11 @@ class RoleToolsEvents(RoleToolsMixin):
         if key in guild_settings:
             # add roles
             role = guild.get_role(guild_settings[key])
-            if not await self.config.role(role).selfremovable():
-                return
-
             member = guild.get_member(payload.user_id)
             if not role or not member:
                 return
+            if not (await self.get_role_rules(guild)).get(role.id).selfremovable:
+                return
             if member.bot:
                 return
             log.debug("Removing role from %s in %s", member.name, member.guild)
@@ -105,18 +105,15 @@ class RoleToolsEvents(RoleToolsMixin):
         after_pending = getattr(after, "pending", False)
         if before_pending != after_pending:
             await self._auto_give(after)
-        removed_roles = list(set(before.roles) - set(after.roles))
-        added_roles = list(set(after.roles) - set(before.roles))
-        for role in added_roles:
-            if await self.config.role(role).sticky():
-                async with self.config.member(after).sticky_roles() as roles:
-                    if role.id not in roles:
-                        roles.append(role.id)
-        for role in removed_roles:
-            if await self.config.role(role).sticky():
-                async with self.config.member(after).sticky_roles() as roles:
-                    if role.id in roles:
-                        roles.remove(role.id)
+        if before.roles == after.roles:
+            return
+        rules = await self.get_role_rules(after.guild)
+        before_roles = set(before.roles)
+        after_roles = set(after.roles)
+        added = [r.id for r in after_roles - before_roles if rules.get(r.id).sticky]
+        removed = [r.id for r in before_roles - after_roles if rules.get(r.id).sticky]
+        if added or removed:
+            await self._sticky_roles.update(after.guild, after.id, add=added, remove=removed)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member) -> None:
@@ -135,6 +132,26 @@ class RoleToolsEvents(RoleToolsMixin):
             return
         await self._auto_give(member)
 
+    async def get_role_rules(self, guild: discord.Guild) -> RoleRules:
+        """
+        Get the compiled role settings for a guild
+
+        The settings are compiled the first time they're needed and kept
+        until `invalidate_role_rules` is called after a role setting changes.
+        """
+        if guild.id not in self._role_rules:
+            all_roles = await self.config.all_roles()
+            existing = [r.id for r in guild.roles]
+            roles = {role_id: all_roles[role_id] for role_id in existing if role_id in all_roles}
+            rules = RoleRules(roles, existing)
+            for cycle in rules.cycles:
+                log.debug("Roles %s in %s include each other", cycle, guild.id)
+            self._role_rules[guild.id] = rules
+        return self._role_rules[guild.id]
+
+    def invalidate_role_rules(self, guild_id: int) -> None:
+        self._role_rules.pop(guild_id, None)
+
     async def check_guild_verification(
         self, member: discord.Member, guild: discord.Guild
     ) -> Union[bool, int]:
@@ -260,10 +277,12 @@ class RoleToolsEvents(RoleToolsMixin):
             return ret
         if atomic is None:
             atomic = await self.check_atomicity(guild)
-        if atomic:
-            to_add = set()
-        else:
-            to_add = set(member.roles)
+        # the roles requested and the roles they include
+        to_add = set()
+        to_remove = set()
+        current_roles = set(member.roles)
+        rules = await self.get_role_rules(guild)
+        member_role_ids = {r.id for r in member.roles}
 
         log.debug("Atomic role assignment %s", atomic)
 
@@ -282,7 +301,7 @@ class RoleToolsEvents(RoleToolsMixin):
                         RoleChangeResponse(role, _("The Role requested no longer exists."), False)
                     )
                 continue
-            if role in to_add and not atomic:
+            if not atomic and (role in current_roles or role in to_add):
                 ret.append(
                     RoleChangeResponse(
                         role,
@@ -291,14 +310,10 @@ class RoleToolsEvents(RoleToolsMixin):
                     )
                 )
                 continue
-            require_any = await self.config.role(role).require_any()
-            if (required := await self.config.role(role).required()) and check_required:
-                if require_any:
-                    has_required = False
-                    for r in member.roles:
-                        if r.id in required:
-                            has_required = True
-                    if not has_required:
+            rule = rules.get(role.id)
+            if rule.required and check_required:
+                if rule.require_any:
+                    if not rule.required & member_role_ids:
                         ret.append(
                             RoleChangeResponse(
                                 role,
@@ -307,27 +322,26 @@ class RoleToolsEvents(RoleToolsMixin):
                             )
                         )
                         continue
-                else:
-                    has_required = True
-                    for role_id in required:
-                        r = guild.get_role(role_id)
-                        if r is None:
-                            async with self.config.role(role).required() as required_roles:
-                                required_roles.remove(role_id)
-                            continue
-                        if r not in member.roles:
-                            has_required = False
-                    if not has_required:
-                        ret.append(
-                            RoleChangeResponse(
-                                role, _("You do not have all of the required roles."), False
-                            )
+                elif not rule.required <= member_role_ids:
+                    ret.append(
+                        RoleChangeResponse(
+                            role, _("You do not have all of the required roles."), False
                         )
-                        continue
-            if (cost := await self.config.role(role).cost()) and check_cost:
-                if await bank.can_spend(member, cost):
+                    )
+                    continue
+            exclusive_roles = []
+            if rule.exclusive and check_exclusive:
+                exclusive_roles = [r for r in member.roles if r.id in rule.exclusive]
+                if not all(rules.get(r.id).selfremovable for r in exclusive_roles):
+                    # we want to only remove the role (and assign the new one)
+                    # if the current role is self-removable
+                    # If the role is not self-removable we don't want
+                    # to apply the initial role to begin with
+                    continue
+            if rule.cost and check_cost:
+                if await bank.can_spend(member, rule.cost):
                     try:
-                        await bank.withdraw_credits(member, cost)
+                        await bank.withdraw_credits(member, rule.cost)
                     except Exception:
                         log.info(
                             "Could not assign %s to %s as they don't have enough credits.",
@@ -348,60 +362,26 @@ class RoleToolsEvents(RoleToolsMixin):
                         RoleChangeResponse(role, _("You do not have enough credits."), False)
                     )
                     continue
-            if (inclusive := await self.config.role(role).inclusive_with()) and check_inclusive:
-                inclusive_roles = []
-                for role_id in inclusive:
-                    log.verbose("role_id: %s", role_id)
+            if check_inclusive:
+                for role_id in rules.included(role.id):
                     r = guild.get_role(role_id)
-                    if r is None:
-                        async with self.config.role(role).inclusive_with() as inclusive_with:
-                            inclusive_with.remove(role_id)
-                        continue
-                    if r and await self.config.role(r).selfassignable():
+                    if r is not None and r < guild.me.top_role:
                         to_add.add(r)
-                        inclusive_roles.append(r)
-                if atomic:
-                    await member.add_roles(*inclusive_roles, reason=_("Inclusive Roles"))
-            if (exclusive := await self.config.role(role).exclusive_to()) and check_exclusive:
-                skip_role_assign = False
-                exclusive_roles = []
-                for role_id in exclusive:
-                    r = guild.get_role(role_id)
-                    if r is None:
-                        # cleanup roles that are missing automatically
-                        # we should never :tm: end up in a situation where
-                        # roles are not chunked properly
-                        async with self.config.role(role).exclusive_to() as exclusive_to:
-                            exclusive_to.remove(role_id)
-                            continue
-                    if r in member.roles:
-                        if await self.config.role(r).selfremovable():
-                            if atomic:
-                                exclusive_roles.append(r)
-                            else:
-                                to_add.remove(r)
-                        else:
-                            # we want to only remove the role (and assign the new one)
-                            # if the current role is self-removable
-                            # If the role is not self-removable we don't want
-                            # to apply the initial role to begin with
-                            skip_role_assign = True
-                if skip_role_assign:
-                    # we want to skip assigning the role which means the continue
-                    # needs to be here
-                    # I don't think we should be removing roles at all if this
-                    # is the case but if required this can be adjusted in the future
-                    continue
-                if atomic:
-                    await member.remove_roles(*exclusive_roles, reason=_("Exclusive Roles"))
+            to_remove.update(exclusive_roles)
             to_add.add(role)
+        # a role requested or included here wins over one it excludes
+        to_remove -= to_add
         log.debug("Adding %s to %s", to_add, member.name)
         if atomic:
             log.verbose("Atomic is true")
-            await member.add_roles(*list(to_add), reason=reason)
+            if to_remove:
+                await member.remove_roles(*to_remove, reason=_("Exclusive Roles"))
+            if to_add:
+                await member.add_roles(*to_add, reason=reason)
         else:
             log.verbose("Atomic is false")
-            await member.edit(roles=list(to_add), reason=reason)
+            if to_add - current_roles or to_remove & current_roles:
+                await member.edit(roles=list((current_roles | to_add) - to_remove), reason=reason)
         return ret
 
     async def remove_roles(
@@ -450,6 +430,7 @@ class RoleToolsEvents(RoleToolsMixin):
             to_rem = set()
         else:
             to_rem = set(member.roles)
+        rules = await self.get_role_rules(guild)
 
         for role in roles:
             if role is None or role >= guild.me.top_role:
@@ -476,23 +457,23 @@ class RoleToolsEvents(RoleToolsMixin):
                     )
                 )
                 continue
-            if (inclusive := await self.config.role(role).inclusive_with()) and check_inclusive:
-                for role_id in inclusive:
+            if check_inclusive:
+                for role_id in rules.removed_with(role.id):
                     r = guild.get_role(role_id)
-                    if not r:
+                    if r is None or r >= guild.me.top_role:
                         continue
-                    if await self.config.role(r).selfremovable():
-                        if atomic:
-                            to_rem.add(r)
-                        else:
-                            to_rem.remove(r)
+                    if atomic:
+                        to_rem.add(r)
+                    else:
+                        to_rem.discard(r)
             if atomic:
                 to_rem.add(role)
             else:
-                to_rem.remove(role)
+                to_rem.discard(role)
         log.verbose("remove_roles  to_rem: %s", to_rem)
         if atomic:
-            await member.remove_roles(*list(to_rem), reason=reason)
+            if to_rem:
+                await member.remove_roles(*to_rem, reason=reason)
         else:
             await member.edit(roles=list(to_rem), reason=reason)
         return ret
@@ -510,12 +491,10 @@ class RoleToolsEvents(RoleToolsMixin):
         guild = member.guild
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
-        async with self.config.member(member).sticky_roles() as sticky_roles:
-            for role in member.roles:
-                if not await self.config.role(role).sticky():
-                    continue
-                if role.id not in sticky_roles:
-                    sticky_roles.append(role.id)
+        rules = await self.get_role_rules(guild)
+        sticky_roles = [r.id for r in member.roles if rules.get(r.id).sticky]
+        if sticky_roles:
+            await self._sticky_roles.update(guild, member.id, add=sticky_roles)
 
     async def _sticky_join(self, member: discord.Member) -> None:
         guild = member.guild
@@ -523,10 +502,9 @@ class RoleToolsEvents(RoleToolsMixin):
             return
         if not guild.me.guild_permissions.manage_roles:
             return
-        to_reapply = await self.config.member(member).sticky_roles()
+        to_reapply = await self._sticky_roles.pop(guild, member.id)
         if not to_reapply:
             return
-        await self.config.member(member).sticky_roles.clear()
 
         to_add = []
 
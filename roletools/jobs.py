@@ -0,0 +1,261 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import commands
+from redbot.core.commands import Context
+from redbot.core.i18n import Translator
+from redbot.core.utils.chat_formatting import pagify
+
+from .abc import RoleToolsMixin
+
+roletools = RoleToolsMixin.roletools
+
+log = getLogger("red.Trusty-cogs.RoleTools")
+_ = Translator("RoleTools", __file__)
+
+# Discord allows around 10 role edits every 10 seconds in a guild
+EDIT_INTERVAL = 1.0
+# How many members are processed between saving the jobs progress
+CHECKPOINT_EVERY = 25
+# How often the progress message is edited
+PROGRESS_INTERVAL = 15.0
+
+
+class RoleJob:
+    """
+    A role being given to or removed from a list of members.
+
+    Members are processed in order and `position` is saved as the job runs
+    so every member before it is complete and a restarted job carries on
+    from there rather than starting again.
+    """
+
+    def __init__(self, job_id: str, guild_id: int, data: Dict[str, Any]):
+        self.id = job_id
+        self.guild_id = guild_id
+        self.action: str = data["action"]
+        self.role_id: int = data["role"]
+        self.members: List[int] = data["members"]
+        self.position: int = data.get("position", 0)
+        self.failed: int = data.get("failed", 0)
+        self.channel_id: Optional[int] = data.get("channel")
+        self.message_id: Optional[int] = data.get("message")
+        self.author_id: Optional[int] = data.get("author")
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self._started = time.monotonic()
+        self._start_position = self.position
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "role": self.role_id,
+            "members": self.members,
+            "position": self.position,
+            "failed": self.failed,
+            "channel": self.channel_id,
+            "message": self.message_id,
+            "author": self.author_id,
+        }
+
+    @property
+    def remaining(self) -> int:
+        return len(self.members) - self.position
+
+    def eta(self) -> datetime:
+        done = self.position - self._start_position
+        elapsed = time.monotonic() - self._started
+        per_member = elapsed / done if done else EDIT_INTERVAL
+        return datetime.now(timezone.utc) + timedelta(seconds=self.remaining * per_member)
+
+    def progress(self) -> str:
+        if self.action == "add":
+            msg = _("Giving <@&{role}> to {done}/{total} members.")
+        else:
+            msg = _("Removing <@&{role}> from {done}/{total} members.")
+        msg = msg.format(role=self.role_id, done=self.position, total=len(self.members))
+        if self.failed:
+            msg += _(" {failed} failed.").format(failed=self.failed)
+        if self.remaining:
+            msg += _(" Finishing {eta}.").format(eta=discord.utils.format_dt(self.eta(), "R"))
+        return msg
+
+
+class RoleToolsJobs(RoleToolsMixin):
+    """This class handles giving and removing roles from many members."""
+
+    async def start_role_job(
+        self, ctx: Context, role: discord.Role, action: str, members: List[discord.Member]
+    ) -> RoleJob:
+        """
+        Queue a role to be given to or removed from members
+
+        Parameters
+        ----------
+            ctx: Context
+                The context the job was started from. Progress is posted here.
+            role: discord.Role
+                The role being given or removed.
+            action: str
+                Either `add` or `remove`.
+            members: List[discord.Member]
+                The members to change.
+        """
+        job = RoleJob(
+            str(ctx.message.id),
+            ctx.guild.id,
+            {
+                "action": action,
+                "role": role.id,
+                "members": sorted(m.id for m in members),
+                "author": ctx.author.id,
+            },
+        )
+        msg = await ctx.send(job.progress(), allowed_mentions=discord.AllowedMentions.none())
+        job.channel_id = msg.channel.id
+        job.message_id = msg.id
+        await self.config.guild(ctx.guild).role_jobs.set_raw(job.id, value=job.to_dict())
+        self._run_role_job(job)
+        return job
+
+    async def resume_role_jobs(self) -> None:
+        for guild_id, data in self.settings.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            for job_id, job_data in data.get("role_jobs", {}).items():
+                if job_id in self._role_jobs:
+                    continue
+                job = RoleJob(job_id, guild_id, job_data)
+                log.debug("Resuming role job %s in %s at %s", job.id, guild, job.position)
+                self._run_role_job(job)
+
+    def _run_role_job(self, job: RoleJob) -> None:
+        self._role_jobs[job.id] = job
+        job.task = asyncio.create_task(self._role_job_worker(job))
+        job.task.add_done_callback(lambda t: self._role_jobs.pop(job.id, None))
+
+    async def _save_role_job(self, job: RoleJob) -> None:
+        group = self.config.guild_from_id(job.guild_id).role_jobs
+        await group.set_raw(job.id, "position", value=job.position)
+        await group.set_raw(job.id, "failed", value=job.failed)
+
+    async def _role_job_message(self, job: RoleJob, content: str) -> None:
+        guild = self.bot.get_guild(job.guild_id)
+        channel = guild.get_channel_or_thread(job.channel_id) if guild else None
+        if channel is None or job.message_id is None:
+            return
+        try:
+            await channel.get_partial_message(job.message_id).edit(
+                content=content, allowed_mentions=discord.AllowedMentions.none()
+            )
+        except discord.HTTPException:
+            log.debug("Could not edit progress for role job %s", job.id)
+
+    async def _role_job_worker(self, job: RoleJob) -> None:
+        # one job at a time per guild so jobs share the rate limit
+        lock = self._role_job_locks.setdefault(job.guild_id, asyncio.Lock())
+        async with lock:
+            try:
+                content = await self._process_role_job(job)
+            except asyncio.CancelledError:
+                # the cog is unloading, pick up from here next time
+                await self._save_role_job(job)
+                raise
+            except Exception:
+                log.exception("Error running role job %s", job.id)
+                await self._save_role_job(job)
+                return
+        await self.config.guild_from_id(job.guild_id).role_jobs.clear_raw(job.id)
+        await self._role_job_message(job, content)
+
+    async def _process_role_job(self, job: RoleJob) -> str:
+        guild = self.bot.get_guild(job.guild_id)
+        role = guild.get_role(job.role_id) if guild else None
+        if role is None:
+            return _("The role for this job no longer exists.")
+        job._started = time.monotonic()
+        job._start_position = job.position
+        last_edit = 0.0
+        last_progress = time.monotonic()
+        while job.position < len(job.members) and not job.cancelled:
+            member = guild.get_member(job.members[job.position])
+            if role >= guild.me.top_role:
+                return _("{role} is now higher than my highest role.").format(role=role.mention)
+            if member is None or member.top_role >= guild.me.top_role:
+                needs_change = False
+            elif job.action == "add":
+                needs_change = role not in member.roles
+            else:
+                needs_change = role in member.roles
+            if needs_change:
+                wait = last_edit + EDIT_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                last_edit = time.monotonic()
+                try:
+                    if job.action == "add":
+                        await self.give_roles(
+                            member,
+                            [role],
+                            _("Roletools Giverole command"),
+                            check_cost=False,
+                            atomic=False,
+                        )
+                    else:
+                        await self.remove_roles(
+                            member, [role], _("Roletools Removerole command"), atomic=False
+                        )
+                except discord.HTTPException:
+                    log.debug("Could not change roles for %s in %s", member.id, guild)
+                    job.failed += 1
+            job.position += 1
+            if job.position % CHECKPOINT_EVERY == 0:
+                await self._save_role_job(job)
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                await self._role_job_message(job, job.progress())
+        if job.cancelled:
+            return _("Cancelled. ") + job.progress()
+        if job.action == "add":
+            msg = _("Added {role} to {total} members.")
+        else:
+            msg = _("Removed {role} from {total} members.")
+        msg = msg.format(role=role.mention, total=len(job.members) - job.failed)
+        if job.failed:
+            msg += _(" {failed} failed.").format(failed=job.failed)
+        return msg
+
+    @roletools.group(name="jobs", invoke_without_command=True, with_app_command=False)
+    @commands.admin_or_permissions(manage_roles=True)
+    async def role_jobs(self, ctx: Context) -> None:
+        """
+        Show the giverole and removerole commands still running in this server
+        """
+        jobs = [j for j in self._role_jobs.values() if j.guild_id == ctx.guild.id]
+        if not jobs:
+            await ctx.send(_("There are no role jobs running in this server."))
+            return
+        msg = "\n".join(f"`{job.id}` {job.progress()}" for job in jobs)
+        for page in pagify(msg):
+            await ctx.send(page, allowed_mentions=discord.AllowedMentions.none())
+
+    @role_jobs.command(name="cancel")
+    @commands.admin_or_permissions(manage_roles=True)
+    async def role_jobs_cancel(self, ctx: Context, job_id: str) -> None:
+        """
+        Stop a running giverole or removerole command
+
+        `<job_id>` The ID of the job shown in `[p]roletools jobs`.
+        Members who have already been changed keep their roles.
+        """
+        job = self._role_jobs.get(job_id)
+        if job is None or job.guild_id != ctx.guild.id:
+            await ctx.send(_("There's no role job with that ID in this server."))
+            return
+        job.cancelled = True
+        await ctx.send(_("Role job `{job_id}` will stop shortly.").format(job_id=job_id))
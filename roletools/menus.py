@@ -215,6 +215,7 @@ class StickyToggleButton(discord.ui.Button):
         cog = interaction.client.get_cog("RoleTools")
         current = await cog.config.role(self.view._source.current_role).sticky()
         await cog.config.role(self.view._source.current_role).sticky.set(not current)
+        cog.invalidate_role_rules(interaction.guild.id)
         await self.view.show_page(self.view.current_page, interaction)
 
 
@@ -229,6 +230,7 @@ class AutoToggleButton(discord.ui.Button):
         cog = interaction.client.get_cog("RoleTools")
         current = await cog.config.role(self.view._source.current_role).auto()
         await cog.config.role(self.view._source.current_role).auto.set(not current)
+        cog.invalidate_role_rules(interaction.guild.id)
         await self.view.show_page(self.view.current_page, interaction)
 
 
@@ -243,6 +245,7 @@ class SelfAddToggleButton(discord.ui.Button):
         cog = interaction.client.get_cog("RoleTools")
         current = await cog.config.role(self.view._source.current_role).selfassignable()
         await cog.config.role(self.view._source.current_role).selfassignable.set(not current)
+        cog.invalidate_role_rules(interaction.guild.id)
         await self.view.show_page(self.view.current_page, interaction)
 
 
@@ -257,6 +260,7 @@ class SelfRemToggleButton(discord.ui.Button):
         cog = interaction.client.get_cog("RoleTools")
         current = await cog.config.role(self.view._source.current_role).selfremovable()
         await cog.config.role(self.view._source.current_role).selfremovable.set(not current)
+        cog.invalidate_role_rules(interaction.guild.id)
         await self.view.show_page(self.view.current_page, interaction)
 
 
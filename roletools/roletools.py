@@ -3,12 +3,13 @@ from abc import ABC
 from typing import Any, Dict, List, Optional, Union
 
 import discord
+from discord.ext import tasks
 from red_commons.logging import getLogger
 from redbot.core import Config, bank, commands
 from redbot.core.bot import Red
 from redbot.core.commands import Context
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils import AsyncIter, bounded_gather
+from redbot.core.utils import AsyncIter
 from redbot.core.utils.chat_formatting import humanize_list
 
 from .abc import RoleToolsMixin
@@ -17,12 +18,15 @@ from .converter import RawUserIds, RoleHierarchyConverter, SelfRoleConverter
 from .events import RoleToolsEvents
 from .exclusive import RoleToolsExclusive
 from .inclusive import RoleToolsInclusive
+from .jobs import RoleJob, RoleToolsJobs
 from .menus import BaseMenu, ConfirmView, RolePages
 from .messages import RoleToolsMessages
 from .reactions import RoleToolsReactions
 from .requires import RoleToolsRequires
+from .rules import RoleRules
 from .select import RoleToolsSelect
 from .settings import RoleToolsSettings
+from .sticky import StickyRoles
 
 roletools = RoleToolsMixin.roletools
 
@@ -72,6 +76,7 @@ class RoleTools(
     RoleToolsButtons,
     RoleToolsExclusive,
     RoleToolsInclusive,
+    RoleToolsJobs,
     RoleToolsMessages,
     RoleToolsReactions,
     RoleToolsRequires,
@@ -85,7 +90,7 @@ class RoleTools(
     """
 
     __author__ = ["TrustyJAID"]
-    __version__ = "1.5.11"
+    __version__ = "1.8.0"
 
     def __init__(self, bot: Red):
         self.bot = bot
@@ -102,6 +107,7 @@ class RoleTools(
             buttons={},
             select_options={},
             select_menus={},
+            role_jobs={},
         )
         self.config.register_role(
             sticky=False,
@@ -121,6 +127,10 @@ class RoleTools(
         self.settings: Dict[int, Any] = {}
         self._ready: asyncio.Event = asyncio.Event()
         self.views: Dict[int, Dict[str, discord.ui.View]] = {}
+        self._role_rules: Dict[int, RoleRules] = {}
+        self._role_jobs: Dict[str, RoleJob] = {}
+        self._role_job_locks: Dict[int, asyncio.Lock] = {}
+        self._sticky_roles = StickyRoles(self.config)
         self._repo = ""
         self._commit = ""
 
@@ -179,6 +189,7 @@ class RoleTools(
                 # These should be unique messages containing views
                 # and we should track them seperately
         self._ready.set()
+        await self.resume_role_jobs()
 
     async def cog_load(self) -> None:
         if await self.config.version() < "1.0.1":
@@ -216,22 +227,37 @@ class RoleTools(
                             if role.id not in auto_roles:
                                 auto_roles.append(role.id)
             await self.config.version.set("1.0.1")
+        self.flush_sticky_roles.start()
         loop = asyncio.get_running_loop()
         loop.create_task(self.load_views())
         loop.create_task(self.add_cog_to_dev_env())
         loop.create_task(self._get_commit())
 
     async def cog_unload(self):
+        self.flush_sticky_roles.cancel()
+        await self._sticky_roles.flush()
         for views in self.views.values():
             for view in views.values():
                 # Don't forget to remove persistent views when the cog is unloaded.
                 log.verbose("Stopping view %s", view)
                 view.stop()
+        for job in self._role_jobs.values():
+            if job.task is not None:
+                job.task.cancel()
         try:
             self.bot.remove_dev_env_value("roletools")
         except Exception:
             pass
 
+    @tasks.loop(seconds=60)
+    async def flush_sticky_roles(self) -> None:
+        await self._sticky_roles.flush()
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        # any roletools command may have changed a role setting
+        if ctx.guild is not None:
+            self.invalidate_role_rules(ctx.guild.id)
+
     async def confirm_selfassignable(
         self, ctx: commands.Context, roles: List[discord.Role]
     ) -> None:
@@ -366,6 +392,10 @@ class RoleTools(
         **Note:** This runs through exclusive and inclusive role checks
         which may cause unintended roles to be removed/applied.
 
+        Roles are changed in the background at a pace Discord allows and
+        progress is posted here. The job carries on if the bot restarts
+        and can be stopped with `[p]roletools jobs cancel`.
+
         **This command is on a cooldown of 10 seconds per member who receives
         a role up to a maximum of 1 hour.**
         """
@@ -405,21 +435,15 @@ class RoleTools(
                         members += [
                             m async for m in AsyncIter(ctx.guild.members, steps=500) if not m.bot
                         ]
-            members = list(set(members))
-            tasks = []
-            async for m in AsyncIter(members, steps=500):
-                if m.top_role >= ctx.me.top_role or role in m.roles:
-                    continue
-                # tasks.append(m.add_roles(role, reason=_("Roletools Giverole command")))
-                tasks.append(
-                    self.give_roles(
-                        m, [role], _("Roletools Giverole command"), check_cost=False, atomic=False
-                    )
-                )
-            await bounded_gather(*tasks)
-        added_to = humanize_list([getattr(en, "name", en) for en in who])
-        msg = _("Added {role} to {added}.").format(role=role.mention, added=added_to)
-        await ctx.send(msg)
+            members = [
+                m
+                async for m in AsyncIter(set(members), steps=500)
+                if m.top_role < ctx.me.top_role and role not in m.roles
+            ]
+        if not members:
+            await ctx.send(_("Everyone already has the {role} role.").format(role=role.mention))
+            return
+        await self.start_role_job(ctx, role, "add", members)
 
     @roletools.command(with_app_command=False)
     @commands.bot_has_permissions(manage_roles=True)
@@ -452,6 +476,10 @@ class RoleTools(
         **Note:** This runs through exclusive and inclusive role checks
         which may cause unintended roles to be removed/applied.
 
+        Roles are changed in the background at a pace Discord allows and
+        progress is posted here. The job carries on if the bot restarts
+        and can be stopped with `[p]roletools jobs cancel`.
+
         **This command is on a cooldown of 10 seconds per member who receives
         a role up to a maximum of 1 hour.**
         """
@@ -489,21 +517,15 @@ class RoleTools(
                         members += [
                             m async for m in AsyncIter(ctx.guild.members, steps=500) if not m.bot
                         ]
-            members = list(set(members))
-            tasks = []
-            async for m in AsyncIter(members, steps=500):
-                if m.top_role >= ctx.me.top_role or role not in m.roles:
-                    continue
-                # tasks.append(m.add_roles(role, reason=_("Roletools Giverole command")))
-                tasks.append(
-                    self.remove_roles(m, [role], _("Roletools Removerole command"), atomic=False)
-                )
-            await bounded_gather(*tasks)
-        removed_from = humanize_list([getattr(en, "name", en) for en in who])
-        msg = _("Removed the {role} from {removed}.").format(
-            role=role.mention, removed=removed_from
-        )
-        await ctx.send(msg)
+            members = [
+                m
+                async for m in AsyncIter(set(members), steps=500)
+                if m.top_role < ctx.me.top_role and role in m.roles
+            ]
+        if not members:
+            await ctx.send(_("Nobody has the {role} role.").format(role=role.mention))
+            return
+        await self.start_role_job(ctx, role, "remove", members)
 
     @roletools.command()
     @commands.admin_or_permissions(manage_roles=True)
@@ -526,16 +548,9 @@ class RoleTools(
         await ctx.typing()
         errors = []
         for user in users:
-            if isinstance(user, int):
-                async with self.config.member_from_ids(
-                    ctx.guild.id, user
-                ).sticky_roles() as setting:
-                    if role.id not in setting:
-                        setting.append(role.id)
-            elif isinstance(user, discord.Member):
-                async with self.config.member(user).sticky_roles() as setting:
-                    if role.id not in setting:
-                        setting.append(role.id)
+            user_id = user if isinstance(user, int) else user.id
+            await self._sticky_roles.update(ctx.guild, user_id, add=[role.id])
+            if isinstance(user, discord.Member):
                 try:
                     await self.give_roles(user, [role], reason=_("Forced Sticky Role"))
                 except discord.HTTPException:
@@ -572,16 +587,9 @@ class RoleTools(
 
         errors = []
         for user in users:
-            if isinstance(user, int):
-                async with self.config.member_from_ids(
-                    ctx.guild.id, user
-                ).sticky_roles() as setting:
-                    if role in setting:
-                        setting.remove(role.id)
-            elif isinstance(user, discord.Member):
-                async with self.config.member(user).sticky_roles() as setting:
-                    if role.id in setting:
-                        setting.append(role.id)
+            user_id = user if isinstance(user, int) else user.id
+            await self._sticky_roles.update(ctx.guild, user_id, remove=[role.id])
+            if isinstance(user, discord.Member):
                 try:
                     await self.remove_roles(user, [role], reason=_("Force removed sticky role"))
                 except discord.HTTPException:
@@ -0,0 +1,135 @@
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+
+class RoleRule(NamedTuple):
+    selfassignable: bool
+    selfremovable: bool
+    sticky: bool
+    cost: int
+    require_any: bool
+    required: FrozenSet[int]
+    inclusive: FrozenSet[int]
+    exclusive: FrozenSet[int]
+
+
+DEFAULT_RULE = RoleRule(False, False, False, 0, False, frozenset(), frozenset(), frozenset())
+
+
+class RoleRules:
+    """
+    The role settings for a guild compiled into a graph.
+
+    Inclusive, exclusive and required roles are stored as sets of role IDs
+    so giving or removing a role can work out everything that needs to change
+    without reading config. Roles which no longer exist are left out.
+
+    Inclusive roles are followed through every role they include, so a role
+    including a role which includes another adds both. Roles which include
+    each other in a loop are fine, each is only added once, and the loops are
+    kept in `cycles` for reference.
+    """
+
+    def __init__(
+        self, roles: Mapping[int, Mapping[str, Any]], existing: Optional[Iterable[int]] = None
+    ):
+        # roles without any saved settings use the defaults but still exist
+        existing = set(roles if existing is None else existing)
+        self._rules: Dict[int, RoleRule] = {}
+        for role_id, data in roles.items():
+            self._rules[role_id] = RoleRule(
+                selfassignable=data["selfassignable"],
+                selfremovable=data["selfremovable"],
+                sticky=data["sticky"],
+                cost=data["cost"],
+                require_any=data["require_any"],
+                required=frozenset(i for i in data["required"] if i in existing),
+                inclusive=frozenset(i for i in data["inclusive_with"] if i in existing),
+                exclusive=frozenset(i for i in data["exclusive_to"] if i in existing),
+            )
+        self._added: Dict[int, List[int]] = {}
+        self._removed: Dict[int, List[int]] = {}
+        self.cycles: List[FrozenSet[int]] = self._find_cycles()
+
+    def get(self, role_id: int) -> RoleRule:
+        return self._rules.get(role_id, DEFAULT_RULE)
+
+    def _closure(self, role_id: int, attr: str) -> List[int]:
+        # every role reachable through inclusive roles with `attr` set
+        seen: Set[int] = {role_id}
+        found: List[int] = []
+        stack = sorted(self.get(role_id).inclusive)
+        while stack:
+            included = stack.pop()
+            if included in seen:
+                continue
+            seen.add(included)
+            rule = self.get(included)
+            if not getattr(rule, attr):
+                continue
+            found.append(included)
+            stack.extend(sorted(rule.inclusive))
+        return found
+
+    def included(self, role_id: int) -> List[int]:
+        """The self assignable roles added along with `role_id`"""
+        if role_id not in self._added:
+            self._added[role_id] = self._closure(role_id, "selfassignable")
+        return self._added[role_id]
+
+    def removed_with(self, role_id: int) -> List[int]:
+        """The self removable roles removed along with `role_id`"""
+        if role_id not in self._removed:
+            self._removed[role_id] = self._closure(role_id, "selfremovable")
+        return self._removed[role_id]
+
+    def _find_cycles(self) -> List[FrozenSet[int]]:
+        # Tarjan's strongly connected components over the inclusive roles
+        index: Dict[int, int] = {}
+        low: Dict[int, int] = {}
+        on_stack: Set[int] = set()
+        stack: List[int] = []
+        cycles: List[FrozenSet[int]] = []
+        for start in self._rules:
+            if start in index:
+                continue
+            work = [(start, iter(sorted(self.get(start).inclusive)))]
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(sorted(self.get(child).inclusive))))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.add(member)
+                            if member == node:
+                                break
+                        if len(component) > 1:
+                            cycles.append(frozenset(component))
+        return cycles
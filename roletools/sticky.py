@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, Iterable, Set
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+log = getLogger("red.Trusty-cogs.RoleTools")
+
+
+class StickyRoles:
+    """
+    Remembers the sticky roles each member has.
+
+    A guilds sticky roles are loaded from config the first time they're
+    needed and kept up to date in memory. Members whose sticky roles change
+    are marked dirty and only written to config when `flush` is called, so
+    a member gaining and losing roles many times between flushes is written
+    once with their final roles.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._members: Dict[int, Dict[int, Set[int]]] = {}
+        self._dirty: Dict[int, Set[int]] = {}
+        self._lock = asyncio.Lock()
+
+    async def _load(self, guild: discord.Guild) -> Dict[int, Set[int]]:
+        if guild.id not in self._members:
+            async with self._lock:
+                if guild.id not in self._members:
+                    data = await self.config.all_members(guild)
+                    self._members[guild.id] = {
+                        member_id: set(settings["sticky_roles"])
+                        for member_id, settings in data.items()
+                        if settings.get("sticky_roles")
+                    }
+        return self._members[guild.id]
+
+    async def get(self, guild: discord.Guild, member_id: int) -> Set[int]:
+        members = await self._load(guild)
+        return set(members.get(member_id, ()))
+
+    async def update(
+        self,
+        guild: discord.Guild,
+        member_id: int,
+        *,
+        add: Iterable[int] = (),
+        remove: Iterable[int] = (),
+    ) -> None:
+        members = await self._load(guild)
+        roles = members.get(member_id, set())
+        new_roles = (roles | set(add)) - set(remove)
+        if new_roles == roles:
+            return
+        if new_roles:
+            members[member_id] = new_roles
+        else:
+            members.pop(member_id, None)
+        self._dirty.setdefault(guild.id, set()).add(member_id)
+
+    async def pop(self, guild: discord.Guild, member_id: int) -> Set[int]:
+        members = await self._load(guild)
+        roles = members.pop(member_id, set())
+        if roles:
+            self._dirty.setdefault(guild.id, set()).add(member_id)
+        return roles
+
+    async def flush(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        for guild_id, member_ids in dirty.items():
+            members = self._members.get(guild_id, {})
+            log.trace("Saving sticky roles for %s members in %s", len(member_ids), guild_id)
+            for member_id in member_ids:
+                group = self.config.member_from_ids(guild_id, member_id).sticky_roles
+                try:
+                    if roles := members.get(member_id):
+                        await group.set(sorted(roles))
+                    else:
+                        await group.clear()
+                except Exception:
+                    log.exception("Error saving sticky roles for %s in %s", member_id, guild_id)
+                    self._dirty.setdefault(guild_id, set()).add(member_id)
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+log = getLogger("red.trusty-cogs.ServerStats")
+
+# Saved under the guild "activity" key
+# {
+#   "members": {member_id: [last_message_timestamp, message_count]},
+#   "since": timestamp every message after which has been indexed,
+#   "gap": [start, end] of time the bot was offline and hasn't been read yet,
+#   "heartbeat": timestamp of the last save,
+# }
+
+
+def _timestamp(dt: Optional[datetime] = None) -> float:
+    return (dt or datetime.now(timezone.utc)).timestamp()
+
+
+class ActivityIndex:
+    """
+    The last time each member spoke and how many messages they've sent.
+
+    A guild is only indexed once something has asked for its activity.
+    From then on messages are recorded as they arrive and saved with the
+    other live counters. Asking for activity further back than the index
+    covers reads only the missing part of the history once.
+    """
+
+    def __init__(self, config: Config, concurrency: int = 4):
+        self.config = config
+        self.concurrency = concurrency
+        self.tracked: Set[int] = set()
+        self._pending: Dict[int, Dict[str, List[float]]] = {}
+        # guilds whose first index is being read, their live messages
+        # stay pending until it's saved so a failed read leaves nothing behind
+        self._building: Set[int] = set()
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def load(self) -> None:
+        """Start indexing every guild which was indexed before the cog was loaded"""
+        now = _timestamp()
+        for guild_id, data in (await self.config.all_guilds()).items():
+            activity = data["activity"]
+            if activity["since"] is None:
+                continue
+            self.tracked.add(guild_id)
+            gap = activity["gap"]
+            if gap is not None:
+                # an older gap hasn't been read yet so extend it over this downtime as well
+                gap[1] = now
+            else:
+                gap = [activity["heartbeat"] or activity["since"], now]
+            await self.config.guild_from_id(guild_id).activity.gap.set(gap)
+
+    def add(self, message: discord.Message) -> None:
+        if message.guild is None or message.guild.id not in self.tracked:
+            return
+        self._record(self._pending.setdefault(message.guild.id, {}), message)
+
+    @staticmethod
+    def _record(members: Dict[str, List[float]], message: discord.Message) -> None:
+        author_id = str(message.author.id)
+        created = message.created_at.timestamp()
+        if author_id not in members:
+            members[author_id] = [created, 1]
+            return
+        entry = members[author_id]
+        entry[0] = max(entry[0], created)
+        entry[1] += 1
+
+    @staticmethod
+    def _merge(saved: Dict[str, List[float]], new: Dict[str, List[float]]) -> None:
+        for member_id, (last, count) in new.items():
+            if member_id not in saved:
+                saved[member_id] = [last, count]
+                continue
+            saved[member_id][0] = max(saved[member_id][0], last)
+            saved[member_id][1] += count
+
+    async def flush_guild(self, guild_id: int) -> None:
+        if guild_id in self._building:
+            return
+        pending = self._pending.pop(guild_id, {})
+        if guild_id not in self.tracked:
+            return
+        async with self.config.guild_from_id(guild_id).activity() as activity:
+            self._merge(activity["members"], pending)
+            activity["heartbeat"] = _timestamp()
+
+    async def flush(self) -> None:
+        for guild_id in list(self.tracked):
+            try:
+                await self.flush_guild(guild_id)
+            except Exception:
+                log.exception("Error saving member activity for guild %s", guild_id)
+
+    async def get(self, guild: discord.Guild, after: datetime) -> Dict[str, List[float]]:
+        """
+        Get `{member_id: [last_message_timestamp, message_count]}` for `guild`.
+
+        Every message sent after `after` is guaranteed to be included,
+        reading any history the index doesn't cover yet first.
+        """
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            now = datetime.now(timezone.utc)
+            activity = await self.config.guild(guild).activity()
+            if activity["since"] is None:
+                # new messages are recorded live from here and the history
+                # before now is read below so nothing is counted twice
+                self.tracked.add(guild.id)
+                self._building.add(guild.id)
+                try:
+                    await self._backfill(guild, after, now)
+                    await self.config.guild(guild).activity.since.set(_timestamp(after))
+                except BaseException:
+                    # start over next time rather than saving a partial index
+                    self.tracked.discard(guild.id)
+                    self._pending.pop(guild.id, None)
+                    raise
+                finally:
+                    self._building.discard(guild.id)
+            else:
+                if activity["gap"] is not None:
+                    start, end = activity["gap"]
+                    await self._backfill(
+                        guild,
+                        datetime.fromtimestamp(start, timezone.utc),
+                        datetime.fromtimestamp(end, timezone.utc),
+                    )
+                    await self.config.guild(guild).activity.gap.set(None)
+                since = datetime.fromtimestamp(activity["since"], timezone.utc)
+                if after < since:
+                    await self._backfill(guild, after, since)
+                    await self.config.guild(guild).activity.since.set(_timestamp(after))
+            await self.flush_guild(guild.id)
+        return await self.config.guild(guild).activity.members()
+
+    async def _backfill(self, guild: discord.Guild, after: datetime, before: datetime) -> None:
+        log.debug("Reading activity in %s from %s to %s", guild, after, before)
+        found: Dict[str, List[float]] = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def read(channel: discord.TextChannel):
+            async with semaphore:
+                try:
+                    async for message in channel.history(limit=None, after=after, before=before):
+                        self._record(found, message)
+                except (AttributeError, discord.Forbidden):
+                    log.debug("Error reading history in %s", channel, exc_info=True)
+
+        channels = [
+            c
+            for c in guild.text_channels
+            if c.permissions_for(guild.me).read_message_history
+            and c.permissions_for(guild.me).read_messages
+        ]
+        await asyncio.gather(*(read(c) for c in channels))
+        async with self.config.guild(guild).activity.members() as members:
+            self._merge(members, found)
+
+    def forget_member(self, member_id: int) -> None:
+        for members in self._pending.values():
+            members.pop(str(member_id), None)
@@ -1,10 +1,12 @@
 import re
-from typing import List, Union
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Union
 
 import discord
 from discord.ext.commands.converter import IDConverter
 from discord.ext.commands.errors import BadArgument
 from rapidfuzz import process
+from rapidfuzz.utils import default_process
 from red_commons.logging import getLogger
 from redbot.core import commands
 from redbot.core.i18n import Translator
@@ -13,6 +15,91 @@ from unidecode import unidecode
 _ = Translator("ServerStats", __file__)
 log = getLogger("red.trusty-cogs.ServerStats")
 
+# Names are indexed by every prefix up to this many characters
+PREFIX_LENGTH = 32
+
+
+class GuildNameIndex:
+    """
+    Normalized guild names kept ready for fuzzy matching.
+
+    Names are passed through unidecode and rapidfuzz's default processor
+    once when a guild is added rather than on every lookup. The cog keeps
+    this up to date from guild join, remove and update events.
+    """
+
+    def __init__(self):
+        self._names: Dict[int, str] = {}
+        self._prefixes: Dict[str, Set[int]] = defaultdict(set)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return default_process(unidecode(name))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, guild: discord.Guild) -> None:
+        self.remove(guild.id)
+        name = self.normalize(guild.name)
+        self._names[guild.id] = name
+        for i in range(1, min(len(name), PREFIX_LENGTH) + 1):
+            self._prefixes[name[:i]].add(guild.id)
+
+    def remove(self, guild_id: int) -> None:
+        name = self._names.pop(guild_id, None)
+        if name is None:
+            return
+        for i in range(1, min(len(name), PREFIX_LENGTH) + 1):
+            ids = self._prefixes.get(name[:i])
+            if ids is None:
+                continue
+            ids.discard(guild_id)
+            if not ids:
+                del self._prefixes[name[:i]]
+
+    def rebuild(self, guilds: List[discord.Guild]) -> None:
+        self._names.clear()
+        self._prefixes.clear()
+        for guild in guilds:
+            self.add(guild)
+
+    def ensure(self, bot) -> None:
+        """Rebuild the index if it has fallen out of step with the bots guilds"""
+        if len(self._names) != len(bot.guilds):
+            self.rebuild(bot.guilds)
+
+    def startswith(self, prefix: str) -> Set[int]:
+        """The ids of every guild whose normalized name starts with `prefix`"""
+        prefix = self.normalize(prefix)
+        if not prefix:
+            return set(self._names)
+        ids = self._prefixes.get(prefix[:PREFIX_LENGTH], set())
+        if len(prefix) <= PREFIX_LENGTH:
+            return set(ids)
+        return {i for i in ids if self._names[i].startswith(prefix)}
+
+    def best(self, query: str) -> Optional[int]:
+        match = process.extractOne(self.normalize(query), self._names, processor=None)
+        return match[2] if match else None
+
+    def search(
+        self, query: str, limit: Optional[int] = None, score_cutoff: float = 0
+    ) -> List[int]:
+        return [
+            guild_id
+            for name, score, guild_id in process.extract(
+                self.normalize(query),
+                self._names,
+                processor=None,
+                limit=limit,
+                score_cutoff=score_cutoff,
+            )
+        ]
+
+
+guild_index = GuildNameIndex()
+
 
 class GuildConverter(discord.app_commands.Transformer):
     """
@@ -31,8 +118,10 @@ class GuildConverter(discord.app_commands.Transformer):
         result = None
         if not argument.isdigit():
             # Not a mention
-            for g in process.extractOne(argument, {g: unidecode(g.name) for g in bot.guilds}):
-                result = g
+            guild_index.ensure(bot)
+            guild_id = guild_index.best(argument)
+            if guild_id is not None:
+                result = bot.get_guild(guild_id)
         else:
             guild_id = int(argument)
             result = bot.get_guild(guild_id)
@@ -52,20 +141,24 @@ class GuildConverter(discord.app_commands.Transformer):
     async def autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> List[discord.app_commands.Choice]:
-        if await interaction.client.is_owner(interaction.user):
-            choices = [
-                discord.app_commands.Choice(name=g.name, value=str(g.id))
-                for g in interaction.client.guilds
-                if current.lower() in g.name.lower()
-            ]
-        else:
-            choices = [
-                discord.app_commands.Choice(name=g.name, value=str(g.id))
-                for g in interaction.client.guilds
-                if current.lower() in g.name.lower()
-                and g.get_member(interaction.user.id) is not None
-            ]
-        return choices[:25]
+        bot = interaction.client
+        guild_index.ensure(bot)
+        is_owner = await bot.is_owner(interaction.user)
+        # names starting with what's been typed come first followed by the closest matches
+        ids = sorted(guild_index.startswith(current))
+        if len(ids) < 25 and current:
+            ids += [i for i in guild_index.search(current, limit=50) if i not in ids]
+        choices = []
+        for guild_id in ids:
+            g = bot.get_guild(guild_id)
+            if g is None:
+                continue
+            if not is_owner and g.get_member(interaction.user.id) is None:
+                continue
+            choices.append(discord.app_commands.Choice(name=g.name, value=str(g.id)))
+            if len(choices) == 25:
+                break
+        return choices
 
 
 class MultiGuildConverter(IDConverter):
@@ -89,10 +182,11 @@ class MultiGuildConverter(IDConverter):
             raise BadArgument(_("That option is only available for the bot owner."))
         if not match:
             # Not a mention
-            for g in process.extract(
-                argument, {g: unidecode(g.name) for g in bot.guilds}, limit=None, score_cutoff=75
-            ):
-                result.append(g[2])
+            guild_index.ensure(bot)
+            for guild_id in guild_index.search(argument, score_cutoff=75):
+                guild = bot.get_guild(guild_id)
+                if guild is not None:
+                    result.append(guild)
         else:
             guild_id = int(match.group(1))
             guild = bot.get_guild(guild_id)
@@ -0,0 +1,97 @@
+from collections import Counter, defaultdict
+from typing import Dict, Set
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+log = getLogger("red.trusty-cogs.ServerStats")
+
+
+def should_count(message: discord.Message) -> bool:
+    # webhook messages all have the same discriminator and aren't real members
+    return not (message.author.discriminator == "0000" and message.author.bot)
+
+
+class GuildBuffer:
+    """Counts for a single guild which have not been saved yet"""
+
+    def __init__(self):
+        self.total = 0
+        self.members: Counter = Counter()
+        self.channels: Dict[str, Counter] = defaultdict(Counter)
+        self.channel_totals: Counter = Counter()
+        self.days: Counter = Counter()
+
+    def add(self, message: discord.Message) -> None:
+        author_id = str(message.author.id)
+        channel_id = str(message.channel.id)
+        self.total += 1
+        self.members[author_id] += 1
+        self.channels[channel_id][author_id] += 1
+        self.channel_totals[channel_id] += 1
+        self.days[message.created_at.strftime("%Y-%m-%d")] += 1
+
+    def merge_into(self, data: dict) -> None:
+        data["total"] += self.total
+        for member_id, count in self.members.items():
+            data["members"][member_id] = data["members"].get(member_id, 0) + count
+        for channel_id, members in self.channels.items():
+            if channel_id not in data["channels"]:
+                data["channels"][channel_id] = {"members": {}, "total": 0, "last_checked": 0}
+            channel = data["channels"][channel_id]
+            channel["total"] += self.channel_totals[channel_id]
+            for member_id, count in members.items():
+                channel["members"][member_id] = channel["members"].get(member_id, 0) + count
+        for day, count in self.days.items():
+            data["days"][day] = data["days"].get(day, 0) + count
+
+    def forget_member(self, member_id: str) -> None:
+        self.members.pop(member_id, None)
+        for members in self.channels.values():
+            members.pop(member_id, None)
+
+
+class MessageCounter:
+    """
+    Live message counters for guilds which have opted in.
+
+    Messages are counted in memory as they arrive and merged into
+    config in one write per guild whenever `flush` is called.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.tracked: Set[int] = set()
+        self._buffers: Dict[int, GuildBuffer] = {}
+
+    def add(self, message: discord.Message) -> None:
+        if message.guild is None or message.guild.id not in self.tracked:
+            return
+        if not should_count(message):
+            return
+        if message.guild.id not in self._buffers:
+            self._buffers[message.guild.id] = GuildBuffer()
+        self._buffers[message.guild.id].add(message)
+
+    async def flush_guild(self, guild_id: int) -> None:
+        buffer = self._buffers.pop(guild_id, None)
+        if buffer is None:
+            return
+        async with self.config.guild_from_id(guild_id).all() as data:
+            buffer.merge_into(data)
+
+    async def flush(self) -> None:
+        for guild_id in list(self._buffers):
+            try:
+                await self.flush_guild(guild_id)
+            except Exception:
+                log.exception("Error saving message counts for guild %s", guild_id)
+
+    def forget_member(self, member_id: int) -> None:
+        for buffer in self._buffers.values():
+            buffer.forget_member(str(member_id))
+
+    def discard(self, guild_id: int) -> None:
+        self.tracked.discard(guild_id)
+        self._buffers.pop(guild_id, None)
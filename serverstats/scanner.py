@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import discord
+from red_commons.logging import getLogger
+from redbot.core import Config
+
+from .counter import GuildBuffer, should_count
+
+log = getLogger("red.trusty-cogs.ServerStats")
+
+# discord.py rate limits message history per channel so a few
+# channels can be read at once without fighting over the same bucket
+DEFAULT_CONCURRENCY = 4
+# how many messages are counted before they're saved with the channel checkpoint
+CHECKPOINT_EVERY = 1000
+
+
+class ScanProgress:
+    """Progress of a single full history scan"""
+
+    def __init__(self, guild: discord.Guild, channels: int):
+        self.guild = guild
+        self.channels = channels
+        self.channels_done = 0
+        self.messages = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished or time.monotonic()
+        return end - self.started
+
+    @property
+    def rate(self) -> float:
+        """Messages counted per second"""
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return self.messages / elapsed
+
+    def __str__(self) -> str:
+        return (
+            f"{self.channels_done}/{self.channels} channels, "
+            f"{self.messages:,} messages ({self.rate:,.0f}/s)"
+        )
+
+
+class HistoryScanner:
+    """
+    Reads channel history into the saved guild stats.
+
+    Several channels are read at once and each channel saves its counts
+    together with the id of the last message counted every `CHECKPOINT_EVERY`
+    messages. Channels are read from oldest to newest so an interrupted
+    scan picks up from the last checkpoint without counting anything twice.
+
+    Only one scan runs per guild, asking for a guild already being scanned
+    waits on the running scan.
+    """
+
+    def __init__(self, config: Config, concurrency: int = DEFAULT_CONCURRENCY):
+        self.config = config
+        self.concurrency = concurrency
+        self.progress: Dict[int, ScanProgress] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._channel_locks: Dict[int, asyncio.Lock] = {}
+
+    def is_scanning(self, guild: discord.Guild) -> bool:
+        return guild.id in self._tasks and not self._tasks[guild.id].done()
+
+    async def scan_guild(self, guild: discord.Guild) -> ScanProgress:
+        if not self.is_scanning(guild):
+            channels = [c for c in guild.text_channels if self.can_read(c)]
+            self._tasks[guild.id] = asyncio.create_task(self._scan(guild, channels))
+        return await asyncio.shield(self._tasks[guild.id])
+
+    async def scan_channel(self, channel: discord.TextChannel) -> ScanProgress:
+        if self.is_scanning(channel.guild):
+            # the running guild scan includes this channel
+            return await asyncio.shield(self._tasks[channel.guild.id])
+        return await self._scan(channel.guild, [channel] if self.can_read(channel) else [])
+
+    @staticmethod
+    def can_read(channel: discord.TextChannel) -> bool:
+        my_perms = channel.permissions_for(channel.guild.me)
+        return my_perms.read_message_history and my_perms.read_messages
+
+    async def _scan(self, guild: discord.Guild, channels: list) -> ScanProgress:
+        progress = ScanProgress(guild, len(channels))
+        self.progress[guild.id] = progress
+        # messages after tracking started are counted live
+        before = None
+        if await self.config.guild(guild).track_messages():
+            since = await self.config.guild(guild).tracking_since()
+            before = discord.Object(id=since) if since else None
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(channel: discord.TextChannel):
+            async with semaphore:
+                await self._scan_channel(channel, before, progress)
+                progress.channels_done += 1
+
+        try:
+            await asyncio.gather(*(worker(c) for c in channels))
+        finally:
+            progress.finished = time.monotonic()
+            log.info("Finished scanning %s: %s", guild, progress)
+        return progress
+
+    async def _scan_channel(
+        self,
+        channel: discord.TextChannel,
+        before: Optional[discord.abc.Snowflake],
+        progress: ScanProgress,
+    ) -> None:
+        lock = self._channel_locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            # read the checkpoint inside the lock in case another scan just moved it
+            last_checked = await self.config.guild(channel.guild).channels.get_raw(
+                str(channel.id), "last_checked", default=0
+            )
+            after = discord.Object(id=last_checked) if last_checked else None
+            buffer = GuildBuffer()
+            last_id = None
+            log.verbose("_scan_channel %s after: %s", channel, after)
+            try:
+                async for message in channel.history(
+                    limit=None, after=after, before=before, oldest_first=True
+                ):
+                    last_id = message.id
+                    if should_count(message):
+                        buffer.add(message)
+                        progress.messages += 1
+                        if buffer.total >= CHECKPOINT_EVERY:
+                            await self._checkpoint(channel, buffer, last_id)
+                            buffer = GuildBuffer()
+            except (AttributeError, discord.Forbidden):
+                log.debug("Error reading history in %s", channel, exc_info=True)
+            if last_id is not None:
+                await self._checkpoint(channel, buffer, last_id)
+
+    async def _checkpoint(self, channel: discord.TextChannel, buffer: GuildBuffer, last_id: int):
+        async with self.config.guild(channel.guild).all() as data:
+            buffer.merge_into(data)
+            channel_id = str(channel.id)
+            if channel_id not in data["channels"]:
+                data["channels"][channel_id] = {"members": {}, "total": 0, "last_checked": 0}
+            data["channels"][channel_id]["last_checked"] = last_id
+
+    def cancel_all(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
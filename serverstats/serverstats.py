@@ -1,6 +1,5 @@
 import asyncio
 import os
-from copy import copy
 from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from typing import Dict, List, Literal, Optional, Tuple, Union
@@ -8,6 +7,7 @@ from typing import Dict, List, Literal, Optional, Tuple, Union
 import aiohttp
 import discord
 import psutil
+from discord.ext import tasks
 from red_commons.logging import getLogger
 from redbot import VersionInfo, version_info
 from redbot.core import Config, checks, commands
@@ -23,7 +23,14 @@ from redbot.core.utils.chat_formatting import (
     pagify,
 )
 
-from .converters import GuildConverter, MultiGuildConverter, PermissionConverter
+from .activity import ActivityIndex
+from .converters import (
+    GuildConverter,
+    MultiGuildConverter,
+    PermissionConverter,
+    guild_index,
+)
+from .counter import MessageCounter
 from .menus import (
     AvatarPages,
     BaseView,
@@ -32,6 +39,7 @@ from .menus import (
     ListPages,
     TopMemberPages,
 )
+from .scanner import HistoryScanner
 
 _ = Translator("ServerStats", __file__)
 log = getLogger("red.trusty-cogs.ServerStats")
@@ -45,16 +53,68 @@ class ServerStats(commands.GroupCog):
     """
 
     __author__ = ["TrustyJAID", "Preda"]
-    __version__ = "1.8.0"
+    __version__ = "1.12.0"
 
     def __init__(self, bot):
         self.bot: Red = bot
         default_global: dict = {"join_channel": None}
-        default_guild: dict = {"last_checked": 0, "members": {}, "total": 0, "channels": {}}
+        default_guild: dict = {
+            "last_checked": 0,
+            "members": {},
+            "total": 0,
+            "channels": {},
+            "days": {},
+            "track_messages": False,
+            "tracking_since": None,
+            "backfilled": False,
+            "stop_tracking": False,
+            "activity": {"members": {}, "since": None, "gap": None, "heartbeat": None},
+        }
         self.config: Config = Config.get_conf(self, 54853421465543, force_registration=True)
         self.config.register_global(**default_global)
         self.config.register_guild(**default_guild)
         self.process = psutil.Process()
+        self.counter = MessageCounter(self.config)
+        self.scanner = HistoryScanner(self.config)
+        self.activity = ActivityIndex(self.config)
+        self._backfills: Dict[int, asyncio.Task] = {}
+
+    async def cog_load(self) -> None:
+        for guild_id, data in (await self.config.all_guilds()).items():
+            if not data["track_messages"]:
+                continue
+            self.counter.tracked.add(guild_id)
+            if not data["backfilled"]:
+                self.start_backfill(guild_id)
+        await self.activity.load()
+        self.flush_counters.start()
+
+    async def cog_unload(self) -> None:
+        self.flush_counters.cancel()
+        for task in self._backfills.values():
+            task.cancel()
+        self.scanner.cancel_all()
+        await self.counter.flush()
+        await self.activity.flush()
+
+    @tasks.loop(seconds=60)
+    async def flush_counters(self) -> None:
+        await self.counter.flush()
+        await self.activity.flush()
+
+    @flush_counters.before_loop
+    async def before_flush_counters(self) -> None:
+        await self.bot.wait_until_red_ready()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        self.counter.add(message)
+        self.activity.add(message)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild) -> None:
+        if before.name != after.name:
+            guild_index.add(after)
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """
@@ -72,6 +132,8 @@ class ServerStats(commands.GroupCog):
         """
         Method for finding users data inside the cog and deleting it.
         """
+        self.counter.forget_member(user_id)
+        self.activity.forget_member(user_id)
         all_guilds = await self.config.all_guilds()
         for guild_id, data in all_guilds.items():
             save = False
@@ -82,6 +144,9 @@ class ServerStats(commands.GroupCog):
                 if str(user_id) in chan_data["members"]:
                     del chan_data["members"][str(user_id)]
                     save = True
+            if str(user_id) in data["activity"]["members"]:
+                del data["activity"]["members"][str(user_id)]
+                save = True
             if save:
                 await self.config.guild_from_id(guild_id).set(data)
 
@@ -106,6 +171,7 @@ class ServerStats(commands.GroupCog):
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
         """Build and send a message containing serverinfo when the bot joins a new server"""
+        guild_index.add(guild)
         channel_id = await self.config.join_channel()
         if channel_id is None:
             return
@@ -337,6 +403,7 @@ class ServerStats(commands.GroupCog):
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild) -> None:
         """Build and send a message containing serverinfo when the bot leaves a server"""
+        guild_index.remove(guild.id)
         channel_id = await self.config.join_channel()
         if channel_id is None:
             return
@@ -780,24 +847,18 @@ class ServerStats(commands.GroupCog):
     ) -> List[discord.Member]:
         now = datetime.now(timezone.utc)
         after = now - timedelta(days=days)
-        member_list = []
         if role:
-            if not isinstance(role, discord.Role):
-                for r in role:
-                    for m in r.members:
-                        if m.top_role < ctx.me.top_role:
-                            member_list.append(m)
-            else:
-                member_list = [m for m in role.members if m.top_role < ctx.me.top_role]
+            roles = [role] if isinstance(role, discord.Role) else role
+            members = {m for r in roles for m in r.members}
         else:
-            member_list = [m for m in ctx.guild.members if m.top_role < ctx.me.top_role]
-        for channel in ctx.guild.text_channels:
-            if not channel.permissions_for(ctx.me).read_message_history:
-                continue
-            async for message in channel.history(limit=None, after=after):
-                if message.author in member_list:
-                    member_list.remove(message.author)
-        return member_list
+            members = ctx.guild.members
+        activity = await self.activity.get(ctx.guild, after)
+        cutoff = after.timestamp()
+        return [
+            m
+            for m in members
+            if m.top_role < ctx.me.top_role and activity.get(str(m.id), (0, 0))[0] < cutoff
+        ]
 
     @commands.group()
     @commands.guild_only()
@@ -1646,6 +1707,9 @@ class ServerStats(commands.GroupCog):
         """
         This is a very expensive function but handles only pulling new
         data into config since the last time the command has been run.
+
+        Progress is saved as each channel is read so an interrupted
+        scan continues where it left off the next time this is run.
         """
 
         # to_return: Dict[str, Union[int, Dict[int, int]]] = {
@@ -1653,97 +1717,159 @@ class ServerStats(commands.GroupCog):
         # "members": {m.id: 0 for m in guild.members},
         # "total_posts": 0,
         # "channels": {},
+        # "days": {},
         # } This is the data schema for saved data
         # It's all formatted easily for end user data request and deletion
-        # to_return = await self.config.guild(guild).all()
-        async with self.config.guild(guild).all() as to_return:
-            for channel in guild.text_channels:
-                my_perms = channel.permissions_for(guild.me)
-                set_new_last_read = False
-
-                if str(channel.id) not in to_return["channels"]:
-                    to_return["channels"][str(channel.id)] = {}
-                    to_return["channels"][str(channel.id)]["members"] = {}
-                    to_return["channels"][str(channel.id)]["total"] = 0
-                    to_return["channels"][str(channel.id)]["last_checked"] = 0
-                    check_after = None
-                else:
-                    check_after = discord.Object(
-                        id=to_return["channels"][str(channel.id)]["last_checked"]
-                    )
-                if not my_perms.read_message_history or not my_perms.read_messages:
-                    continue
-                try:
-                    log.verbose("get_server_stats check_after: %s", check_after)
-                    async for message in channel.history(
-                        limit=None, after=check_after, oldest_first=False
-                    ):
-                        if not set_new_last_read:
-                            log.debug("Setting last_checked to %s", message.id)
-                            to_return["channels"][str(channel.id)]["last_checked"] = message.id
-                            set_new_last_read = True
-                        author = message.author
-                        if author.discriminator == "0000" and author.bot:
-                            continue
-                        if str(author.id) not in to_return["members"]:
-                            to_return["members"][str(author.id)] = 0
-                        if str(author.id) not in to_return["channels"][str(channel.id)]["members"]:
-                            to_return["channels"][str(channel.id)]["members"][str(author.id)] = 0
-                        to_return["channels"][str(channel.id)]["members"][str(author.id)] += 1
-                        to_return["channels"][str(channel.id)]["total"] += 1
-                        to_return["members"][str(author.id)] += 1
-                        to_return["total"] += 1
-
-                except (AttributeError, discord.Forbidden):
-                    log.debug("the heck", exc_info=True)
-                    pass
-            _ret = copy(to_return)
-            # copy the data to prevent context manager from removing the reference
-            log.verbose("get_server_stats _ret: %s", _ret)
-        return _ret
+        await self.scanner.scan_guild(guild)
+        return await self.config.guild(guild).all()
 
     async def get_channel_stats(self, channel: discord.TextChannel) -> dict:
         """
         This is another expensive function but handles only pulling
         new data into config since the last time the command has been run.
         """
-        guild = channel.guild
-        async with self.config.guild(guild).all() as to_return:
-            my_perms = channel.permissions_for(guild.me)
-            set_new_last_read = False
-            if channel.id not in to_return["channels"]:
-                to_return["channels"][str(channel.id)] = {}
-                to_return["channels"][str(channel.id)]["members"] = {}
-                to_return["channels"][str(channel.id)]["total"] = 0
-                to_return["channels"][str(channel.id)]["last_checked"] = 0
-                check_after = None
-            else:
-                check_after = to_return["channels"][str(channel.id)]["last_checked"]
-            if not my_perms.read_message_history or not my_perms.read_messages:
-                return {}  # we shouldn't have even reached this far before
+        if not self.scanner.can_read(channel):
+            return {}  # we shouldn't have even reached this far before
+        # we still want to update the guild totals if we happened to pull a specific channel
+        await self.scanner.scan_channel(channel)
+        return await self.config.guild(channel.guild).all()
+
+    async def wait_with_progress(self, ctx: commands.Context, coro) -> dict:
+        """
+        Run a history scan while showing its progress in `ctx`.
+        """
+        task = asyncio.create_task(coro)
+        msg = None
+        while True:
+            done, pending = await asyncio.wait({task}, timeout=15)
+            if done:
+                break
+            progress = self.scanner.progress.get(ctx.guild.id)
+            if progress is None:
+                continue
+            content = _("Reading message history: {progress}").format(progress=progress)
             try:
-                async for message in channel.history(
-                    limit=None, after=check_after, oldest_first=False
-                ):
-                    if not set_new_last_read:
-                        to_return["channels"][str(channel.id)]["last_checked"] = message.id
-                        set_new_last_read = True
-                    author = message.author
-                    if author.discriminator == "0000" and author.bot:
-                        continue
-                    if str(author.id) not in to_return["members"]:
-                        to_return["members"][str(author.id)] = 0
-                    if str(author.id) not in to_return["channels"][str(channel.id)]["members"]:
-                        to_return["channels"][str(channel.id)]["members"][str(author.id)] = 0
-                    to_return["channels"][str(channel.id)]["members"][str(author.id)] += 1
-                    to_return["channels"][str(channel.id)]["total"] += 1
-                    to_return["members"][str(author.id)] += 1
-                    to_return["total"] += 1
-                    # we still want to update the guild totals if we happened to  pull a specific channel
-            except (AttributeError, discord.Forbidden):
+                if msg is None:
+                    msg = await ctx.send(content)
+                else:
+                    await msg.edit(content=content)
+            except discord.HTTPException:
                 pass
-            _ret = copy(to_return)
-        return _ret
+        if msg is not None:
+            try:
+                await msg.delete()
+            except discord.HTTPException:
+                pass
+        return task.result()
+
+    async def get_tracked_stats(self, guild: discord.Guild) -> Optional[dict]:
+        """
+        Get the stats for a guild from the live counters.
+
+        Returns `None` if the guild isn't tracking messages or the
+        initial history backfill hasn't finished yet.
+        """
+        if guild.id not in self.counter.tracked:
+            return None
+        if not await self.config.guild(guild).backfilled():
+            return None
+        await self.counter.flush_guild(guild.id)
+        return await self.config.guild(guild).all()
+
+    def start_backfill(self, guild_id: int) -> None:
+        if guild_id in self._backfills and not self._backfills[guild_id].done():
+            return
+        self._backfills[guild_id] = asyncio.create_task(self.backfill(guild_id))
+
+    async def backfill(self, guild_id: int) -> None:
+        """
+        Seed the live counters with every message sent before tracking started.
+        """
+        await self.bot.wait_until_red_ready()
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        log.info("Backfilling message stats for %s", guild)
+        try:
+            # the scanner stops at tracking_since on its own
+            await self.get_server_stats(guild)
+        except Exception:
+            log.exception("Error backfilling message stats for %s", guild)
+            return
+        await self.config.guild(guild).backfilled.set(True)
+        log.info("Finished backfilling message stats for %s", guild)
+        if await self.config.guild(guild).stop_tracking():
+            await self._stop_tracking(guild)
+
+    async def _stop_tracking(self, guild: discord.Guild) -> None:
+        await self.counter.flush_guild(guild.id)
+        self.counter.discard(guild.id)
+        # everything up to now has been counted live so the history
+        # scans should start from here to avoid counting anything twice
+        now = discord.utils.time_snowflake(datetime.now(timezone.utc))
+        async with self.config.guild(guild).channels() as channels:
+            for channel_data in channels.values():
+                channel_data["last_checked"] = now
+        await self.config.guild(guild).stop_tracking.set(False)
+        await self.config.guild(guild).track_messages.set(False)
+
+    @commands.hybrid_command(name="trackmessages")
+    @checks.admin_or_permissions(manage_guild=True)
+    @commands.bot_has_permissions(read_message_history=True)
+    @commands.guild_only()
+    async def track_messages(self, ctx: commands.Context, true_or_false: bool) -> None:
+        """
+        Keep live message counts for `serverstats` and `channelstats`.
+
+        When enabled every new message is counted as it's sent and the
+        existing history is scanned once in the background to seed the counts.
+        Once that scan finishes `serverstats` and `channelstats` respond
+        immediately instead of reading the channel history. Turning this off
+        before that scan finishes waits for it before counting stops.
+
+        - `<true_or_false>` whether to count messages on this server.
+        """
+        guild = ctx.guild
+        if true_or_false:
+            if guild.id in self.counter.tracked:
+                if await self.config.guild(guild).stop_tracking():
+                    await self.config.guild(guild).stop_tracking.set(False)
+                    await ctx.send(_("I will keep counting messages on this server."))
+                    return
+                await ctx.send(_("Messages are already being counted on this server."))
+                return
+            since = discord.utils.time_snowflake(datetime.now(timezone.utc))
+            await self.config.guild(guild).tracking_since.set(since)
+            await self.config.guild(guild).backfilled.set(False)
+            await self.config.guild(guild).track_messages.set(True)
+            self.counter.tracked.add(guild.id)
+            self.start_backfill(guild.id)
+            await ctx.send(
+                _(
+                    "I will now count messages on this server. "
+                    "Existing messages are being counted in the background, "
+                    "this can take a long time on large servers."
+                )
+            )
+        else:
+            if guild.id not in self.counter.tracked:
+                await ctx.send(_("Messages are not being counted on this server."))
+                return
+            if not await self.config.guild(guild).backfilled():
+                # the history before tracking started hasn't all been read and
+                # stopping now would leave the scans nowhere to pick it up from
+                # without counting the live messages again
+                await self.config.guild(guild).stop_tracking.set(True)
+                self.start_backfill(guild.id)
+                await ctx.send(
+                    _(
+                        "I will stop counting messages on this server once "
+                        "the existing messages have been counted."
+                    )
+                )
+                return
+            await self._stop_tracking(guild)
+            await ctx.send(_("I will no longer count messages on this server."))
 
     @commands.hybrid_command(name="serverstats")
     @checks.mod_or_permissions(manage_messages=True)
@@ -1758,25 +1884,28 @@ class ServerStats(commands.GroupCog):
         separately as well as the user who has posted the most in each channel
 
         Note: This is a very slow function and may take some time to complete
+        unless live message counting is enabled with `trackmessages`.
         """
-
-        warning_msg = _(
-            "This can take a long time to gather all information for the first time! Are you sure you want to continue?"
-        )
-        pred = ConfirmView(ctx.author)
-        # To anyone looking, this is intentionally red.
-        # Testing this command in Red's #testing channel with over 2 million
-        # messages took the bot nearly 2 days and still did not finish collecting
-        # all the data. Therefore, I really don't want people doing this
-        # if they're not prepared for it.
-        pred.confirm_button.style = discord.ButtonStyle.red
-        pred.message = await ctx.send(warning_msg, view=pred)
-        await pred.wait()
-        if not pred.result:
-            await ctx.send(_("Alright I will not gather data."))
-            return
+        guild_data = await self.get_tracked_stats(ctx.guild)
+        if guild_data is None:
+            warning_msg = _(
+                "This can take a long time to gather all information for the first time! Are you sure you want to continue?"
+            )
+            pred = ConfirmView(ctx.author)
+            # To anyone looking, this is intentionally red.
+            # Testing this command in Red's #testing channel with over 2 million
+            # messages took the bot nearly 2 days and still did not finish collecting
+            # all the data. Therefore, I really don't want people doing this
+            # if they're not prepared for it.
+            pred.confirm_button.style = discord.ButtonStyle.red
+            pred.message = await ctx.send(warning_msg, view=pred)
+            await pred.wait()
+            if not pred.result:
+                await ctx.send(_("Alright I will not gather data."))
+                return
         async with ctx.channel.typing():
-            guild_data = await self.get_server_stats(ctx.guild)
+            if guild_data is None:
+                guild_data = await self.wait_with_progress(ctx, self.get_server_stats(ctx.guild))
             channel_messages = []
             member_messages = []
 
@@ -1839,25 +1968,32 @@ class ServerStats(commands.GroupCog):
 
         `limit` must be a number of messages to check, defaults to all messages
         Note: This can be a very slow function and may take some time to complete
+        unless live message counting is enabled with `trackmessages`.
         """
-        warning_msg = _(
-            "This can take a long time to gather all information for the first time! Are you sure you want to continue?"
-        )
-        pred = ConfirmView(ctx.author)
-        # To anyone looking, this is intentionally red.
-        # Testing this command in Red's #testing channel with over 2 million
-        # messages took the bot nearly 2 days and still did not finish collecting
-        # all the data. Therefore, I really don't want people doing this
-        # if they're not prepared for it.
-        pred.confirm_button.style = discord.ButtonStyle.red
-        pred.message = await ctx.send(warning_msg, view=pred)
-        await pred.wait()
-        if not pred.result:
-            return await ctx.send(_("Alright I will not gather data."))
+        channel_data = await self.get_tracked_stats(ctx.guild)
+        if channel_data is None:
+            warning_msg = _(
+                "This can take a long time to gather all information for the first time! Are you sure you want to continue?"
+            )
+            pred = ConfirmView(ctx.author)
+            # To anyone looking, this is intentionally red.
+            # Testing this command in Red's #testing channel with over 2 million
+            # messages took the bot nearly 2 days and still did not finish collecting
+            # all the data. Therefore, I really don't want people doing this
+            # if they're not prepared for it.
+            pred.confirm_button.style = discord.ButtonStyle.red
+            pred.message = await ctx.send(warning_msg, view=pred)
+            await pred.wait()
+            if not pred.result:
+                return await ctx.send(_("Alright I will not gather data."))
         if not channel:
             channel = ctx.channel
         async with ctx.channel.typing():
-            channel_data = await self.get_channel_stats(channel)
+            if channel_data is None:
+                channel_data = await self.wait_with_progress(ctx, self.get_channel_stats(channel))
+            if str(channel.id) not in channel_data.get("channels", {}):
+                await ctx.send(_("I have no message data for that channel."))
+                return
             member_messages = []
             sorted_members = sorted(
                 channel_data["channels"][str(channel.id)]["members"].items(),
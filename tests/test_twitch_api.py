@@ -0,0 +1,120 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("redbot")
+web = pytest.importorskip("aiohttp.web")
+
+from twitch.twitch_api import TwitchAPI  # noqa: E402
+
+
+class StandInValue:
+    def __init__(self, value):
+        self.value = value
+
+    async def __call__(self):
+        return self.value
+
+    async def set(self, value):
+        self.value = value
+
+
+class StandInConfig:
+    def __init__(self, access_token):
+        self.access_token = StandInValue(access_token)
+
+
+class StandInBot:
+    async def get_shared_api_tokens(self, service):
+        return {"client_id": "id", "client_secret": "secret"}
+
+
+class Helix:
+    """A local stand-in for the Helix and OAuth endpoints which counts every request"""
+
+    def __init__(self):
+        self.requests = Counter()
+        # how many Helix requests to reject with a 401 before accepting them
+        self.reject = 0
+
+    async def handle(self, request):
+        endpoint = request.path.rsplit("/", 1)[-1]
+        self.requests[endpoint] += 1
+        if endpoint == "token":
+            return web.json_response({"access_token": "new", "expires_in": 5000000})
+        if endpoint == "validate":
+            return web.json_response({"client_id": "id", "expires_in": 5000000})
+        if self.reject:
+            self.reject -= 1
+            return web.json_response({"message": "Invalid OAuth token"}, status=401)
+        if endpoint == "follows":
+            return web.json_response({"data": [], "total": 0})
+        return web.json_response({"data": []})
+
+
+async def run_against_helix(access_token, test):
+    helix = Helix()
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", helix.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    api = TwitchAPI(None)
+    api.bot = StandInBot()
+    api.config = StandInConfig(access_token)
+    api.base_url = f"http://{host}:{port}/helix"
+    api.auth_url = f"http://{host}:{port}/oauth2"
+    try:
+        await test(api, helix)
+    finally:
+        await api.close_session()
+        await runner.cleanup()
+
+
+def test_saved_token_is_validated_once_per_cycle():
+    async def test(api, helix):
+        session = api.get_session()
+        for cycle in range(5):
+            for account in range(10):
+                await api.get_new_followers(str(account))
+                await api.get_new_clips(str(account))
+        assert helix.requests["follows"] == 50
+        assert helix.requests["clips"] == 50
+        assert helix.requests["validate"] == 1
+        assert helix.requests["token"] == 0
+        assert api.get_session() is session
+
+    asyncio.run(run_against_helix({"access_token": "saved"}, test))
+
+
+def test_missing_token_is_requested_once():
+    async def test(api, helix):
+        for account in range(10):
+            await api.get_new_followers(str(account))
+        assert helix.requests["token"] == 1
+        assert helix.requests["validate"] == 0
+        assert (await api.config.access_token())["access_token"] == "new"
+
+    asyncio.run(run_against_helix({}, test))
+
+
+def test_rejected_token_is_replaced_and_retried_once():
+    async def test(api, helix):
+        await api.get_new_followers("1")
+        helix.reject = 1
+        follows, total = await api.get_new_followers("1")
+        assert (follows, total) == ([], 0)
+        assert helix.requests["follows"] == 3
+        assert helix.requests["token"] == 1
+        assert (await api.config.access_token())["access_token"] == "new"
+
+        helix.reject = 2
+        data = await api.get_response(f"{api.base_url}/users/follows?to_id=1")
+        # only one retry, the second 401 is returned as is
+        assert data == {"message": "Invalid OAuth token"}
+        assert helix.requests["token"] == 2
+
+    asyncio.run(run_against_helix({"access_token": "saved"}, test))
@@ -1,11 +1,8 @@
 from __future__ import annotations
 
 import re
-import time
-from collections import OrderedDict
-from copy import deepcopy
-from dataclasses import dataclass
-from typing import Dict, List, Mapping, Optional, Union, cast
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Mapping, Optional, Tuple, Union, cast
 
 import aiohttp
 import discord
@@ -17,6 +14,9 @@ from redbot.core.bot import Red
 from redbot.core.i18n import Translator
 from redbot.core.utils.views import SimpleMenu
 
+from .batcher import BATCH_DELAY, MicroBatcher
+from .cache import TranslationCache
+from .cooldowns import TranslationCooldowns
 from .errors import GoogleTranslateAPIError
 from .flags import FLAGS
 
@@ -191,19 +191,6 @@ class DetectedLanguage:
         return cls(**data[0])
 
 
-class FixedSizeOrderedDict(OrderedDict):
-    # https://stackoverflow.com/a/49274421
-    def __init__(self, *args, max_len=0, **kwargs):
-        self._max_len = max_len
-        super().__init__(*args, **kwargs)
-
-    def __setitem__(self, key, value):
-        super().__setitem__(key, value)
-        if self._max_len > 0:
-            if len(self) > self._max_len:
-                self.popitem(False)
-
-
 class GoogleTranslator:
     def __init__(
         self,
@@ -211,23 +198,33 @@ class GoogleTranslator:
         session: Optional[aiohttp.ClientSession] = None,
         *,
         stats_counter: StatsCounter,
+        cache: Optional[TranslationCache] = None,
+        batch_delay: float = BATCH_DELAY,
     ):
         self._api_token = api_token
         self.session = session or aiohttp.ClientSession(
             headers={"User-Agent": "Trusty-cogs Translate cog for Red-DiscordBot"}
         )
         self.stats_counter = stats_counter
-        self._cache_limit = 128
-        self._translation_cache = FixedSizeOrderedDict(max_len=self._cache_limit)
-        self._detection_cache = FixedSizeOrderedDict(max_len=self._cache_limit)
+        self.cache = cache
+        self.base_url = BASE_URL
+        # texts sent within `batch_delay` seconds of each other share a request
+        # 0 sends every text in its own request
+        self.batch_delay = batch_delay
+        self._detections = MicroBatcher(self._send_detections, delay=batch_delay)
+        self._translations = MicroBatcher(self._send_translations, delay=batch_delay)
 
     @property
     def has_token(self):
         return self._api_token is not None
 
     async def close(self):
+        self._detections.close()
+        self._translations.close()
         await self.stats_counter.save()
         await self.session.close()
+        if self.cache is not None:
+            self.cache.close()
 
     async def detect_language(
         self,
@@ -240,25 +237,56 @@ class GoogleTranslator:
         """
         if self._api_token is None:
             raise GoogleTranslateAPIError("The API token is missing.")
-        # Hash the text for a relatively unique key
-        # I am not concerned about collisions here just memory
-        # a user message can be up to 4000 characters long which would be 4049 bytes
-        # a hash is only 36 bytes and since we're caching the result which is much larger
-        # there's no reason to cache the original text just a hash of it
-        cache_key = hash(text)
-        if cache_key in self._detection_cache:
-            return self._detection_cache[cache_key]
-        params = {"q": text, "key": self._api_token}
-        url = BASE_URL + "/language/translate/v2/detect"
-        async with self.session.get(url, params=params) as resp:
+        if self.cache is not None:
+            cached = await self.cache.get_detection(text)
+            if cached is not None:
+                await self.stats_counter.add_cache_hit(guild, text)
+                return DetectedLanguage(**cached)
+        if self.batch_delay:
+            detection = await self._detections.submit(None, text)
+        else:
+            (detection,) = await self._send_detections(None, [text])
+        await self.stats_counter.add_detect(guild)
+        if self.cache is not None and detection.language is not None:
+            await self.cache.set_detection(text, asdict(detection.language))
+        return detection.language
+
+    async def _post(self, path: str, texts: List[str], **params: str) -> dict:
+        """
+        Send every text in `texts` as its own `q` in a single request.
+
+        This is a POST since a full batch is far too long to fit in a url.
+        """
+        form = [("q", text) for text in texts]
+        params["key"] = self._api_token
+        async with self.session.post(self.base_url + path, params=params, data=form) as resp:
             data = await resp.json()
         if "error" in data:
             log.error(data["error"]["message"])
             raise GoogleTranslateAPIError(data["error"]["message"])
-        detection = DetectLanguageResponse.from_json(data)
-        await self.stats_counter.add_detect(guild)
-        self._detection_cache[cache_key] = detection.language
-        return detection.language
+        return data
+
+    async def _send_detections(self, key: None, texts: List[str]) -> List[DetectLanguageResponse]:
+        data = await self._post("/language/translate/v2/detect", texts)
+        return [
+            DetectLanguageResponse.from_json({"data": {"detections": [detections]}})
+            for detections in data["data"]["detections"]
+        ]
+
+    async def _send_translations(
+        self, key: Tuple[str, Optional[str]], texts: List[str]
+    ) -> List[TranslateTextResponse]:
+        target, from_lang = key
+        params = {"target": target, "format": "text"}
+        if from_lang is not None:
+            params["source"] = from_lang
+        data = await self._post("/language/translate/v2", texts, **params)
+        # a batch of texts is a single request however many texts it holds
+        await self.stats_counter.add_api_request()
+        return [
+            TranslateTextResponse.from_json({"data": {"translations": [translation]}})
+            for translation in data["data"]["translations"]
+        ]
 
     async def translate_text(
         self,
@@ -273,35 +301,24 @@ class GoogleTranslator:
         """
         if self._api_token is None:
             raise GoogleTranslateAPIError("The API token is missing.")
-        # Hash the text for a relatively unique key
-        # I am not concerned about collisions here just memory
-        # a user message can be up to 4000 characters long which would be 4049 bytes
-        # a hash is only 36 bytes and since we're caching the result which is much larger
-        # there's no reason to cache the original text just a hash of it
-        cache_key = (target, hash(text), from_lang)
-        if cache_key in self._translation_cache:
-            return self._translation_cache[cache_key]
-        formatting = "text"
-        params = {
-            "q": text,
-            "target": target,
-            "key": self._api_token,
-            "format": formatting,
-        }
-        if from_lang is not None:
-            params["source"] = from_lang
-        url = BASE_URL + "/language/translate/v2"
+        if self.cache is not None:
+            cached = await self.cache.get_translation(text, from_lang, target)
+            if cached is not None:
+                await self.stats_counter.add_cache_hit(guild, text)
+                return TranslateTextResponse.from_json({"data": cached})
+        key = (target, from_lang)
         try:
-            async with self.session.get(url, params=params) as resp:
-                data = await resp.json()
+            if self.batch_delay:
+                translation = await self._translations.submit(key, text)
+            else:
+                (translation,) = await self._send_translations(key, [text])
+        except GoogleTranslateAPIError:
+            raise
         except Exception:
             return None
-        if "error" in data:
-            log.error(data["error"]["message"])
-            raise GoogleTranslateAPIError(data["error"]["message"])
-        translation = TranslateTextResponse.from_json(data)
         await self.stats_counter.add_requests(guild, text)
-        self._translation_cache[cache_key] = translation
+        if self.cache is not None:
+            await self.cache.set_translation(text, from_lang, target, translation.data)
         return translation
 
 
@@ -316,6 +333,8 @@ class StatsCounter:
             "requests": _("API Requests:"),
             "detect": _("API Detect Language:"),
             "characters": _("Characters requested:"),
+            "cache_hits": _("Served from cache:"),
+            "characters_saved": _("Characters saved by cache:"),
         }
         gl_count = self._global_counter if self._global_counter else await self.config.count()
         msg = _("### __Global Usage__:\n")
@@ -357,7 +376,26 @@ class StatsCounter:
             self._global_counter = await self.config.count()
         self._global_counter["detect"] += 1
 
+    async def add_cache_hit(self, guild: Optional[discord.Guild], message: str):
+        if guild:
+            if guild.id not in self._guild_counter:
+                self._guild_counter[guild.id] = await self.config.guild(guild).count()
+            count = self._guild_counter[guild.id]
+            count["cache_hits"] = count.get("cache_hits", 0) + 1
+            count["characters_saved"] = count.get("characters_saved", 0) + len(message)
+        if not self._global_counter:
+            self._global_counter = await self.config.count()
+        count = self._global_counter
+        count["cache_hits"] = count.get("cache_hits", 0) + 1
+        count["characters_saved"] = count.get("characters_saved", 0) + len(message)
+
     async def add_requests(self, guild: Optional[discord.Guild], message: str):
+        """
+        Count a translated text.
+
+        The global requests are counted separately with `add_api_request`
+        since a batch sends many texts in a single request.
+        """
         if guild:
             log.debug("Adding requests to %s", guild.name)
             if guild.id not in self._guild_counter:
@@ -366,14 +404,19 @@ class StatsCounter:
             self._guild_counter[guild.id]["characters"] += len(message)
         if not self._global_counter:
             self._global_counter = await self.config.count()
-        self._global_counter["requests"] += 1
         self._global_counter["characters"] += len(message)
 
+    async def add_api_request(self):
+        if not self._global_counter:
+            self._global_counter = await self.config.count()
+        self._global_counter["requests"] += 1
+
 
 class GoogleTranslateAPI:
     config: Config
     bot: Red
     cache: dict
+    cooldowns: TranslationCooldowns
     _key: Optional[str]
     _tr: GoogleTranslator
 
@@ -432,7 +475,6 @@ class GoogleTranslateAPI:
 
     @tasks.loop(seconds=120)
     async def translation_loop(self):
-        self.cache["translations"] = []
         await self._tr.stats_counter.save()
 
     async def check_bw_list(
@@ -504,17 +546,11 @@ class GoogleTranslateAPI:
             return
         if guild.id not in self.cache["guild_messages"]:
             self.cache["guild_messages"].append(guild.id)
-        if not await self._check_cooldown(message.id, FLAGS[str(flag)]["code"]):
+        lang = FLAGS[str(flag)]["code"]
+        cooldown = self.cache["cooldown"]
+        if not self.cooldowns.check(message.id, lang, cooldown["multiple"]):
             return
-        if message.id not in self.cache["cooldown_translations"]:
-            if not self.cache["cooldown"]:
-                self.cache["cooldown"] = await self.config.cooldown()
-            cooldown = deepcopy(self.cache["cooldown"])
-        else:
-            cooldown = self.cache["cooldown_translations"][message.id]
-        cooldown["wait"] = time.time() + cooldown["timeout"]
-        cooldown["past_flags"].append(str(flag))
-        self.cache["cooldown_translations"][message.id] = cooldown
+        self.cooldowns.record(message.id, lang, cooldown["timeout"])
 
         msgs = await self.translate_message(message, to_lang=None, flag=str(flag))
         if not msgs:
@@ -523,8 +559,6 @@ class GoogleTranslateAPI:
         if not await ctx.embed_requested():
             msgs = [f"{author}:\n{translated_text.description}" for translated_text in msgs]
         await SimpleMenu(msgs).start(ctx)
-        if not cooldown["multiple"]:
-            self.cache["translations"].append(message.id)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
@@ -532,11 +566,14 @@ class GoogleTranslateAPI:
         Translates the message based off reactions
         with country flags
         """
-        if payload.message_id in self.cache["translations"]:
-            return
         if str(payload.emoji) not in FLAGS:
             log.debug("Emoji is not in the flags")
             return
+        lang = FLAGS[str(payload.emoji)]["code"]
+        cooldown = self.cache["cooldown"]
+        if not self.cooldowns.check(payload.message_id, lang, cooldown["multiple"]):
+            log.debug("This message has hit the cooldown checks")
+            return
         if not self._tr.has_token:
             log.debug("Bot owner token has not been set")
             return
@@ -561,9 +598,6 @@ class GoogleTranslateAPI:
         if not await self.check_bw_list(guild, channel, reacted_user):
             log.debug("The User reacting  did so in a blocked channel or is blocked themselves")
             return
-        if not await self._check_cooldown(payload.message_id, FLAGS[str(payload.emoji)]["code"]):
-            log.debug("This message has hit the cooldown checks")
-            return
 
         if guild.id not in self.cache["guild_reactions"]:
             if not await self.config.guild(guild).reaction():
@@ -582,15 +616,10 @@ class GoogleTranslateAPI:
                 log.debug("The message is not eligable as a command")
                 return
 
-        if message.id not in self.cache["cooldown_translations"]:
-            if not self.cache["cooldown"]:
-                self.cache["cooldown"] = await self.config.cooldown()
-            cooldown = deepcopy(self.cache["cooldown"])
-        else:
-            cooldown = self.cache["cooldown_translations"][message.id]
-        cooldown["wait"] = time.time() + cooldown["timeout"]
-        cooldown["past_flags"].append(str(payload.emoji))
-        self.cache["cooldown_translations"][message.id] = cooldown
+        # check again in case another reaction was translated while we fetched the message
+        if not self.cooldowns.check(message.id, lang, cooldown["multiple"]):
+            return
+        self.cooldowns.record(message.id, lang, cooldown["timeout"])
 
         msgs = await self.translate_message(
             message, to_lang=None, flag=str(payload.emoji), reacted_user=reacted_user
@@ -604,23 +633,6 @@ class GoogleTranslateAPI:
         if not await ctx.embed_requested():
             msgs = [f"{author}:\n{translated_text.description}" for translated_text in msgs]
         await SimpleMenu(msgs).start(ctx)
-        if not cooldown["multiple"]:
-            self.cache["translations"].append(message.id)
-
-    async def _check_cooldown(self, message: Union[discord.Message, int], lang: str) -> bool:
-        if isinstance(message, int):
-            message_id = message
-        else:
-            message_id = message.id
-
-        if message_id in self.cache["cooldown_translations"]:
-            if str(lang) in self.cache["cooldown_translations"][message_id]["past_flags"]:
-                return False
-            if not self.cache["cooldown_translations"][message_id]["multiple"]:
-                return False
-            if time.time() < self.cache["cooldown_translations"][message_id]["wait"]:
-                return False
-        return True
 
     async def translate_message(
         self,
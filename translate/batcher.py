@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.Translate")
+
+# The v2 API accepts at most 128 text segments per request
+# and recommends keeping each request under 5000 characters
+MAX_SEGMENTS = 128
+MAX_CHARACTERS = 5000
+# How long to wait for more texts before sending a request
+BATCH_DELAY = 0.05
+
+SendBatch = Callable[[Hashable, List[str]], Awaitable[List[Any]]]
+
+
+class _Batch:
+    def __init__(self):
+        self.texts: List[str] = []
+        self.futures: Dict[str, List[asyncio.Future]] = {}
+        self.characters = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def fits(self, text: str) -> bool:
+        if text in self.futures:
+            return True
+        if len(self.texts) >= MAX_SEGMENTS:
+            return False
+        # a single text longer than the limit still gets its own request
+        return not self.texts or self.characters + len(text) <= MAX_CHARACTERS
+
+    def add(self, text: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if text not in self.futures:
+            self.texts.append(text)
+            self.characters += len(text)
+            self.futures[text] = []
+        self.futures[text].append(future)
+        return future
+
+
+class MicroBatcher:
+    """
+    Collects texts which arrive close together into one request.
+
+    Texts submitted under the same key within `delay` seconds of the
+    first are sent together with `send(key, texts)` which must return
+    one result per text in the same order. Identical texts in a batch
+    are only sent once. Each caller gets its own result back or the
+    exception raised for the whole batch.
+    """
+
+    def __init__(self, send: SendBatch, *, delay: float = BATCH_DELAY):
+        self.send = send
+        self.delay = delay
+        self.requests = 0
+        self.texts = 0
+        self._batches: Dict[Hashable, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, text: str) -> Any:
+        batch = self._batches.get(key)
+        if batch is not None and not batch.fits(text):
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _Batch()
+            self._batches[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.delay, self._flush, key)
+        return await batch.add(text)
+
+    def _flush(self, key: Hashable) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._send(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key: Hashable, batch: _Batch) -> None:
+        self.requests += 1
+        self.texts += len(batch.texts)
+        try:
+            results = await self.send(key, batch.texts)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        except asyncio.CancelledError:
+            for futures in batch.futures.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        if len(results) != len(batch.texts):
+            # without one result per text there's no telling which belongs to whom
+            self._fail(
+                batch,
+                ValueError(f"Expected {len(batch.texts)} results but got {len(results)}"),
+            )
+            return
+        for text, result in zip(batch.texts, results):
+            for future in batch.futures[text]:
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: _Batch, exc: Exception) -> None:
+        for futures in batch.futures.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(exc)
+
+    def close(self) -> None:
+        for key in list(self._batches):
+            batch = self._batches.pop(key)
+            if batch.timer is not None:
+                batch.timer.cancel()
+            for futures in batch.futures.values():
+                for future in futures:
+                    future.cancel()
+        for task in self._tasks:
+            task.cancel()
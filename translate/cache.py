@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from red_commons.logging import getLogger
+
+log = getLogger("red.trusty-cogs.Translate")
+
+HORIZONTAL_WHITESPACE = re.compile(r"[^\S\n]+")
+# Each entry is roughly the size of the translated text so this is
+# usually somewhere around 20-50MB on disk when full
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so trivially different messages share a cache entry.
+
+    Unicode is NFC normalized and runs of spaces are collapsed,
+    newlines are kept since they change how the text is translated.
+    """
+    text = unicodedata.normalize("NFC", text)
+    return "\n".join(HORIZONTAL_WHITESPACE.sub(" ", line).strip() for line in text.split("\n"))
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    A persistent least recently used cache of translations and detected languages.
+
+    Translations are keyed by the digest of the normalized text along with
+    the source and target languages and detections by the digest alone.
+    The original text is never stored. Once there are more than
+    `max_entries` of either the least recently used are removed.
+    """
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "digest TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, "
+                "data TEXT NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (digest, source, target))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                "digest TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            for table in ("translations", "detections"):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)"
+                )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _get(self, table: str, where: str, key: tuple) -> Optional[dict]:
+        with self._lock, self._conn:
+            row = self._conn.execute(f"SELECT data FROM {table} WHERE {where}", key).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                f"UPDATE {table} SET last_used = ? WHERE {where}", (time.time(), *key)
+            )
+        return json.loads(row[0])
+
+    def _put(self, table: str, key: tuple, data: dict) -> None:
+        placeholders = ", ".join("?" for _ in range(len(key) + 2))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})",
+                (*key, json.dumps(data), time.time()),
+            )
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            if count > self.max_entries:
+                # remove an extra 10% so we aren't evicting on every insert
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+
+    async def get_translation(
+        self, text: str, source: Optional[str], target: str
+    ) -> Optional[dict]:
+        key = (text_digest(text), source or "", target)
+        where = "digest = ? AND source = ? AND target = ?"
+        return await self._run(self._get, "translations", where, key)
+
+    async def set_translation(
+        self, text: str, source: Optional[str], target: str, data: dict
+    ) -> None:
+        key = (text_digest(text), source or "", target)
+        await self._run(self._put, "translations", key, data)
+
+    async def get_detection(self, text: str) -> Optional[dict]:
+        return await self._run(self._get, "detections", "digest = ?", (text_digest(text),))
+
+    async def set_detection(self, text: str, data: dict) -> None:
+        await self._run(self._put, "detections", (text_digest(text),), data)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+# How long a translated message is remembered for
+RETENTION = 60 * 60 * 24
+
+_MISSING = object()
+
+
+class ExpiringDict:
+    """
+    A mapping whose keys are forgotten `ttl` seconds after they're set.
+
+    Keys are stored in time buckets `ttl / buckets` seconds wide and whole
+    buckets are dropped once they're older than `ttl` so expiry costs nothing
+    per key. A key lives for between `ttl` and `ttl` plus one bucket width.
+    """
+
+    def __init__(self, ttl: float, buckets: int = 8):
+        self.ttl = ttl
+        self.width = ttl / buckets
+        self._buckets: Deque[Tuple[float, Dict[Hashable, Any]]] = deque()
+
+    def _expire(self, now: float) -> None:
+        while self._buckets and self._buckets[0][0] + self.width + self.ttl <= now:
+            self._buckets.popleft()
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        if not self._buckets or self._buckets[-1][0] + self.width <= now:
+            self._buckets.append((now, {}))
+        self._buckets[-1][1][key] = value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._expire(time.monotonic())
+        # newer buckets hold the most recent value for a key
+        for _start, bucket in reversed(self._buckets):
+            if key in bucket:
+                return bucket[key]
+        return default
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class ExpiringSet:
+    """A set whose members are forgotten `ttl` seconds after they're added"""
+
+    def __init__(self, ttl: float, buckets: int = 8):
+        self._items = ExpiringDict(ttl, buckets)
+
+    def add(self, item: Hashable) -> None:
+        self._items[item] = None
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._items
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+class TranslationCooldowns:
+    """
+    Tracks which messages have been translated and when they can be again.
+
+    Every (message, language) pair which has been translated is remembered
+    so the same translation is never posted twice. When multiple translations
+    of a message are allowed the next one has to wait for the cooldown,
+    otherwise a message is only ever translated once. The shared cooldown
+    settings are passed in rather than copied per message.
+    """
+
+    def __init__(self, retention: float = RETENTION):
+        self._translated = ExpiringSet(retention)
+        self._waits = ExpiringDict(retention)
+
+    def check(self, message_id: int, lang: str, multiple: bool) -> bool:
+        """Whether `message_id` can be translated into `lang` right now"""
+        if (message_id, lang) in self._translated:
+            return False
+        wait: Optional[float] = self._waits.get(message_id)
+        if wait is None:
+            return True
+        if not multiple:
+            return False
+        return time.time() >= wait
+
+    def record(self, message_id: int, lang: str, timeout: float) -> None:
+        self._translated.add((message_id, lang))
+        self._waits[message_id] = time.time() + timeout
+
+    def clear(self) -> None:
+        self._translated.clear()
+        self._waits.clear()
@@ -17,12 +17,15 @@ import discord
 from discord.ext.commands.errors import BadArgument
 from red_commons.logging import getLogger
 from redbot.core import Config, checks, commands
+from redbot.core.data_manager import cog_data_path
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils.chat_formatting import humanize_list
 from redbot.core.utils.views import SetApiView, SimpleMenu
 
 from .api import FlagTranslation, GoogleTranslateAPI, GoogleTranslator, StatsCounter
+from .cache import TranslationCache
 from .converters import ChannelUserRole
+from .cooldowns import TranslationCooldowns
 from .errors import GoogleTranslateAPIError
 
 _ = Translator("Translate", __file__)
@@ -36,7 +39,7 @@ class Translate(GoogleTranslateAPI, commands.Cog):
     """
 
     __author__ = ["Aziz", "TrustyJAID"]
-    __version__ = "2.6.0"
+    __version__ = "2.9.0"
 
     def __init__(self, bot):
         self.bot = bot
@@ -46,21 +49,32 @@ class Translate(GoogleTranslateAPI, commands.Cog):
             text=False,
             whitelist=[],
             blacklist=[],
-            count={"characters": 0, "requests": 0, "detect": 0},
+            count={
+                "characters": 0,
+                "requests": 0,
+                "detect": 0,
+                "cache_hits": 0,
+                "characters_saved": 0,
+            },
         )
         self.config.register_global(
             cooldown={"past_flags": [], "timeout": 0, "multiple": False},
-            count={"characters": 0, "requests": 0, "detect": 0},
+            count={
+                "characters": 0,
+                "requests": 0,
+                "detect": 0,
+                "cache_hits": 0,
+                "characters_saved": 0,
+            },
         )
         self.cache = {
-            "translations": [],
-            "cooldown_translations": {},
             "guild_messages": [],
             "guild_reactions": [],
             "cooldown": {},
             "guild_blacklist": {},
             "guild_whitelist": {},
         }
+        self.cooldowns = TranslationCooldowns()
         self._key: Optional[str] = None
         self.translation_loop.start()
         self.translate_ctx = discord.app_commands.ContextMenu(
@@ -87,9 +101,13 @@ class Translate(GoogleTranslateAPI, commands.Cog):
             "api_key", None
         )
         self._tr = GoogleTranslator(
-            central_key, session=None, stats_counter=StatsCounter(self.config)
+            central_key,
+            session=None,
+            stats_counter=StatsCounter(self.config),
+            cache=TranslationCache(cog_data_path(self) / "translations.sqlite3"),
         )
         await self._tr.stats_counter.initialize()
+        self.cache["cooldown"] = await self.config.cooldown()
 
     async def cog_unload(self):
         self.bot.tree.remove_command(self.translate_ctx.name, type=self.translate_ctx.type)
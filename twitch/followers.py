@@ -0,0 +1,68 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from .twitch_models import TwitchFollower
+
+# Config custom group holding the follower history of each followed account
+FOLLOWERS = "FOLLOWERS"
+# How many of the most recent followers are remembered per account
+RECENT_FOLLOWERS = 1000
+
+
+class FollowerHistory:
+    """
+    The followers that have already been posted for one twitch account.
+
+    Rather than every follower ID the account has ever had, only the newest
+    `followed_at` timestamp seen and the most recent follower IDs are kept,
+    so memory and the cost of checking a poll stay the same however many
+    followers the account has. Follows older than the cursor are never new
+    and the recent IDs catch follows sharing the cursors timestamp.
+    """
+
+    def __init__(self, cursor: Optional[str] = None, recent: Iterable[str] = ()):
+        self.cursor = cursor
+        # a dict is used as an ordered set, oldest follower first
+        self._recent: Dict[str, None] = dict.fromkeys(recent)
+        self.changed = False
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> "FollowerHistory":
+        return cls(data.get("cursor"), data.get("recent", []))
+
+    def to_config(self) -> Dict[str, Any]:
+        return {"cursor": self.cursor, "recent": list(self._recent)}
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def __contains__(self, twitch_id: str) -> bool:
+        return twitch_id in self._recent
+
+    def _advance(self, followed_at: Optional[str]) -> None:
+        # twitch timestamps are all the same ISO 8601 format so compare as strings
+        if followed_at and (self.cursor is None or followed_at > self.cursor):
+            self.cursor = followed_at
+            self.changed = True
+
+    def new_followers(self, follows: List[TwitchFollower]) -> List[TwitchFollower]:
+        """The follows which haven't been posted yet, oldest first"""
+        for follow in follows:
+            if follow.from_id in self._recent:
+                # accounts added before the cursor existed only have IDs to go on
+                self._advance(follow.followed_at)
+        new = []
+        for follow in sorted(follows, key=lambda f: f.followed_at or ""):
+            if follow.from_id in self._recent:
+                continue
+            if self.cursor is not None and (follow.followed_at or "") < self.cursor:
+                continue
+            new.append(follow)
+        return new
+
+    def add(self, follow: TwitchFollower) -> None:
+        self._recent.pop(follow.from_id, None)
+        self._recent[follow.from_id] = None
+        while len(self._recent) > RECENT_FOLLOWERS:
+            del self._recent[next(iter(self._recent))]
+        self._advance(follow.followed_at)
+        self.changed = True
@@ -0,0 +1,45 @@
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .twitch_models import TwitchProfile
+
+# The users endpoint accepts up to 100 IDs in one request
+MAX_IDS = 100
+# How long a profile is used before asking twitch again
+PROFILE_TTL = 60 * 60
+MAX_PROFILES = 5000
+
+
+class ProfileCache:
+    """
+    Twitch profiles by ID which are forgotten after `ttl` seconds.
+
+    Followers and the followed accounts are looked up every polling cycle
+    and rarely change so most lookups never reach twitch.
+    """
+
+    def __init__(self, ttl: float = PROFILE_TTL):
+        self.ttl = ttl
+        self._profiles: Dict[str, Tuple[float, TwitchProfile]] = {}
+
+    def get(self, twitch_id: str) -> Optional[TwitchProfile]:
+        cached = self._profiles.get(twitch_id)
+        if cached is None or cached[0] <= time.monotonic():
+            self._profiles.pop(twitch_id, None)
+            return None
+        return cached[1]
+
+    def add(self, profile: TwitchProfile) -> None:
+        self._profiles.pop(profile.id, None)
+        self._profiles[profile.id] = (time.monotonic() + self.ttl, profile)
+        if len(self._profiles) > MAX_PROFILES:
+            # dicts keep insertion order so this drops the oldest profile
+            del self._profiles[next(iter(self._profiles))]
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+def chunks(twitch_ids: List[str], size: int = MAX_IDS) -> Iterable[List[str]]:
+    for i in range(0, len(twitch_ids), size):
+        yield twitch_ids[i : i + size]
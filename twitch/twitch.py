@@ -7,14 +7,14 @@ from redbot.core import Config, checks, commands
 from redbot.core.commands.converter import TimedeltaConverter
 
 from .errors import TwitchError
+from .followers import FOLLOWERS, RECENT_FOLLOWERS, FollowerHistory
 from .menus import BaseMenu, TwitchClipsPages, TwitchFollowersPages
-from .twitch_api import TwitchAPI
+from .profiles import ProfileCache
+from .twitch_api import AUTH_URL, BASE_URL, TwitchAPI
 from .twitch_models import TwitchFollower
 
 log = getLogger("red.Trusty-cogs.Twitch")
 
-BASE_URL = "https://api.twitch.tv/helix"
-
 
 class Twitch(TwitchAPI, commands.Cog):
     """
@@ -22,7 +22,7 @@ class Twitch(TwitchAPI, commands.Cog):
     """
 
     __author__ = ["TrustyJAID"]
-    __version__ = "1.4.0"
+    __version__ = "1.7.0"
 
     def __init__(self, bot):
         self.bot = bot
@@ -36,8 +36,17 @@ class Twitch(TwitchAPI, commands.Cog):
         user_defaults = {"id": "", "login": "", "display_name": ""}
         self.config.register_global(**global_defaults, force_registration=True)
         self.config.register_user(**user_defaults, force_registration=True)
+        self.config.init_custom(FOLLOWERS, 1)
+        self.config.register_custom(FOLLOWERS, cursor=None, recent=[])
         self.rate_limit_resets = set()
         self.rate_limit_remaining = 0
+        self.base_url = BASE_URL
+        self.auth_url = AUTH_URL
+        self._session = None
+        self._token_checked = 0.0
+        self._token_lock = asyncio.Lock()
+        self.profiles = ProfileCache()
+        self.followers = {}
         self.loop = None
         self.streams = {}
 
@@ -66,6 +75,8 @@ class Twitch(TwitchAPI, commands.Cog):
             await self.config.version.set("1.2.0")
         if await self.config.version() < "1.3.3":
             await self.migrate_clips()
+        if await self.config.version() < "1.7.0":
+            await self.migrate_followers()
         self.loop = asyncio.create_task(self.check_for_new_followers())
 
     async def migrate_clips(self):
@@ -82,6 +93,15 @@ class Twitch(TwitchAPI, commands.Cog):
                     cur_data[t_id]["channels"] = channels
         await self.config.version.set("1.3.3")
 
+    async def migrate_followers(self):
+        # followers used to be kept as one ever growing list inside each account
+        async with self.config.twitch_accounts() as accounts:
+            for account in accounts:
+                followers = account.pop("followers", [])
+                history = FollowerHistory(None, followers[-RECENT_FOLLOWERS:])
+                await self.config.custom(FOLLOWERS, account["id"]).set(history.to_config())
+        await self.config.version.set("1.7.0")
+
     async def migrate_api_tokens(self):
         keys = await self.config.all()
         try:
@@ -153,14 +173,19 @@ class Twitch(TwitchAPI, commands.Cog):
             user_data = await self.check_account_added(cur_accounts, profile)
             if user_data is None:
                 try:
-                    followers, total = await self.get_all_followers(profile.id)
+                    followers, total = await self.get_new_followers(profile.id)
                 except TwitchError as e:
                     return await ctx.send(e)
+                # only followers after this point are posted
+                history = FollowerHistory()
+                for follow in reversed(followers):
+                    history.add(follow)
+                self.followers[profile.id] = history
+                await self.save_follower_history(profile.id)
                 user_data = {
                     "id": profile.id,
                     "login": profile.login,
                     "display_name": profile.display_name,
-                    "followers": followers,
                     "total_followers": total,
                     "channels": [channel.id],
                 }
@@ -353,6 +378,7 @@ class Twitch(TwitchAPI, commands.Cog):
                     if len(user_data["channels"]) == 0:
                         # We don't need to be checking if there's no channels to post in
                         cur_accounts.remove(user_data)
+                        await self.forget_follower_history(profile.id)
             await ctx.send(
                 "Done, {}'s new followers won't be posted in {} anymore.".format(
                     profile.login, channel.mention
@@ -387,7 +413,7 @@ class Twitch(TwitchAPI, commands.Cog):
         except TwitchError as e:
             await ctx.send(e)
             return
-        new_url = "{}/users/follows?to_id={}&first=100".format(BASE_URL, profile.id)
+        new_url = "{}/users/follows?to_id={}&first=100".format(self.base_url, profile.id)
         data = await self.get_response(new_url)
         follows = [TwitchFollower(**x) for x in data["data"]]
         total = data["total"]
@@ -459,6 +485,13 @@ class Twitch(TwitchAPI, commands.Cog):
         ).format(prefix=ctx.clean_prefix)
         await ctx.maybe_send_embed(msg)
 
+    @commands.Cog.listener()
+    async def on_red_api_tokens_update(self, service_name: str, api_tokens: dict) -> None:
+        if service_name == "twitch":
+            # new credentials need a new access token
+            await self.invalidate_token()
+
     async def cog_unload(self):
         if getattr(self, "loop", None):
             self.loop.cancel()
+        await self.close_session()
@@ -1,7 +1,7 @@
 import asyncio
 import time
 from datetime import datetime, timedelta
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import aiohttp
 import discord
@@ -11,11 +11,18 @@ from redbot.core.bot import Red
 from redbot.core.utils import bounded_gather
 
 from .errors import TwitchError
+from .followers import FOLLOWERS, FollowerHistory
+from .profiles import ProfileCache, chunks
 from .twitch_models import TwitchFollower, TwitchProfile
 
 log = getLogger("red.Trusty-cogs.Twitch")
 
 BASE_URL = "https://api.twitch.tv/helix"
+AUTH_URL = "https://id.twitch.tv/oauth2"
+# How many accounts clips are requested for at once
+CLIP_REQUESTS = 4
+# Twitch asks that app access tokens are validated at least once an hour
+VALIDATE_INTERVAL = 60 * 60
 
 
 class TwitchAPI:
@@ -27,12 +34,21 @@ class TwitchAPI:
     bot: Red
     rate_limit_resets: set
     rate_limit_remaining: int
+    base_url: str
+    auth_url: str
 
     def __init__(self, bot):
         self.config: Config
         self.bot: Red
         self.rate_limit_resets: set = set()
         self.rate_limit_remaining: int = 0
+        self.base_url = BASE_URL
+        self.auth_url = AUTH_URL
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token_checked: float = 0.0
+        self._token_lock = asyncio.Lock()
+        self.profiles = ProfileCache()
+        self.followers: Dict[str, FollowerHistory] = {}
 
     #####################################################################################
     # Logic for accessing twitch API with rate limit checks                             #
@@ -71,15 +87,52 @@ class TwitchAPI:
                 log.trace("wait_for_rate_limit_reset, timer: %s", wait_time)
                 await asyncio.sleep(wait_time)
 
+    def get_session(self) -> aiohttp.ClientSession:
+        """One session is kept for every request so connections are reused"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close_session(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def invalidate_token(self) -> None:
+        """Forget the access token so a new one is requested"""
+        self._token_checked = 0.0
+        await self.config.access_token.set({})
+
     async def oauth_check(self) -> None:
-        url = "https://id.twitch.tv/oauth2/token"
+        """
+        Make sure the access token is valid before it's used
+
+        Once validated the token isn't checked again until it's due to be
+        validated again or it expires, whichever comes first. A 401 from the
+        API in between clears it with `invalidate_token`.
+        """
+        if self._token_checked > time.monotonic():
+            return
+        async with self._token_lock:
+            if self._token_checked > time.monotonic():
+                return
+            await self._oauth_check()
+
+    def _token_valid_for(self, expires_in: Optional[int]) -> None:
+        if expires_in is None:
+            expires_in = VALIDATE_INTERVAL
+        self._token_checked = time.monotonic() + min(VALIDATE_INTERVAL, expires_in)
+
+    async def _oauth_check(self) -> None:
         keys = await self._get_api_tokens()
         if "client_secret" not in keys:
             # Can't get the app access token without the client secret being set
+            self._token_valid_for(None)
             return
         client_id = keys["client_id"]
         client_secret = keys["client_secret"]
         access_token = await self.config.access_token()
+        session = self.get_session()
         if access_token == {}:
             # Attempts to acquire an app access token
             scope = [
@@ -96,47 +149,52 @@ class TwitchAPI:
                 "grant_type": "client_credentials",
                 "scope": " ".join(s for s in scope),
             }
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, params=params) as resp:
-                    access_token = await resp.json()
+            async with session.post(f"{self.auth_url}/token", params=params) as resp:
+                access_token = await resp.json()
             await self.config.access_token.set(access_token)
+            if "access_token" in access_token:
+                self._token_valid_for(access_token.get("expires_in"))
         else:
             if "access_token" not in access_token:
                 # Tries to re-aquire access token if set one is incorrect
                 await self.config.access_token.set({})
-                return await self.oauth_check()
+                return await self._oauth_check()
             header = {"Authorization": "OAuth {}".format(access_token["access_token"])}
-            url = "https://id.twitch.tv/oauth2/validate"
-            async with aiohttp.ClientSession() as session:
-                resp = await session.get(url, headers=header)
-            if resp.status == 200:
-                # Validates the access token before use
-                return
-            else:
-                await self.config.access_token.set({})
-                return await self.oauth_check()
+            async with session.get(f"{self.auth_url}/validate", headers=header) as resp:
+                if resp.status == 200:
+                    # Validates the access token before use
+                    data = await resp.json()
+                    self._token_valid_for(data.get("expires_in"))
+                    return
+            await self.config.access_token.set({})
+            return await self._oauth_check()
 
-    async def get_response(self, url: str) -> dict:
+    async def get_response(self, url: str, *, retry_auth: bool = True) -> dict:
         """Get responses from twitch after checking rate limits"""
         await self.oauth_check()
         header = await self.get_header()
         await self.wait_for_rate_limit_reset()
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url, headers=header, timeout=aiohttp.ClientTimeout(total=None)
-            ) as resp:
-                remaining = resp.headers.get("Ratelimit-Remaining")
-                if remaining:
-                    self.rate_limit_remaining = int(remaining)
-                reset = resp.headers.get("Ratelimit-Reset")
-                if reset:
-                    self.rate_limit_resets.add(int(reset))
-
-                if resp.status == 429:
-                    log.info("Trying again")
-                    return await self.get_response(url)
-
-                return await resp.json()
+        session = self.get_session()
+        async with session.get(
+            url, headers=header, timeout=aiohttp.ClientTimeout(total=None)
+        ) as resp:
+            remaining = resp.headers.get("Ratelimit-Remaining")
+            if remaining:
+                self.rate_limit_remaining = int(remaining)
+            reset = resp.headers.get("Ratelimit-Reset")
+            if reset:
+                self.rate_limit_resets.add(int(reset))
+
+            if resp.status == 429:
+                log.info("Trying again")
+                return await self.get_response(url, retry_auth=retry_auth)
+            if resp.status == 401 and retry_auth:
+                # The token stopped working before we expected it to
+                log.debug("Access token rejected, getting a new one")
+                await self.invalidate_token()
+                return await self.get_response(url, retry_auth=False)
+
+            return await resp.json()
 
     #####################################################################################
 
@@ -162,7 +220,7 @@ class TwitchAPI:
 
     async def get_all_followers(self, user_id: str) -> Tuple[list, dict]:
         # Get's first 100 users following user_id
-        url = f"{BASE_URL}/users/follows?to_id={user_id}&first=100"
+        url = f"{self.base_url}/users/follows?to_id={user_id}&first=100"
         data = await self.get_response(url)
         follows = [x["from_id"] for x in data["data"]]
         total = data["total"]
@@ -174,16 +232,40 @@ class TwitchAPI:
         raise NotImplementedError()
 
     async def get_profile_from_name(self, twitch_name: str) -> TwitchProfile:
-        url = "{}/users?login={}".format(BASE_URL, twitch_name)
+        url = "{}/users?login={}".format(self.base_url, twitch_name)
         return TwitchProfile.from_json(await self.get_response(url))
 
     async def get_profile_from_id(self, twitch_id: str) -> TwitchProfile:
-        url = "{}/users?id={}".format(BASE_URL, twitch_id)
+        url = "{}/users?id={}".format(self.base_url, twitch_id)
         return TwitchProfile.from_json(await self.get_response(url))
 
+    async def get_profiles(self, twitch_ids: Iterable[str]) -> Dict[str, TwitchProfile]:
+        """
+        Look up many twitch profiles by ID
+
+        Profiles which aren't cached are requested 100 at a time. IDs twitch
+        doesn't know about are left out of the result.
+        """
+        profiles = {}
+        missing = []
+        for twitch_id in dict.fromkeys(twitch_ids):
+            profile = self.profiles.get(twitch_id)
+            if profile is None:
+                missing.append(twitch_id)
+            else:
+                profiles[twitch_id] = profile
+        for chunk in chunks(missing):
+            url = "{}/users?{}".format(self.base_url, "&".join(f"id={i}" for i in chunk))
+            data = await self.get_response(url)
+            for user in data.get("data", []):
+                profile = TwitchProfile(**user)
+                self.profiles.add(profile)
+                profiles[profile.id] = profile
+        return profiles
+
     async def get_new_followers(self, user_id: str) -> Tuple[List[TwitchFollower], int]:
         # Gets the last 100 followers from twitch
-        url = "{}/users/follows?to_id={}&first=100".format(BASE_URL, user_id)
+        url = "{}/users/follows?to_id={}&first=100".format(self.base_url, user_id)
         data = await self.get_response(url)
         follows = [TwitchFollower(**x) for x in data["data"]]
         total = data["total"]
@@ -195,7 +277,7 @@ class TwitchAPI:
         """
         Gets and returns the last 20 clips generated for a user
         """
-        url = f"{BASE_URL}/clips?broadcaster_id={user_id}"
+        url = f"{self.base_url}/clips?broadcaster_id={user_id}"
         if started_at:
             url += f"&started_at={started_at.isoformat()}Z"
             url += f"&ended_at={datetime.utcnow().isoformat()}Z"
@@ -232,37 +314,86 @@ class TwitchAPI:
                 account_return = account
         return account_return
 
-    async def check_followers(self, account: dict):
-        followed = await self.get_profile_from_id(account["id"])
-        followers, total = await self.get_new_followers(account["id"])
-        for follow in reversed(followers):
-            if follow.from_id not in account["followers"]:
-                try:
-                    profile = await self.get_profile_from_id(follow.from_id)
-                except Exception:
-                    log.exception(f"Error getting twitch profile {follow.from_id}", exc_info=True)
-                log.info(
-                    "%s Followed! %s " "has %s followers now.",
-                    profile.login,
-                    followed.display_name,
-                    total,
-                )
-                em = await self.make_follow_embed(followed, profile, total)
-                for channel_id in account["channels"]:
-                    channel = self.bot.get_channel(channel_id)
-                    if not channel:
-                        continue
-                    if channel.permissions_for(channel.guild.me).embed_links:
-                        await channel.send(embed=em)
-                    else:
-                        text_msg = (
-                            f"{profile.display_name} has just " f"followed {account.display_name}!"
-                        )
-                        await channel.send(text_msg)
-                async with self.config.twitch_accounts() as check_accounts:
-                    check_accounts.remove(account)
-                    account["followers"].append(follow.from_id)
-                    check_accounts.append(account)
+    async def get_follower_history(self, account_id: str) -> FollowerHistory:
+        if account_id not in self.followers:
+            data = await self.config.custom(FOLLOWERS, account_id).all()
+            self.followers[account_id] = FollowerHistory.from_config(data)
+        return self.followers[account_id]
+
+    async def save_follower_history(self, account_id: str) -> None:
+        """Save the follower history of one account if it has changed"""
+        history = self.followers.get(account_id)
+        if history is None or not history.changed:
+            return
+        await self.config.custom(FOLLOWERS, account_id).set(history.to_config())
+        history.changed = False
+
+    async def forget_follower_history(self, account_id: str) -> None:
+        self.followers.pop(account_id, None)
+        await self.config.custom(FOLLOWERS, account_id).clear()
+
+    async def check_followers(self, accounts: List[dict]) -> None:
+        """
+        Post new followers for every followed account
+
+        The followers of each account are requested first and then every
+        new follower and followed account profile is looked up together.
+        """
+        new_follows: Dict[str, Tuple[List[TwitchFollower], int]] = {}
+        for account in accounts:
+            try:
+                followers, total = await self.get_new_followers(account["id"])
+            except Exception:
+                log.exception("Error getting twitch followers for %s", account["id"])
+                continue
+            history = await self.get_follower_history(account["id"])
+            new = history.new_followers(followers)
+            if new:
+                new_follows[account["id"]] = (new, total)
+            elif history.changed:
+                await self.save_follower_history(account["id"])
+        if not new_follows:
+            return
+        twitch_ids = list(new_follows)
+        for new, total in new_follows.values():
+            twitch_ids += [follow.from_id for follow in new]
+        try:
+            profiles = await self.get_profiles(twitch_ids)
+        except Exception:
+            log.exception("Error getting twitch profiles")
+            return
+        for account in accounts:
+            if account["id"] not in new_follows:
+                continue
+            new, total = new_follows[account["id"]]
+            history = self.followers[account["id"]]
+            followed = profiles.get(account["id"])
+            for follow in new:
+                profile = profiles.get(follow.from_id)
+                if followed is not None and profile is not None:
+                    await self.send_follow_update(account, followed, profile, total)
+                history.add(follow)
+            await self.save_follower_history(account["id"])
+
+    async def send_follow_update(
+        self, account: dict, followed: TwitchProfile, profile: TwitchProfile, total: int
+    ) -> None:
+        log.info(
+            "%s Followed! %s " "has %s followers now.",
+            profile.login,
+            followed.display_name,
+            total,
+        )
+        em = await self.make_follow_embed(followed, profile, total)
+        for channel_id in account["channels"]:
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                continue
+            if channel.permissions_for(channel.guild.me).embed_links:
+                await channel.send(embed=em)
+            else:
+                text_msg = f"{profile.display_name} has just " f"followed {followed.display_name}!"
+                await channel.send(text_msg)
 
     async def send_clips_update(self, clip: dict, clip_data: dict):
         tasks = []
@@ -291,13 +422,17 @@ class TwitchAPI:
 
     async def check_clips(self):
         followed = await self.config.twitch_clips()
-        for user_id, clip_data in followed.items():
+        # the clips endpoint only takes one broadcaster so request them all together
+        now = datetime.utcnow() + timedelta(days=-8)
+        results = await bounded_gather(
+            *(self.get_new_clips(user_id, now) for user_id in followed),
+            return_exceptions=True,
+            limit=CLIP_REQUESTS,
+        )
+        for (user_id, clip_data), clips in zip(followed.items(), results):
             log.verbose("Checking for new clips from %s", clip_data["display_name"])
-            try:
-                now = datetime.utcnow() + timedelta(days=-8)
-                clips = await self.get_new_clips(user_id, now)
-            except Exception:
-                log.exception("Error getting twitch clips %s", user_id, exc_info=True)
+            if isinstance(clips, Exception):
+                log.error("Error getting twitch clips %s", user_id, exc_info=clips)
                 continue
             for clip in clips:
                 await self.send_clips_update(clip, clip_data)
@@ -310,8 +445,10 @@ class TwitchAPI:
             await self.bot.wait_until_ready()
         while self is self.bot.get_cog("Twitch"):
             follow_accounts = await self.config.twitch_accounts()
-            for account in follow_accounts:
-                await self.check_followers(account)
+            try:
+                await self.check_followers(follow_accounts)
+            except Exception:
+                log.exception("Error checking new followers")
             try:
                 await self.check_clips()
                 pass
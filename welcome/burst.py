@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+import discord
+
+# A guild is in a burst once this many members join within BURST_WINDOW seconds
+BURST_JOINS = 5
+BURST_WINDOW = 10.0
+# and stays in one until nobody has joined for BURST_QUIET seconds
+BURST_QUIET = 60.0
+# Room is left in the 2000 character message limit for the greeting itself
+MENTION_LIMIT = 1500
+MAX_GROUP_SIZE = 50
+
+
+@dataclass
+class BurstStats:
+    bursts: int = 0
+    members: int = 0
+    largest: int = 0
+    last_started: Optional[datetime] = None
+
+
+class BurstDetector:
+    """
+    Detects when members are joining a guild faster than they can be greeted.
+
+    While a guild is in a burst its joins are greeted in groups the same
+    way as the grouped greeting setting, regardless of that setting.
+    """
+
+    def __init__(self):
+        self.stats: Dict[int, BurstStats] = {}
+        self._joins: Dict[int, Deque[float]] = {}
+        self._until: Dict[int, float] = {}
+        self._current: Dict[int, int] = {}
+
+    def in_burst(self, guild_id: int) -> bool:
+        return self._until.get(guild_id, 0) > time.monotonic()
+
+    def join(self, guild_id: int) -> bool:
+        """Record a member joining `guild_id` and return whether it's in a burst"""
+        now = time.monotonic()
+        joins = self._joins.setdefault(guild_id, deque(maxlen=BURST_JOINS))
+        joins.append(now)
+        stats = self.stats.setdefault(guild_id, BurstStats())
+        if self.in_burst(guild_id):
+            self._current[guild_id] += 1
+        elif len(joins) == BURST_JOINS and joins[0] >= now - BURST_WINDOW:
+            stats.bursts += 1
+            stats.last_started = datetime.now(timezone.utc)
+            self._current[guild_id] = 1
+        else:
+            return False
+        self._until[guild_id] = now + BURST_QUIET
+        stats.members += 1
+        stats.largest = max(stats.largest, self._current[guild_id])
+        return True
+
+
+def chunk_members(members: List[discord.Member]) -> List[List[discord.Member]]:
+    """Split members into groups whose mentions fit in a single message"""
+    chunks: List[List[discord.Member]] = [[]]
+    length = 0
+    for member in members:
+        # ", " between each mention
+        size = len(member.mention) + 2
+        if chunks[-1] and (length + size > MENTION_LIMIT or len(chunks[-1]) >= MAX_GROUP_SIZE):
+            chunks.append([])
+            length = 0
+        chunks[-1].append(member)
+        length += size
+    return [c for c in chunks if c]
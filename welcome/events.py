@@ -1,14 +1,17 @@
 import re
 from datetime import datetime, timedelta, timezone
 from random import choice as rand_choice
-from typing import List, Optional, Pattern, Union, cast
+from typing import Any, Dict, List, Optional, Pattern, Union, cast
 
 import discord
 from red_commons.logging import getLogger
 from redbot.core import Config, commands
 from redbot.core.bot import Red
 from redbot.core.i18n import Translator, cog_i18n
-from redbot.core.utils.chat_formatting import humanize_list
+from redbot.core.utils.chat_formatting import humanize_list, pagify
+
+from .burst import BurstDetector
+from .settings import GuildSettings
 
 RE_CTX: Pattern = re.compile(r"{([^}]+)\}")
 RE_POS: Pattern = re.compile(r"{((\d+)[^.}]*(\.[^:}]+)?[^}]*)\}")
@@ -23,6 +26,26 @@ class Events:
         self.config: Config
         self.joined: dict
         self.today_count: dict
+        self.bursts: BurstDetector
+        self._settings: Dict[int, GuildSettings]
+        self._extra_greetings: Dict[int, List[int]]
+
+    async def get_settings(self, guild: discord.Guild) -> GuildSettings:
+        """
+        Get the snapshot of `guild`'s settings, reading config only if there isn't one.
+        """
+        if guild.id not in self._settings:
+            self._settings[guild.id] = GuildSettings(await self.config.guild(guild).all())
+        return self._settings[guild.id]
+
+    def invalidate_settings(self, guild: discord.Guild) -> None:
+        """Drop the settings snapshot for `guild` so it's read again next time"""
+        self._settings.pop(guild.id, None)
+
+    async def set_setting(self, guild: discord.Guild, key: str, value: Any) -> None:
+        await self.config.guild(guild).set_raw(key, value=value)
+        if guild.id in self._settings:
+            self._settings[guild.id] = self._settings[guild.id].replace(**{key: value})
 
     @staticmethod
     def transform_arg(result: str, attr: str, obj: Union[discord.Guild, discord.Member]) -> str:
@@ -42,12 +65,13 @@ class Events:
         msg: str,
         is_welcome: bool,
     ) -> str:
+        settings = await self.get_settings(guild)
         results = RE_POS.findall(msg)
         raw_response = msg
         user_count = self.today_count[guild.id] if guild.id in self.today_count else 1
         raw_response = raw_response.replace("{count}", str(user_count))
         has_filter = self.bot.get_cog("Filter")
-        filter_setting = await self.config.guild(guild).FILTER_SETTING() or "[Redacted]"
+        filter_setting = settings["FILTER_SETTING"] or "[Redacted]"
         if isinstance(member, list):
             username = humanize_list(member)
         else:
@@ -80,7 +104,7 @@ class Events:
                         raw_response = re.sub(
                             rf"(?i){member.mention}", filter_setting, raw_response
                         )
-        if await self.config.guild(guild).JOINED_TODAY() and is_welcome:
+        if settings["JOINED_TODAY"] and is_welcome:
             raw_response = _("{raw_response}\n\n{count} users joined today!").format(
                 raw_response=raw_response, count=user_count
             )
@@ -93,12 +117,13 @@ class Events:
         msg: str,
         is_welcome: bool,
     ) -> discord.Embed:
-        EMBED_DATA = await self.config.guild(guild).EMBED_DATA()
+        settings = await self.get_settings(guild)
+        EMBED_DATA = settings["EMBED_DATA"]
         converted_msg = await self.convert_parms(member, guild, msg, is_welcome)
         has_filter = self.bot.get_cog("Filter")
         username = str(member)
         if has_filter:
-            replace_word = await self.config.guild(guild).FILTER_SETTING() or "[Redacted]"
+            replace_word = settings["FILTER_SETTING"] or "[Redacted]"
             bad_words = await has_filter.filter_hits(username, guild)
             if bad_words:
                 for word in bad_words:
@@ -152,49 +177,51 @@ class Events:
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member) -> None:
         guild = member.guild
-        if not await self.config.guild(guild).ON():
-            return
         if guild is None:
             return
+        settings = await self.get_settings(guild)
+        if not settings["ON"]:
+            return
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
-        if member.bot and await self.config.guild(guild).BOTS_MSG() is not None:
+        if member.bot and settings["BOTS_MSG"] is not None:
             return await self.bot_welcome(member, guild)
-        td = timedelta(days=await self.config.guild(guild).MINIMUM_DAYS())
+        td = timedelta(days=settings["MINIMUM_DAYS"])
         if (datetime.now(timezone.utc) - member.created_at) <= td:
             log.info("Member joined with an account newer than required days.")
             return
         has_filter = self.bot.get_cog("Filter")
-        filter_setting = await self.config.guild(guild).FILTER_SETTING()
+        filter_setting = settings["FILTER_SETTING"]
         if has_filter and filter_setting is None:
             if await has_filter.filter_hits(member.name, guild):
                 log.info("Member joined with a bad username.")
                 return
 
-        if datetime.now(timezone.utc).date() > self.today_count["now"].date():
-            self.today_count = {"now": datetime.now(timezone.utc)}
-            # reset the daily count when a user joins the following day or when the cog is reloaded
-
-        if guild.id not in self.today_count:
-            self.today_count[guild.id] = 1
-        else:
-            self.today_count[guild.id] += 1
-
-        if await self.config.guild(guild).GROUPED():
+        in_burst = self.bursts.join(guild.id)
+        if settings["GROUPED"] or in_burst:
             if guild.id not in self.joined:
                 self.joined[guild.id] = []
             log.debug("member joined")
             if member not in self.joined[guild.id]:
+                # grouped joins are counted when they're greeted
                 return self.joined[guild.id].append(member)
+        self.add_today_count(guild, 1)
         await self.send_member_join(member, guild)
 
+    def add_today_count(self, guild: discord.Guild, joined: int) -> None:
+        if datetime.now(timezone.utc).date() > self.today_count["now"].date():
+            self.today_count = {"now": datetime.now(timezone.utc)}
+            # reset the daily count when a user joins the following day or when the cog is reloaded
+        self.today_count[guild.id] = self.today_count.get(guild.id, 0) + joined
+
     async def bot_welcome(self, member: discord.Member, guild: discord.Guild):
-        bot_welcome = await self.config.guild(guild).BOTS_MSG()
-        bot_role = await self.config.guild(guild).BOTS_ROLE()
-        msg = bot_welcome or rand_choice(await self.config.guild(guild).GREETING())
+        settings = await self.get_settings(guild)
+        bot_welcome = settings["BOTS_MSG"]
+        bot_role = settings["BOTS_ROLE"]
+        msg = bot_welcome or rand_choice(settings["GREETING"])
         channel = await self.get_welcome_channel(member, guild)
-        is_embed = await self.config.guild(guild).EMBED()
-        mentions = await self.config.guild(guild).MENTIONS()
+        is_embed = settings["EMBED"]
+        mentions = settings["MENTIONS"]
         allowed_mentions = discord.AllowedMentions(**mentions)
 
         if bot_role:
@@ -216,7 +243,7 @@ class Events:
                 return
             if is_embed and channel.permissions_for(guild.me).embed_links:
                 em = await self.make_embed(member, guild, msg, False)
-                if await self.config.guild(guild).EMBED_DATA.mention():
+                if settings["EMBED_DATA"]["mention"]:
                     await channel.send(member.mention, embed=em, allowed_mentions=allowed_mentions)
                 else:
                     await channel.send(embed=em, allowed_mentions=allowed_mentions)
@@ -230,10 +257,10 @@ class Events:
         self, member: Union[discord.Member, List[discord.Member]], guild: discord.Guild
     ) -> Optional[discord.TextChannel]:
         # grab the welcome channel
-        # guild_settings = await self.config.guild(guild).guild_settings()
-        c_id = await self.config.guild(guild).CHANNEL()
+        settings = await self.get_settings(guild)
+        c_id = settings["CHANNEL"]
         channel = cast(discord.TextChannel, guild.get_channel(c_id))
-        only_whisper = await self.config.guild(guild).WHISPER() is True
+        only_whisper = settings["WHISPER"] is True
         if channel is None:  # complain even if only whisper
             if not only_whisper:
                 log.info(
@@ -256,23 +283,64 @@ class Events:
             return None
         return channel
 
+    async def whisper_member(
+        self, member: discord.Member, guild: discord.Guild, msg: str, settings: GuildSettings
+    ) -> None:
+        try:
+            if settings["EMBED"]:
+                em = await self.make_embed(member, guild, msg, True)
+                if settings["EMBED_DATA"]["mention"]:
+                    await member.send(member.mention, embed=em)  # type: ignore
+                else:
+                    await member.send(embed=em)  # type: ignore
+            else:
+                await member.send(await self.convert_parms(member, guild, msg, False))  # type: ignore
+        except discord.errors.Forbidden:
+            log.info(
+                "welcome.py: unable to whisper %s. Probably " "doesn't want to be PM'd",
+                member,
+            )
+        except Exception:
+            log.error("error sending member join message", exc_info=True)
+
+    async def delete_extra_greetings(self, channel: discord.TextChannel) -> None:
+        # the other messages of the last greeting, sent for a group too large for one message
+        for message_id in self._extra_greetings.pop(channel.guild.id, []):
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except discord.HTTPException:
+                pass
+
     async def send_member_join(
-        self, member: Union[discord.Member, List[discord.Member]], guild: discord.Guild
+        self,
+        member: Union[discord.Member, List[discord.Member]],
+        guild: discord.Guild,
+        *,
+        delete_previous: bool = True,
     ) -> None:
-        only_whisper = await self.config.guild(guild).WHISPER() is True
+        """
+        Greet `member` or a group of members in `guild`
+
+        `delete_previous` is `False` for every part of a group greeting
+        after the first so the group is deleted together next time.
+        """
+        settings = await self.get_settings(guild)
+        only_whisper = settings["WHISPER"] is True
         channel = await self.get_welcome_channel(member, guild)
-        msgs = await self.config.guild(guild).GREETING()
+        msgs = settings["GREETING"]
         if not msgs:
             return
         msg = rand_choice(msgs)
-        is_embed = await self.config.guild(guild).EMBED()
-        delete_after = await self.config.guild(guild).DELETE_AFTER_GREETING()
-        save_msg = None
-        mentions = await self.config.guild(guild).MENTIONS()
+        is_embed = settings["EMBED"]
+        delete_after = settings["DELETE_AFTER_GREETING"]
+        sent: List[discord.Message] = []
+        mentions = settings["MENTIONS"]
         allowed_mentions = discord.AllowedMentions(**mentions)
 
-        if await self.config.guild(guild).DELETE_PREVIOUS_GREETING():
-            old_id = await self.config.guild(guild).LAST_GREETING()
+        if settings["DELETE_PREVIOUS_GREETING"] and delete_previous:
+            if channel is not None:
+                await self.delete_extra_greetings(channel)
+            old_id = settings["LAST_GREETING"]
             if channel is not None and old_id is not None:
                 old_msg = None
                 try:
@@ -280,37 +348,22 @@ class Events:
                 except discord.errors.NotFound:
                     pass
                 except discord.errors.Forbidden:
-                    await self.config.guild(guild).DELETE_PREVIOUS_GREETING.set(False)
+                    await self.set_setting(guild, "DELETE_PREVIOUS_GREETING", False)
                 if old_msg:
                     await old_msg.delete()
         # whisper the user if needed
-        if not await self.config.guild(guild).GROUPED():
-            if await self.config.guild(guild).WHISPER():
-                try:
-                    if is_embed:
-                        em = await self.make_embed(member, guild, msg, True)
-                        if await self.config.guild(guild).EMBED_DATA.mention():
-                            await member.send(member.mention, embed=em)  # type: ignore
-                        else:
-                            await member.send(embed=em)  # type: ignore
-                    else:
-                        await member.send(await self.convert_parms(member, guild, msg, False))  # type: ignore
-                except discord.errors.Forbidden:
-                    log.info(
-                        "welcome.py: unable to whisper %s. Probably " "doesn't want to be PM'd",
-                        member,
-                    )
-                except Exception:
-                    log.error("error sending member join message", exc_info=True)
+        if settings["WHISPER"]:
+            for whisper_to in member if isinstance(member, list) else [member]:
+                await self.whisper_member(whisper_to, guild, msg, settings)
         if only_whisper:
             return
         if not channel:
             return
         if is_embed and channel.permissions_for(guild.me).embed_links:
             em = await self.make_embed(member, guild, msg, True)
-            if await self.config.guild(guild).EMBED_DATA.mention():
-                if await self.config.guild(guild).GROUPED():
-                    members = cast(List[discord.Member], member)
+            if settings["EMBED_DATA"]["mention"]:
+                if isinstance(member, list):
+                    members = member
                     save_msg = await channel.send(
                         humanize_list([m.mention for m in members]),
                         embed=em,
@@ -331,14 +384,25 @@ class Events:
                     delete_after=delete_after,
                     allowed_mentions=allowed_mentions,
                 )
+            sent.append(save_msg)
         else:
-            save_msg = await channel.send(
-                await self.convert_parms(member, guild, msg, True),
-                delete_after=delete_after,
-                allowed_mentions=allowed_mentions,
-            )
-        if save_msg is not None:
-            await self.config.guild(guild).LAST_GREETING.set(save_msg.id)
+            content = await self.convert_parms(member, guild, msg, True)
+            # a greeting naming a large group can be longer than a single message
+            for page in pagify(content, delims=["\n", " "], page_length=2000):
+                sent.append(
+                    await channel.send(
+                        page, delete_after=delete_after, allowed_mentions=allowed_mentions
+                    )
+                )
+        if not sent:
+            return
+        if settings["DELETE_PREVIOUS_GREETING"]:
+            extras = self._extra_greetings.setdefault(guild.id, [])
+            if not delete_previous and settings["LAST_GREETING"] is not None:
+                # an earlier part of this group's greeting
+                extras.append(settings["LAST_GREETING"])
+            extras.extend(m.id for m in sent[:-1])
+        await self.set_setting(guild, "LAST_GREETING", sent[-1].id)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member) -> None:
@@ -348,36 +412,36 @@ class Events:
 
         if await self.bot.cog_disabled_in_guild(self, guild):
             return
-        if await self.config.guild(guild).GROUPED():
+        settings = await self.get_settings(guild)
+        if settings["GROUPED"]:
             if guild.id not in self.joined:
                 self.joined[guild.id] = []
             if member in self.joined[guild.id]:
                 self.joined[guild.id].remove(member)
 
-        if not await self.config.guild(guild).LEAVE_ON():
+        if not settings["LEAVE_ON"]:
             return
-        if member.bot and await self.config.guild(guild).BOTS_GOODBYE_MSG():
+        if member.bot and settings["BOTS_GOODBYE_MSG"]:
             await self.bot_leave(member, guild)
             return
-        msgs = await self.config.guild(guild).GOODBYE()
+        msgs = settings["GOODBYE"]
         if not msgs:
             return
         msg = rand_choice(msgs)
-        is_embed = await self.config.guild(guild).EMBED()
-        delete_after = await self.config.guild(guild).DELETE_AFTER_GOODBYE()
+        is_embed = settings["EMBED"]
+        delete_after = settings["DELETE_AFTER_GOODBYE"]
         save_msg = None
-        mentions = await self.config.guild(guild).GOODBYE_MENTIONS()
+        mentions = settings["GOODBYE_MENTIONS"]
         allowed_mentions = discord.AllowedMentions(**mentions)
 
         # grab the welcome channel
-        # guild_settings = await self.config.guild(guild).guild_settings()
-        channel = self.bot.get_channel(await self.config.guild(guild).LEAVE_CHANNEL())
+        channel = self.bot.get_channel(settings["LEAVE_CHANNEL"])
         if channel is None:  # complain even if only whisper
             log.debug("welcome.py: Channel not found in %s. It was most likely deleted.", guild)
             return
         # we can stop here
-        if await self.config.guild(guild).DELETE_PREVIOUS_GOODBYE():
-            old_id = await self.config.guild(guild).LAST_GOODBYE()
+        if settings["DELETE_PREVIOUS_GOODBYE"]:
+            old_id = settings["LAST_GOODBYE"]
             if channel is not None and old_id is not None:
                 old_msg = None
                 try:
@@ -386,7 +450,7 @@ class Events:
                     log.debug("Message not found for deletion.")
                     pass
                 except discord.errors.Forbidden:
-                    await self.config.guild(guild).DELETE_PREVIOUS_GOODBYE.set(False)
+                    await self.set_setting(guild, "DELETE_PREVIOUS_GOODBYE", False)
                 if old_msg:
                     await old_msg.delete()
 
@@ -396,7 +460,7 @@ class Events:
         elif not member.bot:
             if is_embed and channel.permissions_for(guild.me).embed_links:
                 em = await self.make_embed(member, guild, msg, False)
-                if await self.config.guild(guild).EMBED_DATA.mention():
+                if settings["EMBED_DATA"]["mention"]:
                     save_msg = await channel.send(
                         member.mention,
                         embed=em,
@@ -414,22 +478,23 @@ class Events:
                     allowed_mentions=allowed_mentions,
                 )
         if save_msg is not None:
-            await self.config.guild(guild).LAST_GOODBYE.set(save_msg.id)
+            await self.set_setting(guild, "LAST_GOODBYE", save_msg.id)
 
     async def bot_leave(self, member: discord.Member, guild: discord.Guild):
-        bot_welcome = await self.config.guild(guild).BOTS_GOODBYE_MSG()
-        msg = bot_welcome or rand_choice(await self.config.guild(guild).GOODBYE())
-        channel = self.bot.get_channel(await self.config.guild(guild).LEAVE_CHANNEL())
+        settings = await self.get_settings(guild)
+        bot_welcome = settings["BOTS_GOODBYE_MSG"]
+        msg = bot_welcome or rand_choice(settings["GOODBYE"])
+        channel = self.bot.get_channel(settings["LEAVE_CHANNEL"])
         if channel is None:
             return
-        is_embed = await self.config.guild(guild).EMBED()
-        mentions = await self.config.guild(guild).MENTIONS()
+        is_embed = settings["EMBED"]
+        mentions = settings["MENTIONS"]
         allowed_mentions = discord.AllowedMentions(**mentions)
         if bot_welcome:
             # finally, welcome them
             if is_embed and channel.permissions_for(guild.me).embed_links:
                 em = await self.make_embed(member, guild, msg, False)
-                if await self.config.guild(guild).EMBED_DATA.mention():
+                if settings["EMBED_DATA"]["mention"]:
                     await channel.send(member.mention, embed=em, allowed_mentions=allowed_mentions)
                 else:
                     await channel.send(embed=em, allowed_mentions=allowed_mentions)
@@ -447,20 +512,19 @@ class Events:
         default_goodbye = "See you later {0.name}!"
         default_bot_msg = "Hello {0.name}, fellow bot!"
         guild = cast(discord.Guild, ctx.message.guild)
-        guild_settings = await self.config.guild(guild).get_raw()
-        # log.info(guild_settings)
-        mentions = await self.config.guild(guild).MENTIONS()
+        settings = await self.get_settings(guild)
+        mentions = settings["MENTIONS"]
         allowed_mentions = discord.AllowedMentions(**mentions)
-        channel = guild.get_channel(guild_settings["CHANNEL"])
+        channel = guild.get_channel(settings["CHANNEL"])
         if leave:
-            channel = guild.get_channel(guild_settings["LEAVE_CHANNEL"])
-        choices = guild_settings["GREETING"] or [default_greeting]
+            channel = guild.get_channel(settings["LEAVE_CHANNEL"])
+        choices = settings["GREETING"] or [default_greeting]
 
         if leave:
-            choices = guild_settings["GOODBYE"] or [default_goodbye]
+            choices = settings["GOODBYE"] or [default_goodbye]
         rand_msg = rand_choice(choices)
-        if bot and guild_settings["BOTS_MSG"]:
-            rand_msg = guild_settings["BOTS_MSG"]
+        if bot and settings["BOTS_MSG"]:
+            rand_msg = settings["BOTS_MSG"]
 
         if rand_msg is None and msg is None:
             rand_msg = default_greeting
@@ -469,10 +533,10 @@ class Events:
         if rand_msg is None and leave:
             rand_msg = default_goodbye
         is_welcome = not leave
-        is_embed = guild_settings["EMBED"]
+        is_embed = settings["EMBED"]
         member = cast(discord.Member, ctx.message.author)
         members = cast(List[discord.Member], [ctx.author, ctx.me])
-        whisper_settings = guild_settings["WHISPER"]
+        whisper_settings = settings["WHISPER"]
         if channel is None and whisper_settings not in ["BOTH", True]:
             msg = _("I can't find the specified channel. It might have been deleted.")
             await ctx.send(msg)
@@ -480,12 +544,12 @@ class Events:
         msg = _("Sending test message to {location}. ").format(
             location="DM" if channel is None else channel.mention
         )
-        if not guild_settings["GREETING"] and not leave:
+        if not settings["GREETING"] and not leave:
             msg += _("Using default greeting because there are none saved.")
-        elif not guild_settings["GOODBYE"] and leave:
+        elif not settings["GOODBYE"] and leave:
             msg += _("Using default goodbye because there are none saved.")
         await ctx.send(msg, allowed_mentions=allowed_mentions)
-        if not bot and guild_settings["WHISPER"]:
+        if not bot and settings["WHISPER"]:
             if is_embed:
                 em = await self.make_embed(member, guild, rand_msg, is_welcome)
                 await ctx.author.send(embed=em, delete_after=60)
@@ -495,21 +559,21 @@ class Events:
                     delete_after=60,
                     allowed_mentions=allowed_mentions,
                 )
-            if guild_settings["WHISPER"] != "BOTH":
+            if settings["WHISPER"] != "BOTH":
                 return
         if bot or whisper_settings is not True:
             if not channel:
                 return
 
             if is_embed and channel.permissions_for(guild.me).embed_links:
-                if guild_settings["GROUPED"]:
+                if settings["GROUPED"]:
                     em = await self.make_embed(members, guild, rand_msg, is_welcome)
                     # only pass the list of members to simulate a grouped welcome
                 else:
                     em = await self.make_embed(member, guild, rand_msg, is_welcome)
 
-                if await self.config.guild(guild).EMBED_DATA.mention():
-                    if guild_settings["GROUPED"]:
+                if settings["EMBED_DATA"]["mention"]:
+                    if settings["GROUPED"]:
                         await channel.send(
                             humanize_list([m.mention for m in members]), embed=em, delete_after=60
                         )
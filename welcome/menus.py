@@ -159,6 +159,7 @@ class WelcomeEditModal(discord.ui.Modal):
                 settings = await config.guild(guild).get_raw(self.event_type.key())
                 settings[self.index] = self.text.value
                 await config.guild(guild).set_raw(self.event_type.key(), value=settings)
+                self.og_button.view.cog.invalidate_settings(guild)
             except IndexError:
                 await interaction.response.send_message(
                     _("There was an error editing this {event_type} message.").format(
@@ -283,6 +284,8 @@ class EmbedEditModal(discord.ui.Modal):
                                 ).format(key=key)
                             )
 
+        if changes:
+            self.og_button.view.cog.invalidate_settings(interaction.guild)
         if not changes:
             await interaction.response.send_message(
                 _("None of the values have changed.\n") + "\n".join(f"- {i}" for i in invalid)
@@ -382,6 +385,7 @@ class DeleteWelcomeButton(discord.ui.Button):
         settings = await config.guild(guild).get_raw(self.event_type.key())
         settings.pop(self.view.source.current_page)
         await config.guild(guild).set_raw(self.event_type.key(), value=settings)
+        self.view.cog.invalidate_settings(guild)
         await interaction.response.edit_message(
             content=_("This {event_type} has been deleted.").format(
                 event_type=self.event_type.get_name()
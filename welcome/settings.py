@@ -0,0 +1,41 @@
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into read only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class GuildSettings(Mapping):
+    """
+    An immutable snapshot of a guilds welcome settings.
+
+    The member join and leave handlers read every setting from here rather
+    than awaiting config for each one. A snapshot is never changed in place,
+    `replace` returns a new snapshot with some settings changed.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = {k: freeze(v) for k, v in data.items()}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"<GuildSettings {self._data!r}>"
+
+    def replace(self, **changes: Any) -> "GuildSettings":
+        return GuildSettings({**self._data, **changes})
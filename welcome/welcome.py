@@ -8,6 +8,7 @@ from redbot.core import Config, checks, commands
 from redbot.core.i18n import Translator, cog_i18n
 from redbot.core.utils.chat_formatting import humanize_list
 
+from .burst import BurstDetector, chunk_members
 from .events import Events
 from .menus import IMAGE_LINKS, BaseMenu, EventType, WelcomePages
 
@@ -63,13 +64,16 @@ class Welcome(Events, commands.Cog):
     https://github.com/irdumbs/Dumb-Cogs/blob/master/welcome/welcome.py"""
 
     __author__ = ["irdumb", "TrustyJAID"]
-    __version__ = "2.5.1"
+    __version__ = "2.7.0"
 
     def __init__(self, bot):
         self.bot = bot
         self.config = Config.get_conf(self, 144465786453, force_registration=True)
         self.config.register_guild(**default_settings)
         self.joined = {}
+        self._settings = {}
+        self._extra_greetings = {}
+        self.bursts = BurstDetector()
         self.today_count = {"now": datetime.now(timezone.utc)}
         self.group_welcome.start()
 
@@ -89,26 +93,35 @@ class Welcome(Events, commands.Cog):
     @tasks.loop(seconds=10)
     async def group_welcome(self) -> None:
         # log.debug("Checking for new welcomes")
-        clear_guilds = []
-        for guild_id, members in self.joined.items():
-            if members:
-                last_time_id = await self.config.guild_from_id(guild_id).LAST_GREETING()
-                if last_time_id is not None:
-                    last_time = (
-                        datetime.now(timezone.utc) - discord.utils.snowflake_time(last_time_id)
-                    ).total_seconds()
-                    if len(members) > 1 and last_time <= 30.0:
-                        continue
+        for guild_id, members in list(self.joined.items()):
+            if not members:
+                continue
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                self.joined.pop(guild_id, None)
+                continue
+            last_time_id = (await self.get_settings(guild))["LAST_GREETING"]
+            if last_time_id is not None:
+                last_time = (
+                    datetime.now(timezone.utc) - discord.utils.snowflake_time(last_time_id)
+                ).total_seconds()
+                if len(members) > 1 and last_time <= 30.0:
+                    continue
+            # anyone joining while these are sent waits for the next group
+            members = self.joined.pop(guild_id, members)
+            # count everyone being greeted at once
+            self.add_today_count(guild, len(members))
+            for i, chunk in enumerate(chunk_members(members)):
                 try:
-                    await self.send_member_join(members, self.bot.get_guild(guild_id))
-                    clear_guilds.append(guild_id)
+                    # only the first part replaces the previous greeting
+                    await self.send_member_join(chunk, guild, delete_previous=i == 0)
                 except Exception:
                     log.exception("Error in group welcome:")
-        for guild_id in clear_guilds:
-            try:
-                del self.joined[guild_id]
-            except KeyError:
-                pass
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        # any command here may have changed the settings
+        if ctx.guild is not None:
+            self.invalidate_settings(ctx.guild)
 
     @group_welcome.before_loop
     async def before_group_welcome(self):
@@ -185,6 +198,29 @@ class Welcome(Events, commands.Cog):
             msg += "```"
             await ctx.send(msg)
 
+    @welcomeset.command(name="bursts")
+    async def welcome_bursts(self, ctx: commands.Context) -> None:
+        """
+        Show how many join bursts this server has had since the cog was loaded
+
+        When members join faster than they can be greeted one at a time
+        they are greeted together as if grouped greetings were enabled.
+        """
+        stats = self.bursts.stats.get(ctx.guild.id)
+        if stats is None or not stats.bursts:
+            await ctx.send(_("There haven't been any join bursts here."))
+            return
+        msg = _(
+            "Bursts: {bursts}\nMembers greeted in bursts: {members}\n"
+            "Largest burst: {largest}\nLast burst: {last}"
+        ).format(
+            bursts=stats.bursts,
+            members=stats.members,
+            largest=stats.largest,
+            last=discord.utils.format_dt(stats.last_started, "R"),
+        )
+        await ctx.send(msg)
+
     @welcomeset.group(name="greeting", aliases=["welcome"])
     async def welcomeset_greeting(self, ctx: commands.Context) -> None:
         """